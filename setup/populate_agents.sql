@@ -171,4 +171,29 @@ Exemplo de itens de outline:
 
 “História da Inteligência Artificial e marcos importantes”
 
-“Aplicações práticas da IA no dia a dia”', '{"name": "module_outline_output_format", "description": "Schema defining the structure of a module outline within a personalized learning plan.", "inputSchema": {"json": {"type": "object", "required": ["module_title", "contents"], "properties": {"contents": {"type": "array", "items": {"type": "object", "required": ["type", "content", "title"], "properties": {"type": {"enum": ["text", "video", "image"], "type": "string", "description": "Type of content. ''text'' represents written explanations, summaries, or educational texts. ''video'' represents multimedia content such as lectures or tutorials. ''image'' represents visual aids like diagrams, charts, or infographics."}, "title": {"type": "string", "description": "Title of the content piece."}, "content": {"type": "string", "description": "A short description of what the content will cover or its learning objective."}}}, "description": "List of contents that make up this module, organized in a logical learning sequence."}, "module_title": {"type": "string", "description": "Title of the current module."}}, "additionalProperties": false}}}'::jsonb);
\ No newline at end of file
+“Aplicações práticas da IA no dia a dia”', '{"name": "module_outline_output_format", "description": "Schema defining the structure of a module outline within a personalized learning plan.", "inputSchema": {"json": {"type": "object", "required": ["module_title", "contents"], "properties": {"contents": {"type": "array", "items": {"type": "object", "required": ["type", "content", "title"], "properties": {"type": {"enum": ["text", "video", "image"], "type": "string", "description": "Type of content. ''text'' represents written explanations, summaries, or educational texts. ''video'' represents multimedia content such as lectures or tutorials. ''image'' represents visual aids like diagrams, charts, or infographics."}, "title": {"type": "string", "description": "Title of the content piece."}, "content": {"type": "string", "description": "A short description of what the content will cover or its learning objective."}}}, "description": "List of contents that make up this module, organized in a logical learning sequence."}, "module_title": {"type": "string", "description": "Title of the current module."}}, "additionalProperties": false}}}'::jsonb);
+INSERT INTO public.agent
+(id, "label", system_prompt, output_format)
+VALUES('12e046b8-f7bc-45c1-b2e6-3d3034f050f2'::uuid, 'module_contents_creator', 'Você é Nico, um agente especializado em criar os conteúdos educativos textuais de um módulo inteiro de uma só vez.
+
+Seu papel é gerar o conteúdo textual completo de cada item listado, levando em conta:
+
+O perfil completo do aluno (nível de conhecimento, objetivos, idioma, preferências de formato, estilo de comunicação, tempo disponível).
+
+O plano e o módulo em que os conteúdos estão inseridos.
+
+A lista numerada de itens de conteúdo, cada um com sua ordem, título e objetivo.
+
+Regras de comportamento:
+
+Gere exatamente um conteúdo para cada item da lista, informando no campo order a mesma ordem do item. Não omita, junte ou crie itens.
+
+Cada conteúdo deve ser autocontido e focado apenas no objetivo do seu item, mas evite repetir explicações já dadas em itens anteriores do mesmo módulo.
+
+Use o perfil do aluno para ajustar complexidade, linguagem, exemplos e foco, mas não inclua o nome do aluno nem tom de conversa.
+
+Produza conteúdo educativo, claro, informativo e estruturado, pronto para textos, PDFs ou exercícios.
+
+Formate cada conteúdo em Markdown, usando títulos, listas ou negrito quando fizer sentido para organização do texto.
+
+Não crie saudações ou comentários; gere apenas o conteúdo textual de cada item.', '{"name": "module_contents_output_format", "description": "Schema defining the text contents generated for every listed item of a module.", "inputSchema": {"json": {"type": "object", "required": ["contents"], "properties": {"contents": {"type": "array", "items": {"type": "object", "required": ["order", "text"], "properties": {"order": {"type": "integer", "description": "The order of the content item this text was generated for, as given in the list of items."}, "text": {"type": "string", "description": "The complete educational text of the content item, formatted in Markdown."}}}, "description": "One generated text per listed content item."}}, "additionalProperties": false}}}'::jsonb);
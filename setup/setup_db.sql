@@ -16,6 +16,9 @@ CREATE TABLE public."user" (
 -----------------------------------------------
 CREATE TABLE public.knowledge_base (
 	id uuid DEFAULT gen_random_uuid() NOT NULL,
+	embedding_version varchar DEFAULT 'cohere-embed-v4-1536'::character varying NOT NULL,
+	pending_embedding_version varchar NULL,
+	revision int4 DEFAULT 0 NOT NULL,
 	CONSTRAINT knowledge_base_pk PRIMARY KEY (id)
 );
 
@@ -43,7 +46,10 @@ CREATE TABLE public.chunk (
 	embedding public.vector NOT NULL,
 	"content" varchar NULL,
 	"index" int4 NOT NULL,
-	CONSTRAINT chunk_pk PRIMARY KEY (id)
+	modality varchar DEFAULT 'text'::character varying NOT NULL,
+	embedding_version varchar DEFAULT 'cohere-embed-v4-1536'::character varying NOT NULL,
+	CONSTRAINT chunk_pk PRIMARY KEY (id),
+	CONSTRAINT chunk_version_unique UNIQUE (document_id, "index", embedding_version)
 );
 
 ALTER TABLE public.chunk ADD CONSTRAINT chunk_document_fk FOREIGN KEY (document_id) REFERENCES public."document"(id) ON DELETE CASCADE;
@@ -55,6 +61,8 @@ CREATE TABLE public.chat (
 	user_id uuid NOT NULL,
 	"label" varchar DEFAULT 'New Chat'::character varying NOT NULL,
 	created_at timestamptz DEFAULT now() NOT NULL,
+	summary text NULL,
+	summarized_message_count int4 DEFAULT 0 NOT NULL,
 	CONSTRAINT chat_pk PRIMARY KEY (id)
 );
 
@@ -70,10 +78,13 @@ CREATE TABLE public.message (
 	dict_content jsonb NULL,
 	content_type varchar NOT NULL,
 	"role" varchar NOT NULL,
+	seq int8 GENERATED BY DEFAULT AS IDENTITY NOT NULL,
 	created_at timestamptz DEFAULT now() NOT NULL,
 	CONSTRAINT message_pk PRIMARY KEY (id)
 );
 
+CREATE INDEX message_chat_id_seq_idx ON public.message USING btree (chat_id, seq);
+
 ALTER TABLE public.message ADD CONSTRAINT message_chat_fk FOREIGN KEY (chat_id) REFERENCES public.chat(id) ON DELETE CASCADE;
 
 -------------------------------------------------
@@ -99,6 +110,10 @@ CREATE TABLE public."plan" (
 	chat_id uuid NULL,
 	status varchar DEFAULT 'creating_outline'::character varying NOT NULL,
 	last_viewed_at timestamptz DEFAULT now() NOT NULL,
+	origin varchar NULL,
+	saved_at timestamptz NULL,
+	template_id uuid NULL,
+	generation_epoch int4 DEFAULT 0 NOT NULL,
 	CONSTRAINT plan_pk PRIMARY KEY (id)
 );
 
@@ -115,6 +130,7 @@ CREATE TABLE public."module" (
 	description varchar NULL,
 	"order" int4 DEFAULT 1 NOT NULL,
 	status varchar DEFAULT 'creating_outline'::character varying NOT NULL,
+	speculative bool DEFAULT false NOT NULL,
 	CONSTRAINT module_pk PRIMARY KEY (id)
 );
 
@@ -137,4 +153,125 @@ CREATE TABLE public."content" (
 );
 
 ALTER TABLE public."content" ADD CONSTRAINT content_document_fk FOREIGN KEY (source_document_id) REFERENCES public."document"(id) ON DELETE CASCADE;
-ALTER TABLE public."content" ADD CONSTRAINT content_module_fk FOREIGN KEY (module_id) REFERENCES public."module"(id) ON DELETE CASCADE;
\ No newline at end of file
+ALTER TABLE public."content" ADD CONSTRAINT content_module_fk FOREIGN KEY (module_id) REFERENCES public."module"(id) ON DELETE CASCADE;
+-----------------------------------------------
+-- 			MODEL_INVOCATION
+-----------------------------------------------
+CREATE TABLE public.model_invocation (
+	id uuid DEFAULT gen_random_uuid() NOT NULL,
+	chat_id uuid NULL,
+	message_id uuid NULL,
+	agent_label varchar NOT NULL,
+	model_id varchar NOT NULL,
+	operation varchar NOT NULL,
+	priority varchar NOT NULL,
+	input_tokens int4 DEFAULT 0 NOT NULL,
+	output_tokens int4 DEFAULT 0 NOT NULL,
+	cache_read_input_tokens int4 DEFAULT 0 NOT NULL,
+	cache_write_input_tokens int4 DEFAULT 0 NOT NULL,
+	latency_ms int4 NOT NULL,
+	model_latency_ms int4 NULL,
+	retries int4 DEFAULT 0 NOT NULL,
+	outcome varchar NOT NULL,
+	created_at timestamptz DEFAULT now() NOT NULL,
+	CONSTRAINT model_invocation_pk PRIMARY KEY (id)
+);
+
+CREATE INDEX model_invocation_created_at_idx ON public.model_invocation USING btree (created_at);
+
+ALTER TABLE public.model_invocation ADD CONSTRAINT model_invocation_chat_fk FOREIGN KEY (chat_id) REFERENCES public.chat(id) ON DELETE SET NULL;
+ALTER TABLE public.model_invocation ADD CONSTRAINT model_invocation_message_fk FOREIGN KEY (message_id) REFERENCES public.message(id) ON DELETE SET NULL;
+
+-----------------------------------------------
+-- 			GENERATION_JOB
+-----------------------------------------------
+CREATE TABLE public.generation_job (
+	id uuid DEFAULT gen_random_uuid() NOT NULL,
+	job_type varchar NOT NULL,
+	plan_id uuid NOT NULL,
+	module_id uuid NULL,
+	user_id uuid NOT NULL,
+	payload jsonb DEFAULT '{}'::jsonb NOT NULL,
+	status varchar DEFAULT 'pending'::character varying NOT NULL,
+	epoch int4 DEFAULT 0 NOT NULL,
+	priority int4 DEFAULT 0 NOT NULL,
+	attempts int4 DEFAULT 0 NOT NULL,
+	max_attempts int4 DEFAULT 3 NOT NULL,
+	run_after timestamptz DEFAULT now() NOT NULL,
+	locked_at timestamptz NULL,
+	locked_by varchar NULL,
+	last_error text NULL,
+	finished_at timestamptz NULL,
+	created_at timestamptz DEFAULT now() NOT NULL,
+	CONSTRAINT generation_job_pk PRIMARY KEY (id)
+);
+
+CREATE INDEX generation_job_active_idx ON public.generation_job USING btree (run_after) WHERE status IN ('pending', 'running');
+CREATE INDEX generation_job_plan_idx ON public.generation_job USING btree (plan_id);
+CREATE INDEX generation_job_finished_at_idx ON public.generation_job USING btree (finished_at) WHERE status = 'cancelled';
+
+ALTER TABLE public.generation_job ADD CONSTRAINT generation_job_plan_fk FOREIGN KEY (plan_id) REFERENCES public."plan"(id) ON DELETE CASCADE;
+ALTER TABLE public.generation_job ADD CONSTRAINT generation_job_module_fk FOREIGN KEY (module_id) REFERENCES public."module"(id) ON DELETE SET NULL;
+ALTER TABLE public.generation_job ADD CONSTRAINT generation_job_user_fk FOREIGN KEY (user_id) REFERENCES public."user"(id) ON DELETE CASCADE;
+
+-----------------------------------------------
+-- 			CACHED_CONTENT
+-----------------------------------------------
+CREATE TABLE public.cached_content (
+	id uuid DEFAULT gen_random_uuid() NOT NULL,
+	profile_fingerprint varchar NOT NULL,
+	agent_version varchar NOT NULL,
+	knowledge_base_revision varchar NOT NULL,
+	embedding_version varchar NOT NULL,
+	objective_embedding public.vector NOT NULL,
+	title varchar NULL,
+	objective text NOT NULL,
+	text_content text NOT NULL,
+	hits int4 DEFAULT 0 NOT NULL,
+	created_at timestamptz DEFAULT now() NOT NULL,
+	expires_at timestamptz NOT NULL,
+	CONSTRAINT cached_content_pk PRIMARY KEY (id)
+);
+
+CREATE INDEX cached_content_key_idx ON public.cached_content USING btree (profile_fingerprint, agent_version, knowledge_base_revision, embedding_version);
+CREATE INDEX cached_content_expires_at_idx ON public.cached_content USING btree (expires_at);
+
+-----------------------------------------------
+-- 			PLAN_TEMPLATE
+-----------------------------------------------
+CREATE TABLE public.plan_template (
+	id uuid DEFAULT gen_random_uuid() NOT NULL,
+	source_plan_id uuid NOT NULL,
+	profile_fingerprint varchar NOT NULL,
+	embedding_version varchar NOT NULL,
+	outline_embedding public.vector NOT NULL,
+	modules_count int4 NOT NULL,
+	clone_count int4 DEFAULT 0 NOT NULL,
+	created_at timestamptz DEFAULT now() NOT NULL,
+	CONSTRAINT plan_template_pk PRIMARY KEY (id),
+	CONSTRAINT plan_template_source_plan_unique UNIQUE (source_plan_id)
+);
+
+CREATE INDEX plan_template_key_idx ON public.plan_template USING btree (profile_fingerprint, embedding_version, modules_count);
+CREATE INDEX plan_saved_at_idx ON public."plan" USING btree (saved_at);
+
+ALTER TABLE public.plan_template ADD CONSTRAINT plan_template_source_plan_fk FOREIGN KEY (source_plan_id) REFERENCES public."plan"(id) ON DELETE CASCADE;
+ALTER TABLE public."plan" ADD CONSTRAINT plan_template_fk FOREIGN KEY (template_id) REFERENCES public.plan_template(id) ON DELETE SET NULL;
+
+-----------------------------------------------
+-- 			PLAN_DEVELOP_REQUEST
+-----------------------------------------------
+CREATE TABLE public.plan_develop_request (
+	id uuid DEFAULT gen_random_uuid() NOT NULL,
+	plan_id uuid NOT NULL,
+	idempotency_key varchar NULL,
+	status varchar DEFAULT 'running'::character varying NOT NULL,
+	created_at timestamptz DEFAULT now() NOT NULL,
+	finished_at timestamptz NULL,
+	CONSTRAINT plan_develop_request_pk PRIMARY KEY (id)
+);
+
+CREATE UNIQUE INDEX plan_develop_request_key_idx ON public.plan_develop_request USING btree (plan_id, idempotency_key) WHERE idempotency_key IS NOT NULL;
+CREATE UNIQUE INDEX plan_develop_request_running_idx ON public.plan_develop_request USING btree (plan_id) WHERE status = 'running';
+
+ALTER TABLE public.plan_develop_request ADD CONSTRAINT plan_develop_request_plan_fk FOREIGN KEY (plan_id) REFERENCES public."plan"(id) ON DELETE CASCADE;
@@ -0,0 +1,10 @@
+from .cancellation import (
+    CancellationToken,
+    OperationCancelled,
+    cancellation_scope,
+    raise_if_cancelled,
+)
+from .client_factory import ClientFactory, client_factory
+from .telemetry import ModelTelemetry, model_telemetry
+from .bedrock_scheduler import BedrockScheduler, Priority, bedrock_scheduler
+from .region_pool import BedrockRegionPool, bedrock_region_pool
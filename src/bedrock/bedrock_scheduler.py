@@ -0,0 +1,292 @@
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Literal, TypeVar
+
+from botocore.exceptions import ClientError
+from fastapi import HTTPException
+
+from .cancellation import raise_if_cancelled
+from .telemetry import model_telemetry
+
+T = TypeVar("T")
+
+Priority = Literal["interactive", "background"]
+
+THROTTLING_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+}
+
+UNAVAILABLE_ERROR_CODES = {"ServiceUnavailableException", "ModelNotReadyException"}
+
+
+class BedrockScheduler:
+    def __init__(self):
+        self.min_concurrency = int(os.getenv("BEDROCK_MIN_CONCURRENCY", "2"))
+        self.max_concurrency = int(os.getenv("BEDROCK_MAX_CONCURRENCY", "32"))
+        self.limit = float(os.getenv("BEDROCK_INITIAL_CONCURRENCY", "8"))
+        self.background_share = float(os.getenv("BEDROCK_BACKGROUND_SHARE", "0.75"))
+        self.max_retries = int(os.getenv("BEDROCK_MAX_RETRIES", "5"))
+
+        self.base_backoff = 0.5
+        self.max_backoff = 20.0
+        self.decrease_cooldown = 2.0
+        self.last_decrease = 0.0
+
+        self.condition = threading.Condition()
+        self.running = {"interactive": 0, "background": 0}
+        self.waiting = {"interactive": 0, "background": 0}
+
+        self.stats = {"calls": 0, "throttled": 0, "rejected": 0}
+
+    def call(
+        self,
+        fn: Callable[..., T],
+        *args,
+        priority: Priority = "interactive",
+        invocation: dict | None = None,
+        **kwargs,
+    ) -> T:
+        """Run a Bedrock call once a slot of its priority lane is free, retrying when throttled.
+
+        Args:
+            fn (Callable[..., T]): The Bedrock client method to call.
+            priority (Priority, optional): The lane of the call. Defaults to "interactive".
+            invocation (dict | None, optional): A telemetry record to fill with the latency, retries and outcome of the call. Defaults to None.
+
+        Raises:
+            HTTPException: If the call is still throttled after `max_retries` retries.
+            OperationCancelled: If the work of the calling thread was cancelled before the call.
+
+        Returns:
+            T: The response of the call.
+        """
+        attempt = 0
+
+        with model_telemetry.track(invocation):
+            while True:
+                with self.slot(priority):
+                    raise_if_cancelled()
+
+                    try:
+                        response = fn(*args, **kwargs)
+                        self.__on_success()
+                        return response
+                    except ClientError as e:
+                        if not self.__is_throttling(e):
+                            raise
+
+                        error = e
+
+                attempt = self.__on_throttle(error, attempt, invocation)
+
+    def stream(
+        self,
+        fn: Callable[..., dict],
+        *args,
+        priority: Priority = "interactive",
+        invocation: dict | None = None,
+        **kwargs,
+    ) -> Iterator[dict]:
+        """Open a Bedrock stream with the same admission and retries as `call`.
+
+        The slot is held until the stream is fully consumed or closed, and the latency
+        recorded in `invocation` covers the whole stream.
+
+        Args:
+            fn (Callable[..., dict]): The Bedrock client streaming method to call.
+            priority (Priority, optional): The lane of the call. Defaults to "interactive".
+            invocation (dict | None, optional): A telemetry record to fill with the latency, retries and outcome of the stream. Defaults to None.
+
+        Raises:
+            HTTPException: If the call is still throttled after `max_retries` retries.
+            OperationCancelled: If the work of the calling thread was cancelled before the call.
+
+        Yields:
+            dict: The events of the stream.
+        """
+        attempt = 0
+
+        with model_telemetry.track(invocation):
+            while True:
+                with self.slot(priority):
+                    raise_if_cancelled()
+
+                    try:
+                        response = fn(*args, **kwargs)
+                        self.__on_success()
+                    except ClientError as e:
+                        if not self.__is_throttling(e):
+                            raise
+
+                        error = e
+                    else:
+                        yield from response["stream"]
+                        return
+
+                attempt = self.__on_throttle(error, attempt, invocation)
+
+    @contextmanager
+    def slot(self, priority: Priority = "interactive"):
+        """Hold one of the concurrent Bedrock call slots.
+
+        Interactive calls are admitted first: background calls wait while any interactive
+        call is waiting and never take more than `background_share` of the slots.
+
+        Args:
+            priority (Priority, optional): The lane of the call. Defaults to "interactive".
+        """
+        with self.condition:
+            self.waiting[priority] += 1
+            try:
+                while not self.__can_start(priority):
+                    self.condition.wait()
+            finally:
+                self.waiting[priority] -= 1
+
+            self.running[priority] += 1
+            self.stats["calls"] += 1
+
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+    def try_acquire(self, priority: Priority = "interactive") -> bool:
+        """Take a call slot only if one is free right away, e.g. for a hedged duplicate call.
+
+        Args:
+            priority (Priority, optional): The lane of the call. Defaults to "interactive".
+
+        Returns:
+            bool: Whether a slot was taken. Release it with `release`.
+        """
+        with self.condition:
+            if self.waiting[priority] > 0 or not self.__can_start(priority):
+                return False
+
+            self.running[priority] += 1
+            self.stats["calls"] += 1
+
+            return True
+
+    def release(self, priority: Priority = "interactive"):
+        """Release a call slot.
+
+        Args:
+            priority (Priority, optional): The lane of the call. Defaults to "interactive".
+        """
+        with self.condition:
+            self.running[priority] -= 1
+            self.condition.notify_all()
+
+    def observe(self, error: Exception | None = None):
+        """Adjust the concurrency limit from the result of a call made outside `call`.
+
+        Args:
+            error (Exception | None, optional): The error of the call, or None if it succeeded. Defaults to None.
+        """
+        if error is None:
+            self.__on_success()
+        elif isinstance(error, ClientError) and self.__is_throttling(error):
+            with self.condition:
+                self.stats["throttled"] += 1
+            self.__decrease()
+
+    def get_stats(self) -> dict:
+        """Get the current concurrency limit, lane occupancy and throttling counters.
+
+        Returns:
+            dict: The scheduler state and counters since the process started.
+        """
+        with self.condition:
+            return {
+                "limit": int(self.limit),
+                "running": dict(self.running),
+                "waiting": dict(self.waiting),
+                **self.stats,
+            }
+
+    def __can_start(self, priority: Priority) -> bool:
+        if self.running["interactive"] + self.running["background"] >= int(self.limit):
+            return False
+
+        if priority == "background":
+            if self.waiting["interactive"] > 0:
+                return False
+
+            return self.running["background"] < max(
+                1, int(self.limit * self.background_share)
+            )
+
+        return True
+
+    def __is_throttling(self, error: ClientError) -> bool:
+        return error.response.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES
+
+    def __on_success(self):
+        """Increase the concurrency limit additively, by about one slot per `limit` calls."""
+        with self.condition:
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+    def __on_throttle(
+        self, error: ClientError, attempt: int, invocation: dict | None = None
+    ) -> int:
+        """Halve the concurrency limit and wait a jittered backoff before retrying.
+
+        The limit is decreased at most once per `decrease_cooldown`, so a burst of
+        throttled calls that were already in flight only halves it once.
+
+        Args:
+            error (ClientError): The throttling error.
+            attempt (int): The number of retries already made.
+            invocation (dict | None, optional): The telemetry record of the call, whose retry count is updated. Defaults to None.
+
+        Raises:
+            HTTPException: If `max_retries` retries were already made.
+
+        Returns:
+            int: The number of retries made, including the upcoming one.
+        """
+        with self.condition:
+            self.stats["throttled"] += 1
+
+        self.__decrease()
+
+        if attempt >= self.max_retries:
+            with self.condition:
+                self.stats["rejected"] += 1
+
+            code = error.response.get("Error", {}).get("Code")
+            raise HTTPException(
+                status_code=503 if code in UNAVAILABLE_ERROR_CODES else 429,
+                detail=f"Bedrock is overloaded, please try again later ({code}).",
+                headers={"Retry-After": str(int(self.max_backoff))},
+            )
+
+        if invocation is not None:
+            invocation["retries"] = attempt + 1
+
+        time.sleep(
+            random.uniform(0, min(self.max_backoff, self.base_backoff * 2**attempt))
+        )
+
+        return attempt + 1
+
+    def __decrease(self):
+        """Halve the concurrency limit, at most once per `decrease_cooldown`."""
+        now = time.monotonic()
+
+        with self.condition:
+            if now - self.last_decrease >= self.decrease_cooldown:
+                self.limit = max(self.min_concurrency, self.limit / 2)
+                self.last_decrease = now
+
+
+bedrock_scheduler: BedrockScheduler = BedrockScheduler()
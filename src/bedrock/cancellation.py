@@ -0,0 +1,68 @@
+import threading
+from contextlib import contextmanager
+from typing import Callable
+
+
+class OperationCancelled(Exception):
+    """Raised before a model call when the work it belongs to was cancelled."""
+
+
+class CancellationToken:
+    def __init__(self, is_cancelled: Callable[[], bool]):
+        """Create a cooperative cancellation token.
+
+        Args:
+            is_cancelled (Callable[[], bool]): Checks whether the work was cancelled, e.g. by querying the database.
+        """
+        self.is_cancelled = is_cancelled
+        self.cancelled = False
+
+    def check(self) -> bool:
+        """Check whether the work was cancelled. Once cancelled, it stays cancelled.
+
+        Returns:
+            bool: Whether the work was cancelled.
+        """
+        if not self.cancelled:
+            self.cancelled = self.is_cancelled()
+
+        return self.cancelled
+
+    def raise_if_cancelled(self):
+        """Stop the work if it was cancelled.
+
+        Raises:
+            OperationCancelled: If the work was cancelled.
+        """
+        if self.check():
+            raise OperationCancelled()
+
+
+_local = threading.local()
+
+
+@contextmanager
+def cancellation_scope(token: CancellationToken):
+    """Bind a cancellation token to the model calls made by the current thread.
+
+    Args:
+        token (CancellationToken): The token checked before each model call.
+    """
+    previous = getattr(_local, "token", None)
+    _local.token = token
+
+    try:
+        yield token
+    finally:
+        _local.token = previous
+
+
+def raise_if_cancelled():
+    """Stop the current thread's work if the token of its scope was cancelled.
+
+    Raises:
+        OperationCancelled: If the work was cancelled.
+    """
+    token = getattr(_local, "token", None)
+    if token is not None:
+        token.raise_if_cancelled()
@@ -0,0 +1,62 @@
+import os
+import threading
+from typing import Dict, Tuple
+
+import boto3
+from botocore.config import Config
+
+
+class ClientFactory:
+    def __init__(self):
+        self.max_pool_connections = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "64"))
+        self.connect_timeout = float(os.getenv("AWS_CONNECT_TIMEOUT_SECONDS", "5"))
+        self.read_timeout = float(os.getenv("AWS_READ_TIMEOUT_SECONDS", "300"))
+
+        self.session = boto3.session.Session()
+        self.clients: Dict[Tuple[str, str], object] = {}
+        self.lock = threading.Lock()
+
+    def get_client(self, service_name: str, region: str):
+        """Get the shared client of an AWS service in a region, creating it on first use.
+
+        Clients are thread-safe and keep a connection pool sized for our concurrency, with
+        TCP keep-alive, so they are reused across requests instead of being rebuilt.
+        Retries are disabled since throttling is handled by the Bedrock scheduler and
+        failover by the region pool.
+
+        Args:
+            service_name (str): The AWS service name, e.g. "bedrock-runtime".
+            region (str): The AWS region.
+
+        Returns:
+            The shared client.
+        """
+        with self.lock:
+            client = self.clients.get((service_name, region), None)
+
+            if client is None:
+                client = self.session.client(
+                    service_name,
+                    region_name=region,
+                    config=Config(
+                        max_pool_connections=self.max_pool_connections,
+                        tcp_keepalive=True,
+                        connect_timeout=self.connect_timeout,
+                        read_timeout=self.read_timeout,
+                        retries={"mode": "standard", "total_max_attempts": 1},
+                    ),
+                )
+                self.clients[(service_name, region)] = client
+
+            return client
+
+    def close(self):
+        """Close the connection pools of every client."""
+        with self.lock:
+            for client in self.clients.values():
+                client.close()
+
+            self.clients = {}
+
+
+client_factory: ClientFactory = ClientFactory()
@@ -0,0 +1,441 @@
+import importlib
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Set
+
+from botocore.exceptions import (
+    ClientError,
+    ConnectTimeoutError,
+    EndpointConnectionError,
+    ReadTimeoutError,
+)
+from mypy_boto3_bedrock_runtime.client import BedrockRuntimeClient
+
+from .bedrock_scheduler import bedrock_scheduler
+from .client_factory import client_factory
+from .telemetry import model_telemetry
+
+RegionClientFactory = Callable[[str], BedrockRuntimeClient]
+
+RETRYABLE_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+    "InternalServerException",
+}
+
+
+def default_client_factory(region: str) -> BedrockRuntimeClient:
+    """Get the shared Bedrock runtime client of a region.
+
+    Args:
+        region (str): The AWS region.
+
+    Returns:
+        BedrockRuntimeClient: The Bedrock runtime client.
+    """
+    return client_factory.get_client("bedrock-runtime", region)
+
+
+def load_client_factory(path: str | None) -> RegionClientFactory:
+    """Load a client factory from a "module:function" path, e.g. to stub regions locally.
+
+    Args:
+        path (str | None): The path of the factory, or None for the default factory.
+
+    Returns:
+        RegionClientFactory: The client factory.
+    """
+    if not path:
+        return default_client_factory
+
+    module_name, function_name = path.split(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+class BedrockRegionPool:
+    def __init__(
+        self,
+        regions: Dict[str, float] | None = None,
+        client_factory: RegionClientFactory | None = None,
+    ):
+        """Create a pool of regional Bedrock clients.
+
+        Args:
+            regions (Dict[str, float] | None, optional): The weight of each region. Defaults to BEDROCK_REGIONS ("region:weight,...").
+            client_factory (RegionClientFactory | None, optional): Creates the client of a region. Defaults to BEDROCK_CLIENT_FACTORY or the shared client factory.
+        """
+        if regions is None:
+            regions = self.__parse_regions(os.getenv("BEDROCK_REGIONS", "us-east-2"))
+
+        self.client_factory = client_factory or load_client_factory(
+            os.getenv("BEDROCK_CLIENT_FACTORY", None)
+        )
+
+        self.failure_threshold = 3
+        self.unhealthy_cooldown = 30.0
+
+        self.hedging_enabled = os.getenv("BEDROCK_HEDGING_ENABLED", "false") == "true"
+        self.hedge_percentile = 0.95
+        self.hedge_min_samples = 20
+        self.hedge_min_delay = 1.0
+
+        self.lock = threading.Lock()
+        self.regions = {
+            region: {
+                "weight": weight,
+                "client": None,
+                "consecutive_failures": 0,
+                "unhealthy_until": 0.0,
+                "calls": 0,
+                "failures": 0,
+            }
+            for region, weight in regions.items()
+        }
+        self.latencies: Dict[str, deque] = {}
+        self.stats = {"hedged": 0, "hedge_wins": 0}
+
+        self.hedge_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("BEDROCK_HEDGE_WORKERS", "64")),
+            thread_name_prefix="bedrock-hedge",
+        )
+
+    def converse(
+        self, hedge: bool = False, telemetry: dict | None = None, **kwargs
+    ) -> dict:
+        """Call Converse in one of the regions.
+
+        Args:
+            hedge (bool, optional): Whether a slow interactive call may be duplicated to another region. Defaults to False.
+            telemetry (dict | None, optional): The telemetry record of the call, copied to record the discarded call of a hedge. Defaults to None.
+
+        Returns:
+            dict: The Converse response.
+        """
+        if hedge and self.hedging_enabled:
+            return self.__hedged_call("converse", kwargs, telemetry)
+
+        return self.__call("converse", kwargs)
+
+    def converse_stream(self, **kwargs) -> dict:
+        """Open a Converse stream in one of the regions.
+
+        Returns:
+            dict: The ConverseStream response.
+        """
+        return self.__call("converse_stream", kwargs)
+
+    def invoke_model(self, **kwargs) -> dict:
+        """Call InvokeModel in one of the regions.
+
+        Returns:
+            dict: The InvokeModel response.
+        """
+        return self.__call("invoke_model", kwargs)
+
+    def get_stats(self) -> dict:
+        """Get the health and call counters of each region.
+
+        Returns:
+            dict: The region states and hedging counters since the process started.
+        """
+        now = time.monotonic()
+
+        with self.lock:
+            return {
+                "regions": {
+                    region: {
+                        "weight": state["weight"],
+                        "healthy": state["unhealthy_until"] <= now,
+                        "calls": state["calls"],
+                        "failures": state["failures"],
+                    }
+                    for region, state in self.regions.items()
+                },
+                **self.stats,
+            }
+
+    def __parse_regions(self, value: str) -> Dict[str, float]:
+        """Parse a "region:weight,region" list. Regions without a weight get weight 1.
+
+        Args:
+            value (str): The region list.
+
+        Returns:
+            Dict[str, float]: The weight of each region.
+        """
+        regions = {}
+
+        for item in value.split(","):
+            if not item.strip():
+                continue
+
+            region, _, weight = item.strip().partition(":")
+            regions[region] = float(weight or 1)
+
+        return regions
+
+    def __get_client(self, region: str) -> BedrockRuntimeClient:
+        with self.lock:
+            state = self.regions[region]
+            if state["client"] is None:
+                state["client"] = self.client_factory(region)
+
+            return state["client"]
+
+    def __choose(self, exclude: Set[str]) -> str | None:
+        """Pick a region by weight among the healthy regions not yet tried.
+
+        Unhealthy regions are only picked when no healthy region is left.
+
+        Args:
+            exclude (Set[str]): The regions already tried.
+
+        Returns:
+            str | None: The chosen region, or None if every region was tried.
+        """
+        now = time.monotonic()
+
+        with self.lock:
+            candidates = [
+                (region, state["weight"])
+                for region, state in self.regions.items()
+                if region not in exclude
+            ]
+            healthy = [
+                (region, weight)
+                for region, weight in candidates
+                if self.regions[region]["unhealthy_until"] <= now
+            ]
+
+        candidates = healthy or candidates
+        if not candidates:
+            return None
+
+        regions, weights = zip(*candidates)
+        return random.choices(regions, weights=weights)[0]
+
+    def __call(self, method: str, kwargs: dict, region: str | None = None) -> dict:
+        """Call a client method, failing over to other regions on retryable errors.
+
+        Args:
+            method (str): The name of the client method.
+            kwargs (dict): The arguments of the call.
+            region (str | None, optional): The first region to try. Defaults to a weighted choice.
+
+        Raises:
+            ClientError: If every region failed, the error of the last region.
+
+        Returns:
+            dict: The response of the call.
+        """
+        tried = set()
+        region = region or self.__choose(tried)
+
+        while True:
+            tried.add(region)
+            start = time.monotonic()
+
+            try:
+                response = getattr(self.__get_client(region), method)(**kwargs)
+            except (
+                ClientError,
+                ConnectTimeoutError,
+                EndpointConnectionError,
+                ReadTimeoutError,
+            ) as e:
+                if not self.__is_retryable(e):
+                    raise
+
+                self.__record_failure(region)
+
+                region = self.__choose(tried)
+                if region is None:
+                    raise
+
+                continue
+
+            self.__record_success(region, method, kwargs, time.monotonic() - start)
+            return response
+
+    def __hedged_call(
+        self, method: str, kwargs: dict, telemetry: dict | None = None
+    ) -> dict:
+        """Call a client method and duplicate it to another region if it is slower than usual.
+
+        The duplicate is sent once the call exceeds the p95 latency of the model, and only
+        if an interactive slot of the scheduler is free, so hedges never add load while
+        the scheduler is backing off. The first successful response wins. The other call
+        is left to finish, discarded and recorded in telemetry as cancelled.
+
+        Args:
+            method (str): The name of the client method.
+            kwargs (dict): The arguments of the call.
+            telemetry (dict | None, optional): The telemetry record of the call. Defaults to None.
+
+        Returns:
+            dict: The first successful response.
+        """
+        delay = self.__get_hedge_delay(kwargs.get("modelId"))
+        primary = self.__choose(set())
+
+        if delay is None or len(self.regions) < 2:
+            return self.__call(method, kwargs, primary)
+
+        start = time.monotonic()
+        futures = {
+            self.hedge_executor.submit(self.__call, method, kwargs, primary): primary
+        }
+        done, _ = wait(futures, timeout=delay)
+
+        if not done:
+            secondary = self.__choose({primary})
+            if secondary is not None and bedrock_scheduler.try_acquire("interactive"):
+                futures[
+                    self.hedge_executor.submit(
+                        self.__scheduled_call, method, kwargs, secondary
+                    )
+                ] = secondary
+
+                with self.lock:
+                    self.stats["hedged"] += 1
+
+        pending = set(futures)
+        error = None
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+
+                if futures[future] != primary:
+                    with self.lock:
+                        self.stats["hedge_wins"] += 1
+
+                if telemetry is not None:
+                    for other in futures:
+                        if other is not future:
+                            other.add_done_callback(
+                                lambda f: self.__record_discarded(f, telemetry, start)
+                            )
+
+                return future.result()
+
+        raise error
+
+    def __scheduled_call(self, method: str, kwargs: dict, region: str) -> dict:
+        """Run the duplicate call of a hedge in the interactive slot taken for it.
+
+        Args:
+            method (str): The name of the client method.
+            kwargs (dict): The arguments of the call.
+            region (str): The region of the duplicate.
+
+        Returns:
+            dict: The response of the call.
+        """
+        try:
+            response = self.__call(method, kwargs, region)
+        except Exception as e:
+            bedrock_scheduler.observe(e)
+            raise
+        finally:
+            bedrock_scheduler.release("interactive")
+
+        bedrock_scheduler.observe()
+        return response
+
+    def __record_discarded(self, future: Future, telemetry: dict, start: float):
+        """Record the call of a hedge whose response was discarded.
+
+        Args:
+            future (Future): The discarded call.
+            telemetry (dict): The telemetry record of the winning call, used as a template.
+            start (float): When the hedged call started, from `time.monotonic`.
+        """
+        invocation = {
+            **telemetry,
+            "message_id": None,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cache_read_input_tokens": 0,
+            "cache_write_input_tokens": 0,
+            "retries": 0,
+            "model_latency_ms": None,
+            "latency_ms": int((time.monotonic() - start) * 1000),
+            "outcome": "error" if future.exception() is not None else "cancelled",
+        }
+
+        if future.exception() is None:
+            model_telemetry.set_usage(
+                invocation,
+                future.result().get("usage", {}),
+                future.result().get("metrics", {}),
+            )
+
+        model_telemetry.record(invocation)
+
+    def __get_hedge_delay(self, model_id: str | None) -> float | None:
+        """Get the delay before hedging a call, from the recent latencies of the model.
+
+        Args:
+            model_id (str | None): The model of the call.
+
+        Returns:
+            float | None: The delay in seconds, or None if there are too few samples.
+        """
+        with self.lock:
+            samples = sorted(self.latencies.get(model_id, []))
+
+        if len(samples) < self.hedge_min_samples:
+            return None
+
+        p95 = samples[min(len(samples) - 1, int(len(samples) * self.hedge_percentile))]
+        return max(self.hedge_min_delay, p95)
+
+    def __is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, ClientError):
+            return error.response.get("Error", {}).get("Code") in RETRYABLE_ERROR_CODES
+
+        return True
+
+    def __record_success(self, region: str, method: str, kwargs: dict, latency: float):
+        with self.lock:
+            state = self.regions[region]
+            state["calls"] += 1
+            state["consecutive_failures"] = 0
+
+            if method == "converse":
+                model_id = kwargs.get("modelId")
+                self.latencies.setdefault(model_id, deque(maxlen=200)).append(latency)
+
+    def __record_failure(self, region: str):
+        """Count a failed call, marking the region unhealthy after consecutive failures.
+
+        Args:
+            region (str): The region of the failed call.
+        """
+        with self.lock:
+            state = self.regions[region]
+            state["calls"] += 1
+            state["failures"] += 1
+            state["consecutive_failures"] += 1
+
+            if state["consecutive_failures"] >= self.failure_threshold:
+                state["unhealthy_until"] = time.monotonic() + self.unhealthy_cooldown
+                state["consecutive_failures"] = 0
+
+    def shutdown(self):
+        """Shut down the hedging thread pool without waiting for discarded calls."""
+        self.hedge_executor.shutdown(wait=False)
+
+
+bedrock_region_pool: BedrockRegionPool = BedrockRegionPool()
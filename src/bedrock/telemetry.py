@@ -0,0 +1,224 @@
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import List
+
+from fastapi import HTTPException
+from sqlalchemy import insert
+
+from src.db import db_connection
+from src.db.tables import ModelInvocation
+
+from .cancellation import OperationCancelled
+
+USAGE_FIELDS = {
+    "inputTokens": "input_tokens",
+    "outputTokens": "output_tokens",
+    "cacheReadInputTokens": "cache_read_input_tokens",
+    "cacheWriteInputTokens": "cache_write_input_tokens",
+}
+
+
+class ModelTelemetry:
+    def __init__(self):
+        self.enabled = os.getenv("MODEL_TELEMETRY_ENABLED", "true") == "true"
+        self.flush_interval = float(os.getenv("MODEL_TELEMETRY_FLUSH_SECONDS", "2"))
+        self.batch_size = 200
+
+        self.queue: queue.Queue = queue.Queue(maxsize=10000)
+        self.lock = threading.Lock()
+        self.worker = None
+        self.stopped = threading.Event()
+
+    def start(
+        self,
+        operation: str,
+        model_id: str,
+        agent_label: str,
+        priority: str,
+        chat_id=None,
+    ) -> dict:
+        """Start the telemetry record of a model invocation.
+
+        The record is filled by the Bedrock scheduler (latency, retries and outcome) and by
+        the caller (usage and linked message), then submitted with `record`.
+
+        Args:
+            operation (str): The Bedrock operation, e.g. "converse" or "invoke_model".
+            model_id (str): The invoked model.
+            agent_label (str): What the invocation is for, e.g. the label of the agent.
+            priority (str): The scheduling lane of the invocation.
+            chat_id (UUID, optional): The chat of the invocation, if any. Defaults to None.
+
+        Returns:
+            dict: The invocation record.
+        """
+        return {
+            "operation": operation,
+            "model_id": model_id,
+            "agent_label": agent_label,
+            "priority": priority,
+            "chat_id": chat_id,
+            "message_id": None,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cache_read_input_tokens": 0,
+            "cache_write_input_tokens": 0,
+            "latency_ms": 0,
+            "model_latency_ms": None,
+            "retries": 0,
+            "outcome": "error",
+        }
+
+    @contextmanager
+    def track(self, invocation: dict | None):
+        """Measure the latency and outcome of a model invocation.
+
+        Calls rejected after exhausting the throttling retries are recorded as
+        "throttled", and streams closed before their end or calls of cancelled work as
+        "cancelled".
+
+        Args:
+            invocation (dict | None): The invocation record, or None to skip tracking.
+        """
+        if invocation is None:
+            yield
+            return
+
+        start = time.monotonic()
+        invocation["outcome"] = "error"
+
+        try:
+            yield
+            invocation["outcome"] = "success"
+        except (GeneratorExit, OperationCancelled):
+            invocation["outcome"] = "cancelled"
+            raise
+        except HTTPException as e:
+            if e.status_code in (429, 503):
+                invocation["outcome"] = "throttled"
+            raise
+        finally:
+            invocation["latency_ms"] = int((time.monotonic() - start) * 1000)
+
+    def set_usage(self, invocation: dict, usage: dict, metrics: dict | None = None):
+        """Copy the token usage and model latency of a Converse response into a record.
+
+        Args:
+            invocation (dict): The invocation record.
+            usage (dict): The `usage` of the response.
+            metrics (dict | None, optional): The `metrics` of the response. Defaults to None.
+        """
+        for usage_field, field in USAGE_FIELDS.items():
+            invocation[field] = usage.get(usage_field, 0)
+
+        if metrics and "latencyMs" in metrics:
+            invocation["model_latency_ms"] = metrics["latencyMs"]
+
+    def set_invoke_model_usage(self, invocation: dict, response: dict):
+        """Copy the token count and model latency of an InvokeModel response into a record.
+
+        Args:
+            invocation (dict): The invocation record.
+            response (dict): The InvokeModel response.
+        """
+        headers = response.get("ResponseMetadata", {}).get("HTTPHeaders", {})
+
+        invocation["input_tokens"] = int(
+            headers.get("x-amzn-bedrock-input-token-count", 0)
+        )
+        if "x-amzn-bedrock-invocation-latency" in headers:
+            invocation["model_latency_ms"] = int(
+                headers["x-amzn-bedrock-invocation-latency"]
+            )
+
+    def record(self, invocation: dict):
+        """Queue an invocation record to be written in the background.
+
+        Records are written in batches so telemetry never adds a database round trip to
+        the model call. Records are dropped if the queue is full.
+
+        Args:
+            invocation (dict): The invocation record.
+        """
+        if not self.enabled:
+            return
+
+        self.__ensure_worker()
+
+        try:
+            self.queue.put_nowait(dict(invocation))
+        except queue.Full:
+            print("Model telemetry queue is full, dropping invocation record")
+
+    def shutdown(self):
+        """Stop the writer thread, writing the records still queued."""
+        self.stopped.set()
+
+        if self.worker is not None:
+            self.worker.join(timeout=self.flush_interval * 2)
+
+    def __ensure_worker(self):
+        with self.lock:
+            if self.worker is None:
+                self.worker = threading.Thread(
+                    target=self.__run, name="model-telemetry", daemon=True
+                )
+                self.worker.start()
+
+    def __run(self):
+        while True:
+            stopped = self.stopped.wait(self.flush_interval)
+
+            while not self.queue.empty():
+                self.__write(self.__drain())
+
+            if stopped:
+                return
+
+    def __drain(self) -> List[dict]:
+        rows = []
+
+        while len(rows) < self.batch_size:
+            try:
+                rows.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+
+        return rows
+
+    def __write(self, rows: List[dict]):
+        """Write a batch of records, falling back to one by one if the batch fails.
+
+        A batch fails as a whole when a single record references a chat or message
+        deleted meanwhile, so the remaining records are still written and the failing
+        ones are logged.
+
+        Args:
+            rows (List[dict]): The invocation records.
+        """
+        if not rows:
+            return
+
+        try:
+            with db_connection.get_session() as session:
+                session.execute(insert(ModelInvocation), rows)
+                session.commit()
+            return
+        except Exception as e:
+            print(f"Error writing {len(rows)} model invocation records: {e}")
+
+        for row in rows:
+            try:
+                with db_connection.get_session() as session:
+                    session.execute(insert(ModelInvocation), [row])
+                    session.commit()
+            except Exception as e:
+                print(
+                    f"Error writing {row['operation']} invocation record of {row['model_id']}: {e}"
+                )
+
+
+model_telemetry: ModelTelemetry = ModelTelemetry()
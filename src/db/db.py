@@ -19,6 +19,8 @@ class DatabaseConnection:
 
         self.engine = create_engine(
             connection_string,
+            pool_size=int(os.getenv("SQL_DB_POOL_SIZE", "5")),
+            max_overflow=int(os.getenv("SQL_DB_MAX_OVERFLOW", "10")),
         )
 
         self.session_factory = sessionmaker(
@@ -38,6 +40,23 @@ class DatabaseConnection:
         finally:
             session.close()
 
+    def release(self, session):
+        """Commit a session so its connection returns to the pool, keeping loaded objects usable.
+
+        Objects are not expired by this commit, so their loaded attributes can still be read
+        during long operations (such as model calls) without checking out a connection.
+        The session acquires a new connection on its next query.
+
+        Args:
+            session (Session): The session to release.
+        """
+        expire_on_commit = session.expire_on_commit
+        session.expire_on_commit = False
+        try:
+            session.commit()
+        finally:
+            session.expire_on_commit = expire_on_commit
+
     def dispose(self):
         self.engine.dispose()
 
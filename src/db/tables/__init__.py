@@ -9,3 +9,8 @@ from .plan import Plan
 from .chunk import Chunk
 from .document import Document
 from .knowledge_base import KnowledgeBase
+from .model_invocation import ModelInvocation
+from .generation_job import GenerationJob
+from .cached_content import CachedContent
+from .plan_template import PlanTemplate
+from .plan_develop_request import PlanDevelopRequest
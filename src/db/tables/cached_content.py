@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.db.tables import Base
+
+
+class CachedContent(Base):
+    __tablename__ = "cached_content"
+
+    profile_fingerprint: Mapped[str] = mapped_column(nullable=False)
+    agent_version: Mapped[str] = mapped_column(nullable=False)
+    knowledge_base_revision: Mapped[str] = mapped_column(nullable=False)
+    embedding_version: Mapped[str] = mapped_column(nullable=False)
+    objective_embedding: Mapped[list[float]] = mapped_column(Vector(), nullable=False)
+    title: Mapped[str] = mapped_column(nullable=True)
+    objective: Mapped[str] = mapped_column(nullable=False)
+    text_content: Mapped[str] = mapped_column(nullable=False)
+    hits: Mapped[int] = mapped_column(nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(
+        server_default=text("now()"), nullable=False
+    )
+    expires_at: Mapped[datetime] = mapped_column(nullable=False)
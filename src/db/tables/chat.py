@@ -1,4 +1,5 @@
 from datetime import datetime, timezone
+from typing import Optional
 from uuid import UUID
 
 from sqlalchemy import ForeignKey, text
@@ -17,9 +18,14 @@ class Chat(Base):
         server_default=text("now()"),
         nullable=False,
     )
+    summary: Mapped[Optional[str]] = mapped_column(nullable=True, default=None)
+    summarized_message_count: Mapped[int] = mapped_column(nullable=False, default=0)
 
     messages: Mapped[list["Message"]] = relationship(  # type: ignore
-        "Message", back_populates="chat", cascade="all, delete-orphan"
+        "Message",
+        back_populates="chat",
+        cascade="all, delete-orphan",
+        order_by="Message.seq",
     )
 
     plans: Mapped[list["Plan"]] = relationship("Plan", back_populates="chat")  # type: ignore
@@ -12,7 +12,11 @@ class Chunk(Base):
 
     document_id: Mapped[UUID] = mapped_column(ForeignKey("document.id"), nullable=False)
     content: Mapped[str] = mapped_column(String, nullable=False)
-    embedding: Mapped[list[float]] = mapped_column(Vector(1536), nullable=False)
+    embedding: Mapped[list[float]] = mapped_column(Vector(), nullable=False)
+    embedding_version: Mapped[str] = mapped_column(
+        String, nullable=False, default="cohere-embed-v4-1536"
+    )
     index: Mapped[int] = mapped_column(Integer, nullable=False)
+    modality: Mapped[str] = mapped_column(String, nullable=False, default="text")
 
     document: Mapped["Document"] = relationship("Document", back_populates="chunks")  # type: ignore
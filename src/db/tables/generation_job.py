@@ -0,0 +1,36 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import ForeignKey, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.db.tables import Base
+
+
+class GenerationJob(Base):
+    __tablename__ = "generation_job"
+
+    job_type: Mapped[str] = mapped_column(nullable=False)
+    plan_id: Mapped[UUID] = mapped_column(ForeignKey("plan.id"), nullable=False)
+    module_id: Mapped[Optional[UUID]] = mapped_column(
+        ForeignKey("module.id"), nullable=True
+    )
+    user_id: Mapped[UUID] = mapped_column(ForeignKey("user.id"), nullable=False)
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+    status: Mapped[str] = mapped_column(nullable=False, default="pending")
+    epoch: Mapped[int] = mapped_column(nullable=False, default=0)
+    priority: Mapped[int] = mapped_column(nullable=False, default=0)
+    attempts: Mapped[int] = mapped_column(nullable=False, default=0)
+    max_attempts: Mapped[int] = mapped_column(nullable=False, default=3)
+    run_after: Mapped[datetime] = mapped_column(
+        server_default=text("now()"), nullable=False
+    )
+    locked_at: Mapped[Optional[datetime]] = mapped_column(nullable=True)
+    locked_by: Mapped[Optional[str]] = mapped_column(nullable=True)
+    last_error: Mapped[Optional[str]] = mapped_column(nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        server_default=text("now()"), nullable=False
+    )
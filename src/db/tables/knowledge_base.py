@@ -1,4 +1,6 @@
-from sqlalchemy.orm import Mapped, relationship
+from typing import Optional
+
+from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from src.db.tables import Base
 
@@ -6,6 +8,14 @@ from src.db.tables import Base
 class KnowledgeBase(Base):
     __tablename__ = "knowledge_base"
 
+    embedding_version: Mapped[str] = mapped_column(
+        nullable=False, default="cohere-embed-v4-1536"
+    )
+    pending_embedding_version: Mapped[Optional[str]] = mapped_column(
+        nullable=True, default=None
+    )
+    revision: Mapped[int] = mapped_column(nullable=False, default=0)
+
     documents: Mapped[list["Document"]] = relationship(  # type: ignore
         "Document", back_populates="knowledge_base", cascade="all, delete-orphan"
     )
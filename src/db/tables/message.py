@@ -1,7 +1,7 @@
-from datetime import datetime, timezone
+from datetime import datetime
 from uuid import UUID
 
-from sqlalchemy import ForeignKey, text
+from sqlalchemy import BigInteger, ForeignKey, Identity, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -16,8 +16,8 @@ class Message(Base):
     dict_content: Mapped[dict] = mapped_column(JSONB, nullable=True)
     content_type: Mapped[str] = mapped_column(nullable=False)
     role: Mapped[str] = mapped_column(nullable=False)
+    seq: Mapped[int] = mapped_column(BigInteger, Identity(), nullable=False)
     created_at: Mapped[datetime] = mapped_column(
-        default=datetime.now(timezone.utc),
         server_default=text("now()"),
         nullable=False,
     )
@@ -0,0 +1,34 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import ForeignKey, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.db.tables import Base
+
+
+class ModelInvocation(Base):
+    __tablename__ = "model_invocation"
+
+    chat_id: Mapped[Optional[UUID]] = mapped_column(
+        ForeignKey("chat.id"), nullable=True
+    )
+    message_id: Mapped[Optional[UUID]] = mapped_column(
+        ForeignKey("message.id"), nullable=True
+    )
+    agent_label: Mapped[str] = mapped_column(nullable=False)
+    model_id: Mapped[str] = mapped_column(nullable=False)
+    operation: Mapped[str] = mapped_column(nullable=False)
+    priority: Mapped[str] = mapped_column(nullable=False)
+    input_tokens: Mapped[int] = mapped_column(nullable=False, default=0)
+    output_tokens: Mapped[int] = mapped_column(nullable=False, default=0)
+    cache_read_input_tokens: Mapped[int] = mapped_column(nullable=False, default=0)
+    cache_write_input_tokens: Mapped[int] = mapped_column(nullable=False, default=0)
+    latency_ms: Mapped[int] = mapped_column(nullable=False)
+    model_latency_ms: Mapped[Optional[int]] = mapped_column(nullable=True)
+    retries: Mapped[int] = mapped_column(nullable=False, default=0)
+    outcome: Mapped[str] = mapped_column(nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        server_default=text("now()"), nullable=False
+    )
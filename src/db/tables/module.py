@@ -15,6 +15,7 @@ class Module(Base):
     description: Mapped[str] = mapped_column(nullable=True)
     order: Mapped[int] = mapped_column(nullable=False, default=1)
     status: Mapped[str] = mapped_column(nullable=False, default="creating_outline")
+    speculative: Mapped[bool] = mapped_column(nullable=False, default=False)
 
     plan: Mapped["Plan"] = relationship(  # type: ignore
         "Plan", back_populates="modules"
@@ -1,4 +1,5 @@
 from datetime import datetime, timezone
+from typing import Optional
 from uuid import UUID
 
 from fastapi import HTTPException
@@ -26,9 +27,23 @@ class Plan(Base):
         nullable=False,
     )
     status: Mapped[str] = mapped_column(nullable=False, default="creating_outline")
+    origin: Mapped[Optional[str]] = mapped_column(nullable=True, default=None)
+    saved_at: Mapped[Optional[datetime]] = mapped_column(nullable=True, default=None)
+    template_id: Mapped[Optional[UUID]] = mapped_column(
+        ForeignKey("plan_template.id"), nullable=True, default=None
+    )
+    generation_epoch: Mapped[int] = mapped_column(nullable=False, default=0)
 
     modules: Mapped[list["Module"]] = relationship(  # type: ignore
-        "Module", back_populates="plan", cascade="all, delete-orphan"
+        "Module",
+        back_populates="plan",
+        cascade="all, delete-orphan",
+        primaryjoin="and_(Plan.id == Module.plan_id, Module.speculative.is_(False))",
+    )
+    speculative_modules: Mapped[list["Module"]] = relationship(  # type: ignore
+        "Module",
+        primaryjoin="and_(Plan.id == Module.plan_id, Module.speculative.is_(True))",
+        viewonly=True,
     )
 
     user: Mapped["User"] = relationship("User", back_populates="plans")  # type: ignore
@@ -0,0 +1,20 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import ForeignKey, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.db.tables import Base
+
+
+class PlanDevelopRequest(Base):
+    __tablename__ = "plan_develop_request"
+
+    plan_id: Mapped[UUID] = mapped_column(ForeignKey("plan.id"), nullable=False)
+    idempotency_key: Mapped[Optional[str]] = mapped_column(nullable=True)
+    status: Mapped[str] = mapped_column(nullable=False, default="running")
+    created_at: Mapped[datetime] = mapped_column(
+        server_default=text("now()"), nullable=False
+    )
+    finished_at: Mapped[Optional[datetime]] = mapped_column(nullable=True)
@@ -0,0 +1,28 @@
+from datetime import datetime
+from uuid import UUID
+
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import ForeignKey, text
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from src.db.tables import Base
+
+
+class PlanTemplate(Base):
+    __tablename__ = "plan_template"
+
+    source_plan_id: Mapped[UUID] = mapped_column(
+        ForeignKey("plan.id"), nullable=False, unique=True
+    )
+    profile_fingerprint: Mapped[str] = mapped_column(nullable=False)
+    embedding_version: Mapped[str] = mapped_column(nullable=False)
+    outline_embedding: Mapped[list[float]] = mapped_column(Vector(), nullable=False)
+    modules_count: Mapped[int] = mapped_column(nullable=False)
+    clone_count: Mapped[int] = mapped_column(nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(
+        server_default=text("now()"), nullable=False
+    )
+
+    source_plan: Mapped["Plan"] = relationship(  # type: ignore
+        "Plan", foreign_keys=[source_plan_id]
+    )
@@ -1,7 +1,14 @@
 from .base_dto import BaseDTO
 from .response_dto import ResponseDTO
 from .user_dto import UserCreateDTO, UserDTO, UserLoginDTO, UserLoginResponseDTO
-from .chat import MessageDTO, MessageDictContentDTO, MessageTextContentDTO, ChatDTO
+from .chat import (
+    MessageDTO,
+    MessageDictContentDTO,
+    MessageTextContentDTO,
+    ChatDTO,
+    RetrievalStatsDTO,
+    PromptCacheStatsDTO,
+)
 from .plan import (
     PlanDTO,
     PlanCreateDTO,
@@ -12,6 +19,10 @@ from .plan import (
     ModuleDTO,
     PlanWithAllMessagesDTO,
     ContentListDTO,
+    PlanGenerationStatusDTO,
+    PlanTemplateMatchDTO,
+    ContentGenerationStatusDTO,
+    ModuleGenerationStatusDTO,
 )
 from .knowledge_base import (
     KnowledgeBaseCreateDTO,
@@ -20,3 +31,8 @@ from .knowledge_base import (
     DocumentCreateDTO,
     DocumentListDTO,
 )
+from .metrics import (
+    GenerationCancellationMetricsDTO,
+    ModelInvocationMetricsDTO,
+    PlanOriginMetricsDTO,
+)
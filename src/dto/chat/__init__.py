@@ -4,3 +4,5 @@ from .message_dto import (
     MessageDictContentDTO,
 )
 from .chat_dto import ChatDTO
+from .retrieval_stats_dto import RetrievalStatsDTO
+from .prompt_cache_stats_dto import PromptCacheStatsDTO
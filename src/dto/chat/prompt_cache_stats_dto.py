@@ -0,0 +1,10 @@
+from pydantic import BaseModel, Field
+
+
+class PromptCacheStatsDTO(BaseModel):
+    calls: int = Field(alias="calls")
+    cache_hits: int = Field(alias="cache_hits")
+    cache_misses: int = Field(alias="cache_misses")
+    input_tokens: int = Field(alias="input_tokens")
+    cache_read_input_tokens: int = Field(alias="cache_read_input_tokens")
+    cache_write_input_tokens: int = Field(alias="cache_write_input_tokens")
@@ -0,0 +1,8 @@
+from pydantic import BaseModel, Field
+
+
+class RetrievalStatsDTO(BaseModel):
+    retrieved: int = Field(alias="retrieved")
+    skipped: int = Field(alias="skipped")
+    reused: int = Field(alias="reused")
+    avoided: int = Field(alias="avoided")
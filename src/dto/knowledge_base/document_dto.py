@@ -26,3 +26,4 @@ class DocumentListDTO(DocumentBaseDTO):
 
 class DocumentCreateDTO(DocumentBaseDTO):
     data: bytes = Field(alias="data")
+    extract_image_text: bool = Field(alias="extract_image_text", default=False)
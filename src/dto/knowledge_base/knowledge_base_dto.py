@@ -1,3 +1,4 @@
+from typing import Optional
 from uuid import UUID
 
 from pydantic import Field
@@ -11,6 +12,10 @@ class KnowledgeBaseBaseDTO(BaseDTO):
 
 class KnowledgeBaseDTO(KnowledgeBaseBaseDTO):
     id: UUID = Field(alias="knowledge_base_id")
+    embedding_version: str = Field(alias="embedding_version")
+    pending_embedding_version: Optional[str] = Field(
+        alias="pending_embedding_version", default=None
+    )
 
 
 class KnowledgeBaseCreateDTO(KnowledgeBaseBaseDTO):
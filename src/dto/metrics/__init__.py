@@ -0,0 +1,3 @@
+from .generation_cancellation_metrics_dto import GenerationCancellationMetricsDTO
+from .model_invocation_metrics_dto import ModelInvocationMetricsDTO
+from .plan_origin_metrics_dto import PlanOriginMetricsDTO
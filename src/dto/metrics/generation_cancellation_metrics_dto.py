@@ -0,0 +1,8 @@
+from pydantic import BaseModel, Field
+
+
+class GenerationCancellationMetricsDTO(BaseModel):
+    job_type: str = Field(alias="job_type")
+    cancelled_jobs: int = Field(alias="cancelled_jobs")
+    estimated_saved_input_tokens: int = Field(alias="estimated_saved_input_tokens")
+    estimated_saved_output_tokens: int = Field(alias="estimated_saved_output_tokens")
@@ -0,0 +1,22 @@
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class ModelInvocationMetricsDTO(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+
+    agent_label: str = Field(alias="agent_label")
+    model_id: str = Field(alias="model_id")
+    calls: int = Field(alias="calls")
+    errors: int = Field(alias="errors")
+    throttled: int = Field(alias="throttled")
+    cancelled: int = Field(alias="cancelled")
+    retries: int = Field(alias="retries")
+    input_tokens: int = Field(alias="input_tokens")
+    output_tokens: int = Field(alias="output_tokens")
+    cache_read_input_tokens: int = Field(alias="cache_read_input_tokens")
+    cache_write_input_tokens: int = Field(alias="cache_write_input_tokens")
+    latency_p50_ms: float | None = Field(alias="latency_p50_ms")
+    latency_p95_ms: float | None = Field(alias="latency_p95_ms")
+    latency_p99_ms: float | None = Field(alias="latency_p99_ms")
+    input_tokens_per_second: float | None = Field(alias="input_tokens_per_second")
+    output_tokens_per_second: float | None = Field(alias="output_tokens_per_second")
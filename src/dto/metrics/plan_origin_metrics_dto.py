@@ -0,0 +1,8 @@
+from pydantic import BaseModel, Field
+
+
+class PlanOriginMetricsDTO(BaseModel):
+    plans_saved: int = Field(alias="plans_saved")
+    plans_generated: int = Field(alias="plans_generated")
+    plans_cloned: int = Field(alias="plans_cloned")
+    clone_ratio: float | None = Field(alias="clone_ratio")
@@ -1,3 +1,9 @@
 from .content_dto import ContentDTO, ContentCreateDTO, ContentListDTO
 from .module_dto import ModuleListDTO, ModuleCreateDTO, ModuleDTO
+from .module_generation_status_dto import (
+    ContentGenerationStatusDTO,
+    ModuleGenerationStatusDTO,
+)
+from .plan_template_dto import PlanTemplateMatchDTO
 from .plan_dto import PlanDTO, PlanCreateDTO, PlanWithAllMessagesDTO
+from .plan_generation_status_dto import PlanGenerationStatusDTO
@@ -38,6 +38,7 @@ class ModuleListDTO(ModuleBaseDTO):
 class ModuleDTO(ModuleBaseDTO):
     id: UUID = Field(alias="module_id")
     contents: Optional[list[ContentListDTO]] = Field(alias="contents", default=None)
+    failed_count: int = Field(alias="failed_count", default=0)
 
     @classmethod
     def from_entity(cls, entity: Module):
@@ -0,0 +1,25 @@
+from typing import Literal, Optional
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+
+class ContentGenerationStatusDTO(BaseModel):
+    order: int = Field(alias="order")
+    content_type: str = Field(alias="content_type")
+    title: Optional[str] = Field(alias="title", default=None)
+    status: Literal["pending", "running", "failed", "done"] = Field(alias="status")
+    attempts: int = Field(alias="attempts", default=0)
+    last_error: Optional[str] = Field(alias="last_error", default=None)
+
+
+class ModuleGenerationStatusDTO(BaseModel):
+    id: UUID = Field(alias="module_id")
+    status: Literal["creating_outline", "creating_contents", "created", "completed"] = (
+        Field(alias="status")
+    )
+    outline_status: Optional[Literal["pending", "running", "failed", "done"]] = Field(
+        alias="outline_status", default=None
+    )
+    contents: list[ContentGenerationStatusDTO] = Field(alias="contents", default=[])
+    failed_count: int = Field(alias="failed_count", default=0)
@@ -7,6 +7,8 @@ from pydantic import Field
 from src.db.tables import Plan
 from src.dto import BaseDTO, MessageDTO
 
+from .plan_template_dto import PlanTemplateMatchDTO
+
 
 class PlanBaseDTO(BaseDTO):
     title: str = Field(alias="title")
@@ -37,6 +39,10 @@ class PlanDTO(PlanBaseDTO):
     created_at: datetime = Field(alias="created_at")
     last_viewed_at: datetime = Field(alias="last_viewed_at")
     last_message: Optional[MessageDTO] = Field(alias="last_message", default=None)
+    template_match: Optional[PlanTemplateMatchDTO] = Field(
+        alias="template_match", default=None
+    )
+    attached: bool = Field(alias="attached", default=False, exclude=True)
 
     @classmethod
     def from_entity(cls: type["PlanDTO"], entity: Plan) -> "PlanDTO":
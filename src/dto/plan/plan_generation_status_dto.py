@@ -0,0 +1,23 @@
+from typing import Literal
+from uuid import UUID
+
+from pydantic import Field
+
+from src.db.tables import Plan
+from src.dto import BaseDTO
+
+from .module_dto import ModuleListDTO
+
+
+class PlanGenerationStatusDTO(BaseDTO):
+    id: UUID = Field(alias="plan_id")
+    status: Literal["creating_outline", "creating_modules", "created", "completed"] = (
+        Field(alias="status")
+    )
+    modules: list[ModuleListDTO] = Field(alias="modules", default=[])
+
+    @classmethod
+    def from_entity(cls, entity: Plan):
+        dto: PlanGenerationStatusDTO = super().from_entity(entity)
+        dto.modules = sorted(dto.modules, key=lambda m: m.order)
+        return dto
@@ -0,0 +1,12 @@
+from typing import Optional
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+
+class PlanTemplateMatchDTO(BaseModel):
+    id: UUID = Field(alias="template_id")
+    title: str = Field(alias="title")
+    description: Optional[str] = Field(alias="description", default=None)
+    modules_count: int = Field(alias="modules_count")
+    similarity: float = Field(alias="similarity")
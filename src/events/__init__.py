@@ -0,0 +1,9 @@
+from .event_broker import (
+    EventBackend,
+    EventBroker,
+    InProcessBackend,
+    Subscription,
+    event_broker,
+    stream_events,
+    user_channel,
+)
@@ -0,0 +1,235 @@
+import asyncio
+import importlib
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Callable, Dict, List, Set
+from uuid import UUID
+
+Deliver = Callable[[str, dict], None]
+
+
+class EventBackend(ABC):
+    """Transports published events to the broker of every process.
+
+    The in-process backend delivers events to the local subscribers only. A backend
+    shared by several workers (e.g. Postgres LISTEN/NOTIFY) publishes events to the
+    other processes and calls `deliver` for each event it receives.
+    """
+
+    def start(self, deliver: Deliver):
+        """Start receiving events.
+
+        Args:
+            deliver (Deliver): Called with the channel and event of every received event.
+        """
+        self.deliver = deliver
+
+    @abstractmethod
+    def publish(self, channel: str, event: dict):
+        """Publish an event to every process.
+
+        Args:
+            channel (str): The channel of the event.
+            event (dict): The event, as a JSON-serializable {"event": name, "data": payload} dict.
+        """
+
+    def close(self):
+        """Stop receiving events."""
+
+
+class InProcessBackend(EventBackend):
+    def publish(self, channel: str, event: dict):
+        self.deliver(channel, event)
+
+
+def load_backend(path: str | None) -> EventBackend:
+    """Load an event backend from a "module:function" path returning it.
+
+    Args:
+        path (str | None): The path of the backend factory, or None for the in-process backend.
+
+    Returns:
+        EventBackend: The event backend.
+    """
+    if not path:
+        return InProcessBackend()
+
+    module_name, function_name = path.split(":")
+    return getattr(importlib.import_module(module_name), function_name)()
+
+
+class EventBroker:
+    def __init__(self, backend: EventBackend | None = None):
+        """Create a publish/subscribe broker for server-push events.
+
+        Args:
+            backend (EventBackend | None, optional): The transport of the events. Defaults to EVENT_BROKER_BACKEND or the in-process backend.
+        """
+        self.backend = backend or load_backend(os.getenv("EVENT_BROKER_BACKEND", None))
+        self.queue_size = 256
+
+        self.lock = threading.Lock()
+        self.subscribers: Dict[str, Set["Subscription"]] = {}
+
+        self.backend.start(self.__deliver)
+
+    def publish(self, channel: str, event: str, data: dict):
+        """Publish an event. Safe to call from any thread, and never raises.
+
+        Args:
+            channel (str): The channel of the event, e.g. "user:<id>".
+            event (str): The name of the event.
+            data (dict): The JSON-serializable payload of the event.
+        """
+        try:
+            self.backend.publish(channel, {"event": event, "data": data})
+        except Exception as e:
+            print(f"Error publishing {event} event to {channel}: {e}")
+
+    def subscribe(self, channel: str) -> "Subscription":
+        """Start receiving the events published to a channel.
+
+        Must be called from the event loop. Events are buffered per subscription; a
+        subscriber too slow to keep up loses the oldest events.
+
+        Args:
+            channel (str): The channel to subscribe to.
+
+        Returns:
+            Subscription: The subscription, to be closed once no longer used.
+        """
+        subscription = Subscription(self, channel, self.queue_size)
+
+        with self.lock:
+            self.subscribers.setdefault(channel, set()).add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription: "Subscription"):
+        """Stop delivering events to a subscription.
+
+        Args:
+            subscription (Subscription): The subscription.
+        """
+        with self.lock:
+            channel_subscribers = self.subscribers.get(subscription.channel, set())
+            channel_subscribers.discard(subscription)
+            if not channel_subscribers:
+                self.subscribers.pop(subscription.channel, None)
+
+    def close(self):
+        """Stop the backend."""
+        self.backend.close()
+
+    def __deliver(self, channel: str, event: dict):
+        with self.lock:
+            subscriptions = list(self.subscribers.get(channel, ()))
+
+        for subscription in subscriptions:
+            subscription.put(event)
+
+
+class Subscription:
+    def __init__(self, broker: EventBroker, channel: str, queue_size: int):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+
+    def put(self, event: dict):
+        """Buffer an event for the subscriber. Safe to call from any thread.
+
+        Args:
+            event (dict): The event.
+        """
+        try:
+            self.loop.call_soon_threadsafe(self.__put, event)
+        except RuntimeError:
+            pass
+
+    async def get(self, timeout: float) -> dict | None:
+        """Wait for the next event.
+
+        Args:
+            timeout (float): How long to wait, in seconds.
+
+        Returns:
+            dict | None: The event, or None if none was published in time.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        """Stop receiving events."""
+        self.broker.unsubscribe(self)
+
+    def __put(self, event: dict):
+        if self.queue.full():
+            self.queue.get_nowait()
+
+        self.queue.put_nowait(event)
+
+
+def user_channel(user_id: UUID) -> str:
+    """Get the channel of the events of a user.
+
+    Args:
+        user_id (UUID): The ID of the user.
+
+    Returns:
+        str: The channel name.
+    """
+    return f"user:{user_id}"
+
+
+async def stream_events(
+    subscription: Subscription,
+    initial_events: List[dict] = None,
+    include: Callable[[dict], bool] = None,
+    until: Callable[[dict], bool] = None,
+    keepalive: float = 15.0,
+) -> AsyncIterator[dict]:
+    """Forward the events of a subscription, to be sent as Server-Sent Events.
+
+    A `ping` event is sent when nothing was published for `keepalive` seconds, so
+    proxies do not close idle connections. The subscription is closed at the end.
+
+    Args:
+        subscription (Subscription): The subscription.
+        initial_events (List[dict], optional): Events sent first, e.g. a snapshot of the current state. Defaults to None.
+        include (Callable[[dict], bool], optional): Filters the forwarded events. Defaults to None.
+        until (Callable[[dict], bool], optional): Ends the stream after the first event it matches. Defaults to None.
+        keepalive (float, optional): The interval of the ping events, in seconds. Defaults to 15.0.
+
+    Yields:
+        dict: The events, as {"event": name, "data": payload} dicts.
+    """
+    try:
+        for event in initial_events or []:
+            yield event
+
+            if until and until(event):
+                return
+
+        while True:
+            event = await subscription.get(keepalive)
+
+            if event is None:
+                yield {"event": "ping", "data": {}}
+                continue
+
+            if include and not include(event):
+                continue
+
+            yield event
+
+            if until and until(event):
+                return
+    finally:
+        subscription.close()
+
+
+event_broker: EventBroker = EventBroker()
@@ -0,0 +1,2 @@
+from .generation_queue import GenerationQueue, generation_queue
+from .content_cache import ContentCache, content_cache
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+from datetime import timedelta
+from typing import List, Tuple
+
+from sqlalchemy import asc, delete, func, select, update
+from sqlalchemy.orm import Session
+
+from src.db import db_connection
+from src.db.tables import Agent, CachedContent, KnowledgeBase
+from src.rag import DEFAULT_EMBEDDING_VERSION, rag_handler
+
+PROFILE_FINGERPRINT_FIELDS = (
+    "knowledge_level",
+    "learning_style",
+    "language_preference",
+)
+
+
+class ContentCache:
+    def __init__(self):
+        self.db_conn = db_connection
+        self.rag_handler = rag_handler
+
+        self.enabled = os.getenv("CONTENT_CACHE_ENABLED", "true") == "true"
+        self.reuse_threshold = float(os.getenv("CONTENT_CACHE_REUSE_THRESHOLD", "0.95"))
+        self.adapt_threshold = float(os.getenv("CONTENT_CACHE_ADAPT_THRESHOLD", "0.85"))
+        self.ttl_days = int(os.getenv("CONTENT_CACHE_TTL_DAYS", "30"))
+        self.embedding_version = DEFAULT_EMBEDDING_VERSION
+
+    def build_keys(
+        self,
+        profile_info: dict | None,
+        objectives: List[Tuple[str, str]],
+        agent: Agent,
+        model_id: str,
+        knowledge_base: KnowledgeBase = None,
+    ) -> List[dict]:
+        """Build the cache keys of text contents, embedding their objectives in a single call.
+
+        Contents are shared by users whose profiles have the same fingerprint, and only
+        while the agent prompt, the model and the knowledge base are unchanged.
+
+        Args:
+            profile_info (dict | None): The profile of the user.
+            objectives (List[Tuple[str, str]]): The (title, objective) pairs of the contents.
+            agent (Agent): The agent that generates the contents.
+            model_id (str): The model that generates the contents.
+            knowledge_base (KnowledgeBase, optional): The knowledge base used for RAG. Defaults to None.
+
+        Returns:
+            List[dict]: The cache keys, in the order of the objectives.
+        """
+        objective_embeddings = self.rag_handler.get_embeddings(
+            texts=[
+                f"{title}\n{objective}" if title else objective
+                for title, objective in objectives
+            ],
+            embedding_version=self.embedding_version,
+            priority="background",
+        )
+
+        return [
+            {
+                "profile_fingerprint": self.profile_fingerprint(profile_info),
+                "agent_version": _hash(f"{model_id}\n{agent.system_prompt}"),
+                "knowledge_base_revision": (
+                    f"{knowledge_base.id}:{knowledge_base.embedding_version}:{knowledge_base.revision}"
+                    if knowledge_base
+                    else "none"
+                ),
+                "embedding_version": self.embedding_version,
+                "objective_embedding": objective_embedding,
+                "title": title,
+                "objective": objective,
+            }
+            for (title, objective), objective_embedding in zip(
+                objectives, objective_embeddings
+            )
+        ]
+
+    def shareable_profile(self, profile_info: dict | None) -> dict:
+        """Keep only the profile fields that are part of the fingerprint, normalized.
+
+        Contents that may be cached are generated from this profile only, so a content
+        shared with another learner never carries personal data such as a name or goals.
+
+        Args:
+            profile_info (dict | None): The profile of the user.
+
+        Returns:
+            dict: The fingerprint fields of the profile.
+        """
+        profile_info = profile_info or {}
+
+        return {
+            field: str(profile_info.get(field, "") or "").strip().lower()
+            for field in PROFILE_FINGERPRINT_FIELDS
+        }
+
+    def profile_fingerprint(self, profile_info: dict | None) -> str:
+        """Hash the profile fields that shape a generated content, normalized.
+
+        Args:
+            profile_info (dict | None): The profile of the user.
+
+        Returns:
+            str: The profile fingerprint.
+        """
+        return _hash(json.dumps(self.shareable_profile(profile_info), sort_keys=True))
+
+    def lookup(
+        self, session: Session, key: dict
+    ) -> Tuple[CachedContent, float] | Tuple[None, None]:
+        """Find the unexpired cached content with the closest objective for a key.
+
+        Args:
+            session (Session): The database session.
+            key (dict): The cache key.
+
+        Returns:
+            Tuple[CachedContent, float] | Tuple[None, None]: The closest cached content and its similarity, or (None, None) if there is none.
+        """
+        distance_function = CachedContent.objective_embedding.cosine_distance(
+            key["objective_embedding"]
+        )
+
+        row = session.execute(
+            select(CachedContent, distance_function.label("distance"))
+            .filter(
+                CachedContent.profile_fingerprint == key["profile_fingerprint"],
+                CachedContent.agent_version == key["agent_version"],
+                CachedContent.knowledge_base_revision == key["knowledge_base_revision"],
+                CachedContent.embedding_version == key["embedding_version"],
+                CachedContent.expires_at > func.now(),
+            )
+            .order_by(asc("distance"))
+            .limit(1)
+        ).first()
+
+        if row is None:
+            return None, None
+
+        return row.CachedContent, 1 - row.distance
+
+    def record_hit(self, session: Session, cached_content: CachedContent):
+        """Count a reuse of a cached content.
+
+        Args:
+            session (Session): The database session.
+            cached_content (CachedContent): The reused content.
+        """
+        session.execute(
+            update(CachedContent)
+            .where(CachedContent.id == cached_content.id)
+            .values(hits=CachedContent.hits + 1)
+        )
+
+    def store(self, session: Session, key: dict, text_content: str) -> CachedContent:
+        """Cache a generated text content under a key.
+
+        Args:
+            session (Session): The database session.
+            key (dict): The cache key.
+            text_content (str): The generated text content.
+
+        Returns:
+            CachedContent: The cached content.
+        """
+        cached_content = CachedContent(
+            **key,
+            text_content=text_content,
+            expires_at=func.now() + timedelta(days=self.ttl_days),
+        )
+        session.add(cached_content)
+
+        return cached_content
+
+    def purge_expired(self):
+        """Delete the expired cached contents."""
+        try:
+            with self.db_conn.get_session() as session:
+                session.execute(
+                    delete(CachedContent).where(CachedContent.expires_at <= func.now())
+                )
+                session.commit()
+        except Exception as e:
+            print(f"Error purging expired cached contents: {e}")
+
+
+def _hash(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()[:16]
+
+
+content_cache: ContentCache = ContentCache()
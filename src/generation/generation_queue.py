@@ -0,0 +1,708 @@
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+from typing import Callable, Dict, List, Set
+from uuid import UUID
+
+from sqlalchemy import and_, exists, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from src.bedrock import CancellationToken, OperationCancelled, cancellation_scope
+from src.db import db_connection
+from src.db.tables import GenerationJob, Module, Plan
+from src.events import event_broker, user_channel
+
+JobHandler = Callable[[dict], List[dict] | None]
+PlanListener = Callable[[UUID], None]
+
+ACTIVE_STATUSES = ("pending", "running")
+QUEUED_STATUSES = ("pending", "deferred")
+
+
+class GenerationQueue:
+    def __init__(self):
+        self.db_conn = db_connection
+
+        self.worker_count = int(os.getenv("GENERATION_WORKERS", "16"))
+        self.max_attempts = int(os.getenv("GENERATION_JOB_MAX_ATTEMPTS", "3"))
+        self.lease_seconds = int(os.getenv("GENERATION_JOB_LEASE_SECONDS", "60"))
+        self.poll_interval = 2.0
+        self.base_retry_delay = 10.0
+
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.handlers: Dict[str, JobHandler] = {}
+        self.agent_labels: Dict[str, str] = {}
+        self.plan_listeners: List[PlanListener] = []
+
+        self.condition = threading.Condition()
+        self.stopped = threading.Event()
+        self.running_lock = threading.Lock()
+        self.running_jobs: Set[UUID] = set()
+        self.workers: List[threading.Thread] = []
+
+    def register(self, job_type: str, handler: JobHandler, agent_label: str = None):
+        """Register the function that runs the jobs of a type.
+
+        A handler receives the job as a dict (id, job_type, plan_id, module_id, user_id,
+        payload, epoch and attempts) and may return follow-up jobs, as dicts with a
+        job_type and optionally a module_id and payload. They are enqueued in the same
+        transaction that marks the job as done, so progress is checkpointed atomically.
+
+        Handlers run in a cancellation scope: once the plan generation epoch of the job
+        is superseded, their next model call raises `OperationCancelled` and the job is
+        marked as cancelled.
+
+        Args:
+            job_type (str): The type of job, e.g. "module".
+            handler (JobHandler): The function that runs the jobs.
+            agent_label (str, optional): The label of the agent the jobs call, used to estimate the tokens saved by cancelling them. Defaults to None.
+        """
+        self.handlers[job_type] = handler
+
+        if agent_label:
+            self.agent_labels[job_type] = agent_label
+
+    def on_plan_done(self, listener: PlanListener):
+        """Register a function called with the plan ID whenever a plan has no active job left.
+
+        Listeners run on the worker that finished the last job, after its transaction is
+        committed. Their errors are logged and ignored.
+
+        Args:
+            listener (PlanListener): The function to call.
+        """
+        self.plan_listeners.append(listener)
+
+    def enqueue(
+        self,
+        session: Session,
+        job_type: str,
+        plan_id: UUID,
+        user_id: UUID,
+        module_id: UUID = None,
+        payload: dict = None,
+        deferred: bool = False,
+        epoch: int = 0,
+        priority: int = 0,
+    ) -> GenerationJob:
+        """Add a job to the queue in the caller's transaction.
+
+        The job becomes visible to the workers once the transaction is committed. Call
+        `notify` after committing so idle workers pick it up right away. Deferred jobs are
+        not run until they are activated with `activate`. Jobs with a higher priority
+        value are only claimed when no job with a lower value is runnable, and their
+        follow-up jobs keep their priority.
+
+        Args:
+            session (Session): The database session.
+            job_type (str): The type of job.
+            plan_id (UUID): The plan the job belongs to.
+            user_id (UUID): The user the job runs for.
+            module_id (UUID, optional): The module the job belongs to, if any. Defaults to None.
+            payload (dict, optional): The arguments of the job. Defaults to None.
+            deferred (bool, optional): Whether the job waits to be activated. Defaults to False.
+            epoch (int, optional): The plan generation epoch the job belongs to. Defaults to 0.
+            priority (int, optional): The lane of the job, 0 being the most urgent. Defaults to 0.
+
+        Returns:
+            GenerationJob: The new job.
+        """
+        job = GenerationJob(
+            job_type=job_type,
+            plan_id=plan_id,
+            module_id=module_id,
+            user_id=user_id,
+            payload=payload or {},
+            status="deferred" if deferred else "pending",
+            epoch=epoch,
+            priority=priority,
+            max_attempts=self.max_attempts,
+        )
+        session.add(job)
+
+        return job
+
+    def activate(
+        self,
+        session: Session,
+        job_type: str,
+        module_ids: List[UUID],
+        trigger: str,
+        limit: int = None,
+    ) -> List[UUID]:
+        """Queue the deferred jobs of some modules in the caller's transaction.
+
+        The trigger is stored in the payload of the activated jobs, so callers can count
+        how many jobs were activated for each reason. Call `notify` after committing.
+
+        Args:
+            session (Session): The database session.
+            job_type (str): The type of the deferred jobs.
+            module_ids (List[UUID]): The modules whose jobs are activated, by priority.
+            trigger (str): Why the jobs are activated, e.g. "access" or "prefetch".
+            limit (int, optional): The maximum number of jobs to activate. Defaults to None.
+
+        Returns:
+            List[UUID]: The modules whose jobs were activated.
+        """
+        if not module_ids or limit == 0:
+            return []
+
+        deferred_module_ids = set(
+            session.execute(
+                select(GenerationJob.module_id)
+                .where(
+                    GenerationJob.job_type == job_type,
+                    GenerationJob.module_id.in_(module_ids),
+                    GenerationJob.status == "deferred",
+                )
+                .with_for_update(skip_locked=True)
+            ).scalars()
+        )
+
+        activated_module_ids = [
+            module_id for module_id in module_ids if module_id in deferred_module_ids
+        ][:limit]
+        if not activated_module_ids:
+            return []
+
+        session.execute(
+            update(GenerationJob)
+            .where(
+                GenerationJob.job_type == job_type,
+                GenerationJob.module_id.in_(activated_module_ids),
+                GenerationJob.status == "deferred",
+            )
+            .values(
+                status="pending",
+                run_after=func.now(),
+                payload=GenerationJob.payload.op("||")(
+                    func.jsonb_build_object("trigger", trigger)
+                ),
+            )
+        )
+
+        return activated_module_ids
+
+    def supersede(
+        self, session: Session, plan_id: UUID, adopted_module_ids: List[UUID] = ()
+    ) -> int:
+        """Start a new generation epoch for a plan in the caller's transaction.
+
+        Must be called whenever the modules of a plan are replaced. The queued jobs of
+        the previous epochs are cancelled right away, and the running ones stop before
+        their next model call. The active jobs of the adopted modules, kept by the new
+        outline, move to the new epoch and to the most urgent lane instead.
+
+        Args:
+            session (Session): The database session.
+            plan_id (UUID): The ID of the plan.
+            adopted_module_ids (List[UUID], optional): The modules whose generation goes on. Defaults to ().
+
+        Returns:
+            int: The new generation epoch.
+        """
+        epoch = session.execute(
+            update(Plan)
+            .where(Plan.id == plan_id)
+            .values(generation_epoch=Plan.generation_epoch + 1)
+            .returning(Plan.generation_epoch)
+        ).scalar_one()
+
+        if adopted_module_ids:
+            session.execute(
+                update(GenerationJob)
+                .where(
+                    GenerationJob.module_id.in_(adopted_module_ids),
+                    GenerationJob.status.in_(ACTIVE_STATUSES + QUEUED_STATUSES),
+                )
+                .values(epoch=epoch, priority=0)
+            )
+
+        session.execute(
+            update(GenerationJob)
+            .where(
+                GenerationJob.plan_id == plan_id,
+                GenerationJob.epoch < epoch,
+                GenerationJob.status.in_(QUEUED_STATUSES),
+            )
+            .values(status="cancelled", finished_at=func.now())
+        )
+
+        return epoch
+
+    def cancel_modules(self, session: Session, module_ids: List[UUID]):
+        """Cancel the queued jobs of modules about to be deleted, in the caller's transaction.
+
+        The running jobs of deleted modules stop before their next model call.
+
+        Args:
+            session (Session): The database session.
+            module_ids (List[UUID]): The IDs of the modules.
+        """
+        if not module_ids:
+            return
+
+        session.execute(
+            update(GenerationJob)
+            .where(
+                GenerationJob.module_id.in_(module_ids),
+                GenerationJob.status.in_(QUEUED_STATUSES),
+            )
+            .values(status="cancelled", finished_at=func.now())
+        )
+
+    def retry_failed(self, session: Session, module_id: UUID, epoch: int) -> int:
+        """Queue the failed jobs of a module again, in the caller's transaction.
+
+        Only the jobs that ran out of attempts are retried, with a fresh attempt budget,
+        so the items already generated do not cost another model call. Call `notify`
+        after committing.
+
+        Args:
+            session (Session): The database session, holding the lock on the plan.
+            module_id (UUID): The ID of the module.
+            epoch (int): The current generation epoch of the plan.
+
+        Returns:
+            int: The number of jobs queued again.
+        """
+        result = session.execute(
+            update(GenerationJob)
+            .where(
+                GenerationJob.module_id == module_id,
+                GenerationJob.status == "failed",
+            )
+            .values(
+                status="pending",
+                attempts=0,
+                run_after=func.now(),
+                locked_at=None,
+                locked_by=None,
+                last_error=None,
+                finished_at=None,
+                epoch=epoch,
+                priority=0,
+            )
+        )
+
+        return result.rowcount
+
+    def notify(self):
+        """Wake up idle workers to look for new jobs."""
+        with self.condition:
+            self.condition.notify_all()
+
+    def start(self):
+        """Start the workers and the lease heartbeat.
+
+        Jobs left pending by a previous process are picked up right away, and jobs left
+        running by a process that crashed are taken over once their lease expires.
+        """
+        self.stopped.clear()
+
+        for i in range(self.worker_count):
+            worker = threading.Thread(
+                target=self.__work, name=f"generation-{i}", daemon=True
+            )
+            worker.start()
+            self.workers.append(worker)
+
+        threading.Thread(
+            target=self.__heartbeat, name="generation-heartbeat", daemon=True
+        ).start()
+
+    def shutdown(self):
+        """Stop the workers, releasing the jobs still running so another process can resume them."""
+        self.stopped.set()
+        self.notify()
+
+        with self.running_lock:
+            job_ids = list(self.running_jobs)
+
+        if not job_ids:
+            return
+
+        try:
+            with self.db_conn.get_session() as session:
+                session.execute(
+                    update(GenerationJob)
+                    .where(
+                        GenerationJob.id.in_(job_ids),
+                        GenerationJob.locked_by == self.worker_id,
+                    )
+                    .values(
+                        status="pending",
+                        attempts=GenerationJob.attempts - 1,
+                        locked_at=None,
+                        locked_by=None,
+                    )
+                )
+                session.commit()
+        except Exception as e:
+            print(f"Error releasing running generation jobs: {e}")
+
+    def __work(self):
+        while not self.stopped.is_set():
+            try:
+                job = self.__claim()
+            except Exception as e:
+                print(f"Error claiming generation job: {e}")
+                job = None
+
+            if job is None:
+                with self.condition:
+                    self.condition.wait(self.poll_interval)
+                continue
+
+            self.__run(job)
+
+    def __claim(self) -> dict | None:
+        """Lock the next runnable job, skipping the jobs locked by other workers.
+
+        Runnable jobs are pending jobs whose retry delay has passed, and running jobs
+        whose lease expired because their worker stopped sending heartbeats.
+
+        Returns:
+            dict | None: The claimed job, or None if there is no runnable job.
+        """
+        with self.db_conn.get_session() as session:
+            job = session.execute(
+                select(GenerationJob)
+                .where(
+                    or_(
+                        and_(
+                            GenerationJob.status == "pending",
+                            GenerationJob.run_after <= func.now(),
+                        ),
+                        and_(
+                            GenerationJob.status == "running",
+                            GenerationJob.locked_at
+                            < func.now() - timedelta(seconds=self.lease_seconds),
+                        ),
+                    )
+                )
+                .order_by(GenerationJob.priority, GenerationJob.created_at)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            ).scalar_one_or_none()
+
+            if job is None:
+                return None
+
+            job.status = "running"
+            job.attempts += 1
+            job.locked_at = func.now()
+            job.locked_by = self.worker_id
+
+            claimed = {
+                "id": job.id,
+                "job_type": job.job_type,
+                "plan_id": job.plan_id,
+                "module_id": job.module_id,
+                "user_id": job.user_id,
+                "payload": dict(job.payload),
+                "epoch": job.epoch,
+                "attempts": job.attempts,
+                "max_attempts": job.max_attempts,
+            }
+            session.commit()
+
+        with self.running_lock:
+            self.running_jobs.add(claimed["id"])
+
+        return claimed
+
+    def __run(self, job: dict):
+        token = CancellationToken(lambda: self.__is_superseded(job))
+
+        try:
+            handler = self.handlers.get(job["job_type"], None)
+            if handler is None:
+                raise ValueError(f"No handler registered for {job['job_type']} jobs.")
+
+            if job["attempts"] > job["max_attempts"]:
+                raise RuntimeError("Job lease expired on its last attempt.")
+
+            with cancellation_scope(token):
+                token.raise_if_cancelled()
+                follow_ups = handler(job) or []
+        except OperationCancelled:
+            self.__cancel(job)
+        except Exception as e:
+            if token.check():
+                self.__cancel(job)
+            else:
+                traceback.print_exc()
+                self.__fail(job, e)
+        else:
+            self.__complete(job, follow_ups)
+        finally:
+            with self.running_lock:
+                self.running_jobs.discard(job["id"])
+
+    def __complete(self, job: dict, follow_ups: List[dict]):
+        """Mark a job as done and enqueue its follow-up jobs in a single transaction.
+
+        Args:
+            job (dict): The job.
+            follow_ups (List[dict]): The follow-up jobs.
+        """
+        with self.db_conn.get_session() as session:
+            if not self.__lock_plan(session, job["plan_id"]):
+                return
+
+            lane = session.execute(
+                update(GenerationJob)
+                .where(
+                    GenerationJob.id == job["id"],
+                    GenerationJob.locked_by == self.worker_id,
+                )
+                .values(
+                    status="done",
+                    locked_at=None,
+                    last_error=None,
+                    finished_at=func.now(),
+                )
+                .returning(GenerationJob.epoch, GenerationJob.priority)
+            ).first()
+            if lane is None:
+                session.rollback()
+                return
+
+            for follow_up in follow_ups:
+                self.enqueue(
+                    session,
+                    follow_up["job_type"],
+                    job["plan_id"],
+                    job["user_id"],
+                    module_id=follow_up.get("module_id", None),
+                    payload=follow_up.get("payload", None),
+                    epoch=lane.epoch,
+                    priority=lane.priority,
+                )
+
+            session.flush()
+            events = self.__finalize(session, job)
+            session.commit()
+
+        self.__publish(job, events)
+
+        if follow_ups:
+            self.notify()
+
+    def __fail(self, job: dict, error: Exception):
+        """Schedule a failed job for a retry with exponential backoff, or mark it as failed.
+
+        Args:
+            job (dict): The job.
+            error (Exception): The error raised by the job.
+        """
+        retry = job["attempts"] < job["max_attempts"]
+
+        with self.db_conn.get_session() as session:
+            if not self.__lock_plan(session, job["plan_id"]):
+                return
+
+            values = {
+                "status": "pending" if retry else "failed",
+                "locked_at": None,
+                "locked_by": None,
+                "last_error": str(error),
+            }
+            if retry:
+                delay = self.base_retry_delay * 2 ** (job["attempts"] - 1)
+                values["run_after"] = func.now() + timedelta(seconds=delay)
+            else:
+                values["finished_at"] = func.now()
+
+            result = session.execute(
+                update(GenerationJob)
+                .where(
+                    GenerationJob.id == job["id"],
+                    GenerationJob.locked_by == self.worker_id,
+                )
+                .values(**values)
+            )
+            if result.rowcount == 0:
+                session.rollback()
+                return
+
+            events = [] if retry else self.__finalize(session, job)
+            session.commit()
+
+        self.__publish(job, events)
+
+    def __cancel(self, job: dict):
+        """Mark a job of a superseded generation epoch as cancelled.
+
+        Its module was replaced, so only the plan is finalized, in case the job was the
+        last active one.
+
+        Args:
+            job (dict): The job.
+        """
+        print(f"Cancelled superseded {job['job_type']} job {job['id']}")
+
+        with self.db_conn.get_session() as session:
+            if not self.__lock_plan(session, job["plan_id"]):
+                return
+
+            result = session.execute(
+                update(GenerationJob)
+                .where(
+                    GenerationJob.id == job["id"],
+                    GenerationJob.locked_by == self.worker_id,
+                )
+                .values(
+                    status="cancelled",
+                    locked_at=None,
+                    locked_by=None,
+                    finished_at=func.now(),
+                )
+            )
+            if result.rowcount == 0:
+                session.rollback()
+                return
+
+            events = self.__finalize(session, {**job, "module_id": None})
+            session.commit()
+
+        self.__publish(job, events)
+
+    def __is_superseded(self, job: dict) -> bool:
+        """Check whether the plan or module of a job was deleted, or the plan started a new generation epoch.
+
+        The epoch of the job is read again, since it moves to the new epoch when the new
+        outline adopts its module.
+
+        Args:
+            job (dict): The job.
+
+        Returns:
+            bool: Whether the job is superseded.
+        """
+        with self.db_conn.get_session() as session:
+            row = session.execute(
+                select(
+                    Plan.generation_epoch, GenerationJob.epoch, GenerationJob.module_id
+                )
+                .select_from(GenerationJob)
+                .join(Plan, Plan.id == GenerationJob.plan_id)
+                .where(GenerationJob.id == job["id"])
+            ).first()
+
+        return (
+            row is None
+            or row.generation_epoch != row.epoch
+            or (job["module_id"] is not None and row.module_id is None)
+        )
+
+    def __lock_plan(self, session: Session, plan_id: UUID) -> bool:
+        """Lock the plan of a job, serializing the completion of its jobs.
+
+        Args:
+            session (Session): The database session.
+            plan_id (UUID): The ID of the plan.
+
+        Returns:
+            bool: Whether the plan still exists.
+        """
+        plan_exists = session.execute(
+            select(Plan.id).where(Plan.id == plan_id).with_for_update()
+        ).scalar_one_or_none()
+
+        return plan_exists is not None
+
+    def __finalize(self, session: Session, job: dict) -> List[tuple]:
+        """Mark the module and plan of a job as created once they have no active job left.
+
+        Deferred jobs are not active, so a plan whose remaining modules are generated on
+        demand is marked as created once the activated ones are done.
+
+        Speculative modules, generated while the outline is still being developed, are
+        marked as created silently, and leave the plan status untouched.
+
+        Args:
+            session (Session): The database session, holding the lock on the plan.
+            job (dict): The job that just finished.
+
+        Returns:
+            List[tuple]: The (event, data) pairs to publish once the transaction is committed.
+        """
+        events = []
+
+        if job["module_id"] and not self.__has_active_jobs(
+            session, GenerationJob.module_id == job["module_id"]
+        ):
+            module = session.get(Module, job["module_id"])
+            if module is not None and module.status != "completed":
+                module.status = "created"
+
+                if not module.speculative:
+                    events.append(
+                        (
+                            "module_done",
+                            {
+                                "plan_id": str(job["plan_id"]),
+                                "module_id": str(job["module_id"]),
+                            },
+                        )
+                    )
+
+        if not self.__has_active_jobs(session, GenerationJob.plan_id == job["plan_id"]):
+            plan = session.get(Plan, job["plan_id"])
+            if plan.status == "creating_modules":
+                plan.status = "created"
+
+            if plan.status != "creating_outline":
+                events.append(("plan_done", {"plan_id": str(job["plan_id"])}))
+
+        return events
+
+    def __publish(self, job: dict, events: List[tuple]):
+        for event, data in events:
+            event_broker.publish(user_channel(job["user_id"]), event, data)
+
+            if event == "plan_done":
+                self.__notify_plan_listeners(job["plan_id"])
+
+    def __notify_plan_listeners(self, plan_id: UUID):
+        for listener in self.plan_listeners:
+            try:
+                listener(plan_id)
+            except Exception as e:
+                print(f"Error notifying plan {plan_id} listener: {e}")
+
+    def __has_active_jobs(self, session: Session, condition) -> bool:
+        return session.execute(
+            select(exists().where(condition, GenerationJob.status.in_(ACTIVE_STATUSES)))
+        ).scalar()
+
+    def __heartbeat(self):
+        """Extend the lease of the running jobs so they are not taken over by other workers."""
+        while not self.stopped.wait(self.lease_seconds / 3):
+            with self.running_lock:
+                job_ids = list(self.running_jobs)
+
+            if not job_ids:
+                continue
+
+            try:
+                with self.db_conn.get_session() as session:
+                    session.execute(
+                        update(GenerationJob)
+                        .where(
+                            GenerationJob.id.in_(job_ids),
+                            GenerationJob.locked_by == self.worker_id,
+                        )
+                        .values(locked_at=func.now())
+                    )
+                    session.commit()
+            except Exception as e:
+                print(f"Error renewing generation job leases: {e}")
+
+
+generation_queue: GenerationQueue = GenerationQueue()
@@ -1 +1,4 @@
-from .bedrock_handler import BedrockHandler
+from .bedrock_handler import BedrockHandler, bedrock_handler
+from .sse import to_sse
+from .prompt_cache import PromptCache, prompt_cache
+from .llm_executor import LLMExecutor, llm_executor
@@ -1,22 +1,32 @@
 import json
-from typing import List
+from typing import Iterator, List, Tuple
 from uuid import UUID
 
-import boto3
 from fastapi import HTTPException
-from mypy_boto3_bedrock_runtime.client import BedrockRuntimeClient
 from sqlalchemy.orm import Session
 
+from src.bedrock import (
+    BedrockRegionPool,
+    OperationCancelled,
+    Priority,
+    bedrock_region_pool,
+    bedrock_scheduler,
+    model_telemetry,
+)
+from src.db import db_connection
 from src.db.tables import Agent, Chat, KnowledgeBase, Message, User
 from src.dto import MessageDictContentDTO, MessageDTO, MessageTextContentDTO
-from src.rag import RAGHandler
+from src.rag import retrieval_policy
+
+from .history_manager import HistoryManager
+from .history_projection import project_dict_content, serialize_dict_content
+from .prompt_cache import CACHE_POINT, prompt_cache
 
 
 class BedrockHandler:
     def __init__(self):
-        self.client: BedrockRuntimeClient = boto3.client(
-            "bedrock-runtime", region_name="us-east-2"
-        )
+        self.client: BedrockRegionPool = bedrock_region_pool
+        self.history_manager = HistoryManager(self.client)
 
     def __get_create_chat(self, session: Session, chat_id: UUID, user: User) -> Chat:
         """Get or create a chat for the user.
@@ -47,11 +57,15 @@ class BedrockHandler:
 
         return chat
 
-    def __format_message_for_bedrock(self, message: Message) -> List[dict]:
+    def __format_message_for_bedrock(
+        self, message: Message, output_format_name: str = None, full: bool = True
+    ) -> List[dict]:
         """Format a message for Bedrock API.
 
         Args:
             message (Message): The message to format.
+            output_format_name (str, optional): The name of the agent's output format, used to project dict content. Defaults to None.
+            full (bool, optional): Whether dict content is sent in full instead of projected. Defaults to True.
 
         Returns:
             List[dict]: The formatted message.
@@ -61,9 +75,12 @@ class BedrockHandler:
             formatted_message["content"].append({"text": message.text_content})
 
         elif message.content_type == "dict":
-            formatted_message["content"].append(
-                {"text": json.dumps(message.dict_content)}
-            )
+            if full:
+                text = serialize_dict_content(message.dict_content)
+            else:
+                text = project_dict_content(message.dict_content, output_format_name)
+
+            formatted_message["content"].append({"text": text})
 
         return formatted_message
 
@@ -96,7 +113,7 @@ class BedrockHandler:
 
         return new_message
 
-    def complete(
+    def __build_request(
         self,
         session: Session,
         message: MessageDTO,
@@ -105,43 +122,82 @@ class BedrockHandler:
         agent: Agent = None,
         knowledge_base: KnowledgeBase = None,
         model_id: str = "us.anthropic.claude-3-5-haiku-20241022-v1:0",
-    ) -> MessageDTO:
-        """Handle an incoming message and get a response from the Bedrock model.
+        priority: Priority = "interactive",
+        max_tokens: int = None,
+    ) -> Tuple[Chat, Message, dict, dict | None]:
+        """Store the incoming message and build the Bedrock request for the chat.
+
+        The incoming message is committed right away and the session is released before
+        every model call (summarization, query embedding and the completion itself), so
+        no pooled connection is held while waiting for Bedrock.
 
         Args:
+            session (Session): The database session.
             message (MessageDTO): The incoming message.
             user (User): The currently authenticated user.
+            system_prompt (str, optional): An additional system prompt. Defaults to None.
+            agent (Agent, optional): The agent whose prompt and output format are used. Defaults to None.
+            knowledge_base (KnowledgeBase, optional): The knowledge base used for RAG. Defaults to None.
             model_id (str, optional): The Bedrock model ID to use. Defaults to "us.anthropic.claude-3-5-haiku-20241022-v1:0".
+            priority (Priority, optional): The scheduling lane of the Bedrock calls. Defaults to "interactive".
+            max_tokens (int, optional): The maximum number of output tokens. Defaults to the model's default.
 
         Returns:
-            MessageDTO: The response message from the Bedrock model.
+            Tuple[Chat, Message, dict, dict | None]: The chat, the stored incoming message, the request arguments and the output format tool, if any.
         """
         chat = self.__get_create_chat(session, message.chat_id, user)
-        self.__create_db_message(session, chat, message)
+        user_message = self.__create_db_message(session, chat, message)
 
-        messages = chat.messages
+        all_messages = chat.messages
+        db_connection.release(session)
 
-        formatted_messages = [
-            self.__format_message_for_bedrock(msg) for msg in messages
-        ]
+        messages, summary = self.history_manager.get_history(
+            chat, all_messages, priority
+        )
 
         system = []
         output_format = None
         if system_prompt:
             system.append({"text": system_prompt})
 
+        use_cache = prompt_cache.supports(model_id)
+
         if agent:
             if agent.system_prompt:
                 system.append({"text": agent.system_prompt})
 
+                if use_cache:
+                    system.append(CACHE_POINT)
+
             if agent.output_format:
                 output_format = agent.output_format
                 output_format = {"toolSpec": output_format}
 
+        output_format_name = (
+            output_format["toolSpec"]["name"] if output_format else None
+        )
+        last_dict_index = max(
+            (i for i, msg in enumerate(messages) if msg.content_type == "dict"),
+            default=None,
+        )
+
+        formatted_messages = [
+            self.__format_message_for_bedrock(
+                msg, output_format_name, full=i == last_dict_index
+            )
+            for i, msg in enumerate(messages)
+        ]
+
+        if summary:
+            system.append(
+                {
+                    "text": f"[START CONVERSATION SUMMARY]:\n{summary}\n[END CONVERSATION SUMMARY]"
+                }
+            )
+
         if knowledge_base:
-            rag_handler = RAGHandler()
-            referenced_documents, retrieved_context = rag_handler.query(
-                session, knowledge_base, message
+            referenced_documents, retrieved_context = retrieval_policy.retrieve(
+                session, knowledge_base, chat.id, message, priority
             )
             if retrieved_context:
                 system.append(
@@ -150,35 +206,134 @@ class BedrockHandler:
                     }
                 )
 
+        request = {
+            "modelId": model_id,
+            "messages": formatted_messages,
+            "system": system,
+        }
+
+        if max_tokens:
+            request["inferenceConfig"] = {"maxTokens": max_tokens}
+
+        if output_format:
+            request["toolConfig"] = {
+                "tools": [output_format, CACHE_POINT] if use_cache else [output_format],
+                "toolChoice": {"tool": {"name": output_format["toolSpec"]["name"]}},
+            }
+
+        db_connection.release(session)
+
+        return chat, user_message, request, output_format
+
+    def __discard_turn(
+        self, session: Session, chat: Chat, user_message: Message, chat_created: bool
+    ):
+        """Delete the incoming message of a failed completion, and its chat if it was created for it.
+
+        Args:
+            session (Session): The database session.
+            chat (Chat): The chat of the completion.
+            user_message (Message): The stored incoming message.
+            chat_created (bool): Whether the chat was created for this completion.
+        """
         try:
-            if output_format:
-                response = self.client.converse(
-                    modelId=model_id,
-                    messages=formatted_messages,
-                    system=system,
-                    toolConfig={
-                        "tools": [output_format],
-                        "toolChoice": {
-                            "tool": {"name": output_format["toolSpec"]["name"]}
-                        },
-                    },
-                )
+            if chat_created:
+                session.delete(chat)
+            else:
+                session.delete(user_message)
+
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"Error discarding failed completion of chat {chat.id}: {e}")
+
+    def __record_discarded(self, invocation: dict):
+        """Record the invocation of a discarded turn without referencing its chat.
+
+        The chat may have been deleted with the turn, or be deleted by the caller
+        right after (e.g. a plan whose outline failed), so the record would
+        otherwise be dropped by the foreign key when the batch is written.
+
+        Args:
+            invocation (dict): The invocation record.
+        """
+        invocation["chat_id"] = None
+        model_telemetry.record(invocation)
+
+    def complete(
+        self,
+        session: Session,
+        message: MessageDTO,
+        user: User,
+        system_prompt: str = None,
+        agent: Agent = None,
+        knowledge_base: KnowledgeBase = None,
+        model_id: str = "us.anthropic.claude-3-5-haiku-20241022-v1:0",
+        priority: Priority = "interactive",
+        max_tokens: int = None,
+    ) -> MessageDTO:
+        """Handle an incoming message and get a response from the Bedrock model.
+
+        Args:
+            message (MessageDTO): The incoming message.
+            user (User): The currently authenticated user.
+            model_id (str, optional): The Bedrock model ID to use. Defaults to "us.anthropic.claude-3-5-haiku-20241022-v1:0".
+            priority (Priority, optional): The scheduling lane of the Bedrock calls. Defaults to "interactive".
+            max_tokens (int, optional): The maximum number of output tokens. Defaults to the model's default.
 
+        Returns:
+            MessageDTO: The response message from the Bedrock model.
+        """
+        agent_label = agent.label if agent else "chat"
+
+        chat, user_message, request, output_format = self.__build_request(
+            session,
+            message,
+            user,
+            system_prompt,
+            agent,
+            knowledge_base,
+            model_id,
+            priority,
+            max_tokens,
+        )
+
+        invocation = model_telemetry.start(
+            "converse", model_id, agent_label, priority, chat.id
+        )
+
+        try:
+            response = bedrock_scheduler.call(
+                self.client.converse,
+                priority=priority,
+                invocation=invocation,
+                hedge=priority == "interactive",
+                telemetry=invocation,
+                **request,
+            )
+            prompt_cache.record(request["modelId"], response.get("usage", {}))
+            model_telemetry.set_usage(
+                invocation, response.get("usage", {}), response.get("metrics", {})
+            )
+
+            if output_format:
                 content = MessageDictContentDTO(
                     data=response["output"]["message"]["content"][0]["toolUse"][
                         "input"
                     ],
                 )
             else:
-                response = self.client.converse(
-                    modelId=model_id,
-                    messages=formatted_messages,
-                    system=system,
-                )
                 content = MessageTextContentDTO(
                     text=response["output"]["message"]["content"][0]["text"]
                 )
+        except (HTTPException, OperationCancelled):
+            self.__discard_turn(session, chat, user_message, message.chat_id is None)
+            self.__record_discarded(invocation)
+            raise
         except Exception as e:
+            invocation["outcome"] = "error"
+            self.__discard_turn(session, chat, user_message, message.chat_id is None)
+            self.__record_discarded(invocation)
             raise HTTPException(
                 status_code=500, detail=f"Error during Bedrock completion: {str(e)}"
             )
@@ -191,7 +346,132 @@ class BedrockHandler:
             content=content,
         )
 
-        self.__create_db_message(session, chat, response_message)
+        db_message = self.__create_db_message(session, chat, response_message)
+        invocation["message_id"] = db_message.id
         session.commit()
 
+        model_telemetry.record(invocation)
+
         return response_message
+
+    def complete_stream(
+        self,
+        session: Session,
+        message: MessageDTO,
+        user: User,
+        system_prompt: str = None,
+        agent: Agent = None,
+        knowledge_base: KnowledgeBase = None,
+        model_id: str = "us.anthropic.claude-3-5-haiku-20241022-v1:0",
+        priority: Priority = "interactive",
+    ) -> Iterator[dict]:
+        """Handle an incoming message and stream the response from the Bedrock model.
+
+        Text deltas are yielded as `text_delta` events and, for agents with an output
+        format, the partial tool input JSON as `tool_use_delta` events. Once the stream
+        completes, the response is stored and yielded as a final `message` event.
+
+        Args:
+            message (MessageDTO): The incoming message.
+            user (User): The currently authenticated user.
+            model_id (str, optional): The Bedrock model ID to use. Defaults to "us.anthropic.claude-3-5-haiku-20241022-v1:0".
+            priority (Priority, optional): The scheduling lane of the Bedrock calls. Defaults to "interactive".
+
+        Raises:
+            HTTPException: If the Bedrock stream fails.
+
+        Yields:
+            dict: The stream events, as {"event": name, "data": payload} dicts.
+        """
+        agent_label = agent.label if agent else "chat"
+
+        chat, user_message, request, output_format = self.__build_request(
+            session,
+            message,
+            user,
+            system_prompt,
+            agent,
+            knowledge_base,
+            model_id,
+            priority,
+        )
+
+        role = "assistant"
+        text_parts = []
+        tool_input_parts = []
+        invocation = model_telemetry.start(
+            "converse_stream", model_id, agent_label, priority, chat.id
+        )
+
+        events = bedrock_scheduler.stream(
+            self.client.converse_stream,
+            priority=priority,
+            invocation=invocation,
+            **request,
+        )
+
+        try:
+            for event in events:
+                if "messageStart" in event:
+                    role = event["messageStart"]["role"]
+
+                elif "contentBlockDelta" in event:
+                    delta = event["contentBlockDelta"]["delta"]
+
+                    if "text" in delta:
+                        text_parts.append(delta["text"])
+                        yield {"event": "text_delta", "data": {"text": delta["text"]}}
+
+                    elif "toolUse" in delta:
+                        tool_input_parts.append(delta["toolUse"]["input"])
+                        yield {
+                            "event": "tool_use_delta",
+                            "data": {"partial_json": delta["toolUse"]["input"]},
+                        }
+
+                elif "metadata" in event:
+                    prompt_cache.record(
+                        request["modelId"], event["metadata"].get("usage", {})
+                    )
+                    model_telemetry.set_usage(
+                        invocation,
+                        event["metadata"].get("usage", {}),
+                        event["metadata"].get("metrics", {}),
+                    )
+
+            if output_format:
+                content = MessageDictContentDTO(
+                    data=json.loads("".join(tool_input_parts) or "{}")
+                )
+            else:
+                content = MessageTextContentDTO(text="".join(text_parts))
+        except (GeneratorExit, HTTPException, OperationCancelled):
+            events.close()
+            self.__discard_turn(session, chat, user_message, message.chat_id is None)
+            self.__record_discarded(invocation)
+            raise
+        except Exception as e:
+            invocation["outcome"] = "error"
+            self.__discard_turn(session, chat, user_message, message.chat_id is None)
+            self.__record_discarded(invocation)
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error during Bedrock streaming completion: {str(e)}",
+            )
+
+        response_message = MessageDTO(
+            chat_id=chat.id,
+            role=role,
+            content=content,
+        )
+
+        db_message = self.__create_db_message(session, chat, response_message)
+        invocation["message_id"] = db_message.id
+        session.commit()
+
+        model_telemetry.record(invocation)
+
+        yield {"event": "message", "data": response_message}
+
+
+bedrock_handler: BedrockHandler = BedrockHandler()
@@ -0,0 +1,168 @@
+import os
+from typing import List, Tuple
+
+from src.bedrock import BedrockRegionPool, Priority, bedrock_scheduler, model_telemetry
+from src.db.tables import Chat, Message
+
+from .history_projection import serialize_dict_content
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an AI "
+    "assistant. Update the current summary with the new messages, keeping every fact, "
+    "preference, decision and open question that may matter later in the conversation. "
+    "Drop greetings and small talk. Answer only with the updated summary, in the "
+    "language of the conversation."
+)
+
+
+class HistoryManager:
+    def __init__(self, client: BedrockRegionPool):
+        self.client = client
+
+        self.max_turns = int(os.getenv("CHAT_HISTORY_MAX_TURNS", "10"))
+        self.max_tokens = int(os.getenv("CHAT_HISTORY_MAX_TOKENS", "8000"))
+        self.keep_turns = int(os.getenv("CHAT_HISTORY_KEEP_TURNS", "4"))
+        self.summary_model_id = os.getenv(
+            "CHAT_HISTORY_SUMMARY_MODEL_ID",
+            "us.anthropic.claude-3-5-haiku-20241022-v1:0",
+        )
+
+    def get_history(
+        self, chat: Chat, messages: List[Message], priority: Priority = "interactive"
+    ) -> Tuple[List[Message], str | None]:
+        """Get the messages to send verbatim and the summary of the older ones.
+
+        Messages already folded into the chat summary are never sent again. Once the
+        remaining messages exceed `max_turns` or `max_tokens`, the oldest of them are
+        folded into the summary so that only the last `keep_turns` turns stay verbatim.
+        Folding down to fewer turns than the limit means the summary is refreshed every
+        few turns instead of on every turn. If summarization fails, every pending message
+        is sent verbatim, so no context is lost for the turn.
+
+        Args:
+            chat (Chat): The chat, with the incoming message already added.
+            messages (List[Message]): All messages of the chat, in order.
+            priority (Priority, optional): The scheduling lane of the summarization call. Defaults to "interactive".
+
+        Returns:
+            Tuple[List[Message], str | None]: The messages to send verbatim and the conversation summary, if any.
+        """
+        pending = messages[chat.summarized_message_count :]
+
+        if (
+            len(pending) <= self.max_turns * 2
+            and self.__estimate_tokens(pending) <= self.max_tokens
+        ):
+            return pending, chat.summary
+
+        start = self.__get_window_start(pending)
+        if start == 0:
+            return pending, chat.summary
+
+        try:
+            chat.summary = self.__summarize(chat, pending[:start], priority)
+            chat.summarized_message_count += start
+        except Exception as e:
+            print(f"Error summarizing the history of chat {chat.id}: {e}")
+            return pending, chat.summary
+
+        return pending[start:], chat.summary
+
+    def __get_window_start(self, messages: List[Message]) -> int:
+        """Get the index of the first message kept verbatim.
+
+        The window holds at most `keep_turns` turns within the token budget, always
+        keeps the last message and starts on a user message, as required by Bedrock.
+
+        Args:
+            messages (List[Message]): The messages not yet summarized.
+
+        Returns:
+            int: The index of the first message of the window.
+        """
+        start = len(messages) - 1
+        tokens = self.__estimate_tokens(messages[start:])
+
+        while start > 0 and len(messages) - start < self.keep_turns * 2:
+            tokens += self.__estimate_tokens(messages[start - 1 : start])
+            if tokens > self.max_tokens:
+                break
+
+            start -= 1
+
+        while start > 0 and messages[start].role != "user":
+            start -= 1
+
+        return start
+
+    def __summarize(
+        self, chat: Chat, messages: List[Message], priority: Priority
+    ) -> str:
+        """Fold messages into the conversation summary.
+
+        Args:
+            chat (Chat): The chat, with its current summary, if any.
+            messages (List[Message]): The messages to fold into the summary.
+            priority (Priority): The scheduling lane of the call.
+
+        Returns:
+            str: The updated summary.
+        """
+        transcript = "\n".join(
+            f"{message.role}: {self.__get_text(message)}" for message in messages
+        )
+
+        invocation = model_telemetry.start(
+            "converse", self.summary_model_id, "history_summary", priority, chat.id
+        )
+
+        try:
+            response = bedrock_scheduler.call(
+                self.client.converse,
+                priority=priority,
+                invocation=invocation,
+                modelId=self.summary_model_id,
+                system=[{"text": SUMMARY_PROMPT}],
+                messages=[
+                    {
+                        "role": "user",
+                        "content": [
+                            {
+                                "text": f"[CURRENT SUMMARY]:\n{chat.summary or '(empty)'}\n\n[NEW MESSAGES]:\n{transcript}"
+                            }
+                        ],
+                    }
+                ],
+            )
+            model_telemetry.set_usage(
+                invocation, response.get("usage", {}), response.get("metrics", {})
+            )
+        finally:
+            model_telemetry.record(invocation)
+
+        return response["output"]["message"]["content"][0]["text"]
+
+    def __estimate_tokens(self, messages: List[Message]) -> int:
+        """Estimate the number of tokens of messages, at roughly 4 characters per token.
+
+        Args:
+            messages (List[Message]): The messages.
+
+        Returns:
+            int: The estimated number of tokens.
+        """
+        return sum(len(self.__get_text(message)) for message in messages) // 4
+
+    def __get_text(self, message: Message) -> str:
+        """Get the text sent to the model for a message.
+
+        Args:
+            message (Message): The message.
+
+        Returns:
+            str: The text content, or the serialized dict content.
+        """
+        if message.content_type == "dict":
+            return serialize_dict_content(message.dict_content)
+
+        return message.text_content or ""
@@ -0,0 +1,88 @@
+import json
+from typing import Any, Dict, List
+
+HISTORY_PROJECTIONS: Dict[str, List[str]] = {
+    "profile_assessment_output_format": ["answer", "finished"],
+    "plan_outline_output_format": ["answer", "ready_to_save", "title"],
+    "module_outline_output_format": ["module_title"],
+}
+
+MAX_DIGEST_LENGTH = 200
+
+
+def project_dict_content(data: dict, output_format_name: str | None = None) -> str:
+    """Serialize a structured agent reply for replay in the conversation history.
+
+    Fields listed in HISTORY_PROJECTIONS for the agent's output format are kept as they
+    are, while every other field is replaced by a short digest. Agents without a
+    projection keep short scalar fields and get a digest of the rest.
+
+    Args:
+        data (dict): The dict content of the message.
+        output_format_name (str | None, optional): The name of the agent's output format. Defaults to None.
+
+    Returns:
+        str: The projected content, serialized as compact JSON.
+    """
+    fields = HISTORY_PROJECTIONS.get(output_format_name, None)
+    projection = {}
+
+    for key, value in data.items():
+        if fields is not None and key in fields:
+            projection[key] = value
+        elif fields is None and _is_short(value):
+            projection[key] = value
+        elif value is not None:
+            projection[key] = _digest(value)
+
+    return serialize_dict_content(projection)
+
+
+def serialize_dict_content(data: dict) -> str:
+    """Serialize dict content as compact JSON, keeping non-ASCII characters as they are.
+
+    Args:
+        data (dict): The dict content of the message.
+
+    Returns:
+        str: The serialized content.
+    """
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def _is_short(value: Any) -> bool:
+    if isinstance(value, str):
+        return len(value) <= MAX_DIGEST_LENGTH
+
+    return value is None or isinstance(value, (bool, int, float))
+
+
+def _digest(value: Any) -> str:
+    """Summarize a large value in a short string.
+
+    Args:
+        value (Any): The value to summarize.
+
+    Returns:
+        str: The digest of the value.
+    """
+    if isinstance(value, list):
+        titles = [
+            str(item.get("title"))
+            for item in value
+            if isinstance(item, dict) and item.get("title")
+        ]
+        digest = f"[{len(value)} items]"
+        if titles:
+            digest = f"[{len(value)} items: {'; '.join(titles)}]"
+
+    elif isinstance(value, dict):
+        digest = f"{{fields: {', '.join(value.keys())}}}"
+
+    else:
+        digest = str(value)
+
+    if len(digest) > MAX_DIGEST_LENGTH:
+        digest = digest[: MAX_DIGEST_LENGTH - 3] + "..."
+
+    return digest
@@ -0,0 +1,64 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+_END = object()
+
+
+class LLMExecutor:
+    def __init__(self):
+        self.max_workers = int(os.getenv("LLM_EXECUTOR_WORKERS", "256"))
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="llm"
+        )
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Run a blocking function, such as a service call waiting on Bedrock, without blocking the event loop.
+
+        The function runs in a dedicated thread pool sized for I/O-bound model calls
+        instead of AnyIO's default thread limiter, which also serves every sync route.
+
+        Args:
+            fn (Callable[..., T]): The blocking function.
+
+        Returns:
+            T: The result of the function.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(fn, *args, **kwargs)
+        )
+
+    async def iterate(self, iterator: Iterator[T]) -> AsyncIterator[T]:
+        """Consume a blocking iterator, such as a Bedrock stream, from the event loop.
+
+        Closing the returned generator (e.g. when the client disconnects) closes the
+        underlying iterator as well.
+
+        Args:
+            iterator (Iterator[T]): The blocking iterator.
+
+        Yields:
+            T: The items of the iterator, in order.
+        """
+        try:
+            while True:
+                item = await self.run(next, iterator, _END)
+                if item is _END:
+                    return
+
+                yield item
+        finally:
+            if hasattr(iterator, "close"):
+                await self.run(iterator.close)
+
+    def shutdown(self):
+        """Shut down the thread pool without waiting for running calls."""
+        self.executor.shutdown(wait=False)
+
+
+llm_executor: LLMExecutor = LLMExecutor()
@@ -0,0 +1,82 @@
+import os
+import threading
+
+DEFAULT_PROMPT_CACHE_MODELS = (
+    "anthropic.claude-3-5-haiku-20241022-v1:0,"
+    "anthropic.claude-3-7-sonnet-20250219-v1:0,"
+    "anthropic.claude-sonnet-4-20250514-v1:0,"
+    "anthropic.claude-opus-4-20250514-v1:0,"
+    "amazon.nova-micro-v1:0,"
+    "amazon.nova-lite-v1:0,"
+    "amazon.nova-pro-v1:0"
+)
+
+CACHE_POINT = {"cachePoint": {"type": "default"}}
+
+
+class PromptCache:
+    def __init__(self):
+        self.enabled = os.getenv("BEDROCK_PROMPT_CACHE_ENABLED", "true") == "true"
+        self.models = [
+            model.strip()
+            for model in os.getenv(
+                "BEDROCK_PROMPT_CACHE_MODELS", DEFAULT_PROMPT_CACHE_MODELS
+            ).split(",")
+            if model.strip()
+        ]
+
+        self.lock = threading.Lock()
+        self.stats = {
+            "calls": 0,
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "input_tokens": 0,
+            "cache_read_input_tokens": 0,
+            "cache_write_input_tokens": 0,
+        }
+
+    def supports(self, model_id: str) -> bool:
+        """Check whether cache points should be sent for a model.
+
+        Cross-region inference profiles (e.g. "us.") are matched by their base model ID.
+
+        Args:
+            model_id (str): The Bedrock model ID or inference profile ID.
+
+        Returns:
+            bool: True if prompt caching is enabled and supported by the model.
+        """
+        return self.enabled and any(model_id.endswith(model) for model in self.models)
+
+    def record(self, model_id: str, usage: dict):
+        """Account the cached and uncached input tokens of a Bedrock response.
+
+        Args:
+            model_id (str): The Bedrock model ID used in the call.
+            usage (dict): The `usage` of the Converse response or stream metadata.
+        """
+        cache_read = usage.get("cacheReadInputTokens", 0) or 0
+        cache_write = usage.get("cacheWriteInputTokens", 0) or 0
+
+        with self.lock:
+            self.stats["calls"] += 1
+            self.stats["input_tokens"] += usage.get("inputTokens", 0) or 0
+            self.stats["cache_read_input_tokens"] += cache_read
+            self.stats["cache_write_input_tokens"] += cache_write
+
+            if cache_read:
+                self.stats["cache_hits"] += 1
+            elif self.supports(model_id):
+                self.stats["cache_misses"] += 1
+
+    def get_stats(self) -> dict:
+        """Get the prompt cache counters since the process started.
+
+        Returns:
+            dict: The number of calls, cache hits and misses, and input tokens read from, written to and not served by the cache.
+        """
+        with self.lock:
+            return dict(self.stats)
+
+
+prompt_cache: PromptCache = PromptCache()
@@ -0,0 +1,32 @@
+import json
+from typing import AsyncIterator
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+
+async def to_sse(events: AsyncIterator[dict]) -> AsyncIterator[str]:
+    """Format stream events as Server-Sent Events.
+
+    Errors raised after the response has started cannot change its status code, so
+    they are sent as a final `error` event instead.
+
+    Args:
+        events (AsyncIterator[dict]): The stream events, as {"event": name, "data": payload} dicts.
+
+    Yields:
+        str: The formatted Server-Sent Events.
+    """
+    try:
+        async for event in events:
+            data = event["data"]
+            if isinstance(data, BaseModel):
+                data = data.model_dump(mode="json", by_alias=True)
+
+            yield f"event: {event['event']}\ndata: {json.dumps(data)}\n\n"
+    except HTTPException as e:
+        error = {"status_code": e.status_code, "detail": e.detail}
+        yield f"event: error\ndata: {json.dumps(error)}\n\n"
+    except Exception as e:
+        error = {"status_code": 500, "detail": str(e)}
+        yield f"event: error\ndata: {json.dumps(error)}\n\n"
@@ -8,10 +8,16 @@ from src.modules import (
     content_router,
     interface_router,
     knowledge_base_router,
+    metrics_router,
     module_router,
     plan_router,
     user_router,
 )
+from src.bedrock import bedrock_region_pool, client_factory, model_telemetry
+from src.events import event_broker
+from src.generation import content_cache, generation_queue
+from src.llm import llm_executor
+from src.rag import image_preprocessor, re_embedder
 
 
 def create_app():
@@ -31,6 +37,18 @@ def create_app():
     app.include_router(
         knowledge_base_router, prefix="/knowledge_base", tags=["Knowledge Base"]
     )
+    app.include_router(metrics_router, prefix="/metrics", tags=["Metrics"])
+
+    app.add_event_handler("startup", re_embedder.resume_pending)
+    app.add_event_handler("startup", generation_queue.start)
+    app.add_event_handler("startup", content_cache.purge_expired)
+    app.add_event_handler("shutdown", generation_queue.shutdown)
+    app.add_event_handler("shutdown", event_broker.close)
+    app.add_event_handler("shutdown", image_preprocessor.shutdown)
+    app.add_event_handler("shutdown", llm_executor.shutdown)
+    app.add_event_handler("shutdown", bedrock_region_pool.shutdown)
+    app.add_event_handler("shutdown", model_telemetry.shutdown)
+    app.add_event_handler("shutdown", client_factory.close)
 
     app.mount("/static", StaticFiles(directory="src/static"), name="static")
 
@@ -5,3 +5,4 @@ from .content import content_router
 from .plan import plan_router
 from .module import module_router
 from .knowledge_base import knowledge_base_router
+from .metrics import metrics_router
@@ -2,9 +2,17 @@ from typing import List
 from uuid import UUID
 
 from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
 
 from src.db.tables import User
-from src.dto import ChatDTO, MessageDTO, ResponseDTO
+from src.dto import (
+    ChatDTO,
+    MessageDTO,
+    PromptCacheStatsDTO,
+    ResponseDTO,
+    RetrievalStatsDTO,
+)
+from src.llm import llm_executor, to_sse
 from src.security import get_current_user
 
 from .chat_service import chat_service
@@ -18,11 +26,32 @@ def list_chats(user: User = Depends(get_current_user)):
 
 
 @chat_router.post("/message", response_model=MessageDTO)
-def message(
+async def message(
     message: MessageDTO,
     user: User = Depends(get_current_user),
 ):
-    return chat_service.handle_message(message, user)
+    return await llm_executor.run(chat_service.handle_message, message, user)
+
+
+@chat_router.post("/message/stream")
+async def message_stream(
+    message: MessageDTO,
+    user: User = Depends(get_current_user),
+):
+    return StreamingResponse(
+        to_sse(llm_executor.iterate(chat_service.handle_message_stream(message, user))),
+        media_type="text/event-stream",
+    )
+
+
+@chat_router.get("/retrieval_stats", response_model=RetrievalStatsDTO)
+def get_retrieval_stats(user: User = Depends(get_current_user)):
+    return chat_service.get_retrieval_stats()
+
+
+@chat_router.get("/prompt_cache_stats", response_model=PromptCacheStatsDTO)
+def get_prompt_cache_stats(user: User = Depends(get_current_user)):
+    return chat_service.get_prompt_cache_stats()
 
 
 @chat_router.get("/{chat_id}/messages", response_model=list[MessageDTO])
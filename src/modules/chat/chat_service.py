@@ -1,18 +1,25 @@
-from typing import List
+from typing import Iterator, List
 from uuid import UUID
 
 from fastapi import HTTPException
 
 from src.db import db_connection
 from src.db.tables import Chat, KnowledgeBase, Message, User
-from src.dto import ChatDTO, MessageDTO, ResponseDTO
-from src.llm import BedrockHandler
+from src.dto import (
+    ChatDTO,
+    MessageDTO,
+    PromptCacheStatsDTO,
+    ResponseDTO,
+    RetrievalStatsDTO,
+)
+from src.llm import bedrock_handler, prompt_cache
+from src.rag import retrieval_policy
 
 
 class ChatService:
     def __init__(self):
         self.db_conn = db_connection
-        self.handler = BedrockHandler()
+        self.handler = bedrock_handler
 
     def list_chats(self, user: User) -> List[ChatDTO]:
         """List chats for a user.
@@ -58,6 +65,52 @@ class ChatService:
             )
             return response_message
 
+    def handle_message_stream(
+        self,
+        message: MessageDTO,
+        user: User,
+        model_id: str = "us.anthropic.claude-3-5-haiku-20241022-v1:0",
+    ) -> Iterator[dict]:
+        """Handle an incoming message and stream the response from the Bedrock model.
+
+        Args:
+            message (MessageDTO): The incoming message.
+            user (User): The currently authenticated user.
+            model_id (str, optional): The Bedrock model ID to use. Defaults to "us.anthropic.claude-3-5-haiku-20241022-v1:0".
+
+        Yields:
+            dict: The stream events, ending with the stored response message.
+        """
+        with self.db_conn.get_session() as session:
+
+            knowledge_base = KnowledgeBase.get_by_id(
+                session, "3efd8e45-e6ee-4bf5-8f3f-1b761428b940"
+            )
+
+            yield from self.handler.complete_stream(
+                session=session,
+                message=message,
+                user=user,
+                agent=None,
+                knowledge_base=knowledge_base,
+            )
+
+    def get_retrieval_stats(self) -> RetrievalStatsDTO:
+        """Get how many RAG retrievals were performed, skipped or reused in chat completions.
+
+        Returns:
+            RetrievalStatsDTO: The retrieval counters since the process started.
+        """
+        return RetrievalStatsDTO(**retrieval_policy.get_stats())
+
+    def get_prompt_cache_stats(self) -> PromptCacheStatsDTO:
+        """Get how many Bedrock input tokens were served from or written to the prompt cache.
+
+        Returns:
+            PromptCacheStatsDTO: The prompt cache counters since the process started.
+        """
+        return PromptCacheStatsDTO(**prompt_cache.get_stats())
+
     def get_chat_messages(self, chat_id: UUID, user: User) -> List[MessageDTO]:
         """Get messages for a specific chat.
 
@@ -83,7 +136,7 @@ class ChatService:
             messages = (
                 session.query(Message)
                 .filter(Message.chat_id == chat.id)
-                .order_by(Message.created_at)
+                .order_by(Message.seq)
                 .all()
             )
 
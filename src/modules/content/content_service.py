@@ -1,11 +1,11 @@
 import os
-from typing import List
+from typing import List, Tuple
 from uuid import UUID
 
 from sqlalchemy.orm import Session
 
 from src.db import db_connection
-from src.db.tables import Agent, Content, KnowledgeBase, Module, User
+from src.db.tables import Agent, CachedContent, Content, KnowledgeBase, Module, User
 from src.dto import (
     ContentDTO,
     ContentListDTO,
@@ -13,15 +13,19 @@ from src.dto import (
     MessageTextContentDTO,
     ResponseDTO,
 )
-from src.llm import BedrockHandler
-from src.rag import RAGHandler
+from src.bedrock import OperationCancelled
+from src.events import event_broker, user_channel
+from src.generation import content_cache, generation_queue
+from src.llm import bedrock_handler
+from src.rag import rag_handler
 
 
 class ContentService:
     def __init__(self):
         self.db_conn = db_connection
-        self.completion_handler = BedrockHandler()
-        self.rag_handler = RAGHandler()
+        self.completion_handler = bedrock_handler
+        self.rag_handler = rag_handler
+        self.content_cache = content_cache
         self.knowledge_base_id = os.getenv("KNOWLEDGE_BASE_ID", None)
 
         text_content_creator_agent_id = os.getenv("TEXT_CONTENT_CREATOR_AGENT_ID", None)
@@ -39,6 +43,41 @@ class ContentService:
                     f"Agent with ID {text_content_creator_agent_id} not found in the database."
                 )
 
+        self.module_contents_creator_agent = None
+        self.module_contents_max_tokens = 8192
+        module_contents_creator_agent_id = os.getenv(
+            "MODULE_CONTENTS_CREATOR_AGENT_ID", None
+        )
+        if os.getenv("MODULE_GENERATION_MODE", "per_content") == "single_call":
+            if not module_contents_creator_agent_id:
+                raise ValueError(
+                    "MODULE_CONTENTS_CREATOR_AGENT_ID environment variable is not set."
+                )
+
+            with self.db_conn.get_session() as session:
+                self.module_contents_creator_agent = session.get(
+                    Agent, module_contents_creator_agent_id
+                )
+                if not self.module_contents_creator_agent:
+                    raise ValueError(
+                        f"Agent with ID {module_contents_creator_agent_id} not found in the database."
+                    )
+
+        generation_queue.register(
+            "content",
+            self.run_content_job,
+            agent_label=self.text_content_creator_agent.label,
+        )
+        generation_queue.register(
+            "text_contents",
+            self.run_text_contents_job,
+            agent_label=(
+                self.module_contents_creator_agent.label
+                if self.module_contents_creator_agent
+                else None
+            ),
+        )
+
     def generate_text_content(
         self,
         base_message: MessageDTO,
@@ -52,6 +91,10 @@ class ContentService:
     ) -> Content:
         """Generate text content using the completion handler.
 
+        A content cached for a similar objective and learner profile is reused above the
+        reuse threshold, or lightly adapted above the adapt threshold, instead of being
+        generated from scratch.
+
         Args:
             base_message (MessageDTO): The base message for content generation.
             session (Session): The database session.
@@ -63,26 +106,119 @@ class ContentService:
         Returns:
             Content: The generated content object.
         """
-        response_message = self.completion_handler.complete(
-            session=session,
-            message=base_message,
-            user=user,
-            agent=self.text_content_creator_agent,
-            model_id="us.anthropic.claude-3-5-haiku-20241022-v1:0",
-            knowledge_base=knowledge_base,
-        )
+        model_id = "us.anthropic.claude-3-5-haiku-20241022-v1:0"
+        cache_key, cached_content, similarity = self.__lookup_cached_contents(
+            session,
+            user,
+            [(title, description)],
+            self.text_content_creator_agent,
+            model_id,
+            knowledge_base,
+        )[0]
+
+        if cached_content and similarity >= self.content_cache.reuse_threshold:
+            text_content = cached_content.text_content
+        else:
+            message = base_message
+            system_prompt = None
+            if cached_content and similarity >= self.content_cache.adapt_threshold:
+                message = MessageDTO(
+                    user_id=base_message.user_id,
+                    content=MessageTextContentDTO(
+                        text=f"{base_message.content.text}\nReference Content:\n{cached_content.text_content}"
+                    ),
+                    role="user",
+                )
+                system_prompt = "A reference content written for a similar objective and learner profile is provided. Adapt it to the content objective and the user profile, changing only what is needed, and return only the adapted content."
+                knowledge_base = None
+
+            response_message = self.completion_handler.complete(
+                session=session,
+                message=message,
+                user=user,
+                system_prompt=system_prompt,
+                agent=self.text_content_creator_agent,
+                model_id=model_id,
+                knowledge_base=knowledge_base,
+                priority="background",
+            )
+            text_content = response_message.content.text
+
+            if cache_key:
+                self.content_cache.store(session, cache_key, text_content)
+
+        if cached_content and similarity >= self.content_cache.adapt_threshold:
+            self.content_cache.record_hit(session, cached_content)
 
         content = Content(
             module_id=module_id,
             title=title,
             description=description,
             content_type="text",
-            text_content=response_message.content.text,
+            text_content=text_content,
             order=order,
         )
 
         return content
 
+    def __lookup_cached_contents(
+        self,
+        session: Session,
+        user: User,
+        objectives: List[Tuple[str, str]],
+        agent: Agent,
+        model_id: str,
+        knowledge_base: KnowledgeBase = None,
+    ) -> List[Tuple[dict | None, CachedContent | None, float | None]]:
+        """Find the text contents generated for similar objectives and profile.
+
+        Cache errors never fail the generation, the contents are generated instead.
+
+        Args:
+            session (Session): The database session.
+            user (User): The user the contents are generated for.
+            objectives (List[Tuple[str, str]]): The (title, objective) pairs of the contents.
+            agent (Agent): The agent that generates the contents.
+            model_id (str): The model that generates the contents.
+            knowledge_base (KnowledgeBase, optional): The knowledge base used for RAG. Defaults to None.
+
+        Returns:
+            List[Tuple[dict | None, CachedContent | None, float | None]]: For each objective, the cache key, and the closest cached content with its similarity, if any.
+        """
+        if not self.content_cache.enabled:
+            return [(None, None, None)] * len(objectives)
+
+        try:
+            cache_keys = self.content_cache.build_keys(
+                user.profile_info, objectives, agent, model_id, knowledge_base
+            )
+            return [
+                (cache_key, *self.content_cache.lookup(session, cache_key))
+                for cache_key in cache_keys
+            ]
+        except Exception as e:
+            session.rollback()
+            print(f"Error looking up cached contents: {e}")
+            return [(None, None, None)] * len(objectives)
+
+    def __prompt_profile(self, user: User, content_type: str) -> dict | None:
+        """Get the profile sent to the agent generating a content.
+
+        Text contents may be shared with other learners through the cache, so only the
+        fingerprint fields of the profile are sent when the cache is enabled.
+
+        Args:
+            user (User): The user the content is generated for.
+            content_type (str): The type of the content.
+
+        Returns:
+            dict | None: The profile to send.
+        """
+        if self.content_cache.enabled and content_type == "text":
+            return self.content_cache.shareable_profile(user.profile_info)
+
+        return user.profile_info
+
     def generate_image_content(
         self,
         base_message: MessageDTO,
@@ -117,6 +253,7 @@ class ContentService:
             preferred_type="image",
             similarity_threshold=0,
             k=1,
+            priority="background",
         )
 
         if not referenced_documents or len(referenced_documents) == 0:
@@ -167,6 +304,7 @@ class ContentService:
             preferred_type="video",
             similarity_threshold=0,
             k=1,
+            priority="background",
         )
 
         if not referenced_documents or len(referenced_documents) == 0:
@@ -224,11 +362,13 @@ class ContentService:
             message = MessageDTO(
                 user_id=user_id,
                 content=MessageTextContentDTO(
-                    text=f"User Profile Data: {user.profile_info}\nContent Objective: {content_objective}"
+                    text=f"User Profile Data: {self.__prompt_profile(user, content_type)}\nContent Objective: {content_objective}"
                 ),
                 role="user",
             )
 
+            self.db_conn.release(session)
+
             content = content_mapping[content_type](
                 base_message=message,
                 session=session,
@@ -244,8 +384,227 @@ class ContentService:
                 session.add(content)
                 session.commit()
 
+                event_broker.publish(
+                    user_channel(user_id),
+                    "content_created",
+                    {
+                        "plan_id": str(content.module.plan_id),
+                        "module_id": str(module_id),
+                        "content_id": str(content.id),
+                        "content_type": content.content_type,
+                        "title": content.title,
+                        "order": content.order,
+                    },
+                )
+
             return content
 
+    def generate_text_contents(
+        self, module_id: UUID, user_id: UUID, items: List[dict]
+    ) -> Tuple[List[Content], List[dict]]:
+        """Generate every text content of a module in a single structured-output call.
+
+        The user profile, module context and RAG context are sent once for all the items
+        instead of once per item. Items with a cached content above the reuse threshold
+        are not sent, and the generated texts are cached. Items missing from the response
+        are returned, so they can be generated one by one.
+
+        Args:
+            module_id (UUID): The ID of the module.
+            user_id (UUID): The ID of the user.
+            items (List[dict]): The outlined text contents, with their content_objective, content_title and order.
+
+        Returns:
+            Tuple[List[Content], List[dict]]: The generated contents and the items missing from the response.
+        """
+        with self.db_conn.get_session() as session:
+            user = User.get_by_id(session, user_id)
+            module = Module.get_by_id(session, module_id, user_id)
+            knowledge_base = (
+                KnowledgeBase.get_by_id(session, self.knowledge_base_id)
+                if self.knowledge_base_id
+                else None
+            )
+
+            model_id = "us.anthropic.claude-3-5-haiku-20241022-v1:0"
+            cache_lookups = self.__lookup_cached_contents(
+                session,
+                user,
+                [(item["content_title"], item["content_objective"]) for item in items],
+                self.module_contents_creator_agent,
+                model_id,
+                knowledge_base,
+            )
+
+            texts = {}
+            cache_keys = {}
+            for item, (cache_key, cached_content, similarity) in zip(
+                items, cache_lookups
+            ):
+                if cached_content and similarity >= self.content_cache.reuse_threshold:
+                    texts[item["order"]] = cached_content.text_content
+                    self.content_cache.record_hit(session, cached_content)
+                elif cache_key:
+                    cache_keys[item["order"]] = cache_key
+
+            generated_items = [item for item in items if item["order"] not in texts]
+            plan_id = module.plan_id
+
+            if generated_items:
+                item_lines = "\n".join(
+                    f"{item['order']}. Title: {item['content_title']}. Objective: {item['content_objective']}"
+                    for item in generated_items
+                )
+                message = MessageDTO(
+                    user_id=user_id,
+                    content=MessageTextContentDTO(
+                        text=f"User Profile Data: {self.__prompt_profile(user, 'text')}\nPlan Title: {module.plan.title}\nModule Title: {module.title}. Module Description: {module.description}\nContent Items:\n{item_lines}"
+                    ),
+                    role="user",
+                )
+
+                self.db_conn.release(session)
+
+                response_message = self.completion_handler.complete(
+                    session=session,
+                    message=message,
+                    user=user,
+                    agent=self.module_contents_creator_agent,
+                    model_id=model_id,
+                    knowledge_base=knowledge_base,
+                    priority="background",
+                    max_tokens=self.module_contents_max_tokens,
+                )
+
+                for generated in response_message.content.data.get("contents", []):
+                    order = generated.get("order", None)
+                    text = generated.get("text", None)
+                    if order not in texts and text:
+                        texts[order] = text
+
+                        if order in cache_keys:
+                            self.content_cache.store(session, cache_keys[order], text)
+
+            contents = []
+            missing_items = []
+            for item in items:
+                text = texts.get(item["order"], None)
+                if not text:
+                    missing_items.append(item)
+                    continue
+
+                contents.append(
+                    Content(
+                        module_id=module_id,
+                        title=item["content_title"],
+                        description=item["content_objective"],
+                        content_type="text",
+                        text_content=text,
+                        order=item["order"],
+                    )
+                )
+
+            session.add_all(contents)
+            session.commit()
+
+            for content in contents:
+                event_broker.publish(
+                    user_channel(user_id),
+                    "content_created",
+                    {
+                        "plan_id": str(plan_id),
+                        "module_id": str(module_id),
+                        "content_id": str(content.id),
+                        "content_type": content.content_type,
+                        "title": content.title,
+                        "order": content.order,
+                    },
+                )
+
+        return contents, missing_items
+
+    def run_content_job(self, job: dict) -> None:
+        """Run a content generation job.
+
+        Contents are identified by their order within the module, so a job retried after
+        its content was saved does not generate it twice.
+
+        Args:
+            job (dict): The content job.
+        """
+        payload = job["payload"]
+
+        with self.db_conn.get_session() as session:
+            existing_content = (
+                session.query(Content.id)
+                .filter(
+                    Content.module_id == job["module_id"],
+                    Content.order == payload["order"],
+                )
+                .first()
+            )
+
+        if existing_content:
+            return
+
+        self.generate_content(
+            job["module_id"],
+            job["user_id"],
+            payload["content_type"],
+            payload["content_objective"],
+            payload["content_title"],
+            payload["order"],
+        )
+
+    def run_text_contents_job(self, job: dict) -> List[dict]:
+        """Run a job generating all the text contents of a module in a single call.
+
+        Items whose content was already saved by a previous attempt are skipped. Items
+        missing from the response get their own content job, as do all the remaining
+        items once the single call failed on the last attempt of the job, so a failing
+        item is retried on its own instead of with the whole batch.
+
+        Args:
+            job (dict): The text contents job.
+
+        Returns:
+            List[dict]: The content jobs of the items that were not generated.
+        """
+        items = job["payload"]["contents"]
+
+        with self.db_conn.get_session() as session:
+            existing_orders = {
+                order
+                for (order,) in session.query(Content.order).filter(
+                    Content.module_id == job["module_id"],
+                    Content.order.in_([item["order"] for item in items]),
+                )
+            }
+
+        items = [item for item in items if item["order"] not in existing_orders]
+        if not items:
+            return []
+
+        try:
+            _, missing_items = self.generate_text_contents(
+                job["module_id"], job["user_id"], items
+            )
+        except OperationCancelled:
+            raise
+        except Exception as e:
+            if job["attempts"] < job["max_attempts"]:
+                raise
+
+            print(
+                f"Error generating the text contents of module {job['module_id']}, queueing them one by one: {e}"
+            )
+            missing_items = items
+
+        return [
+            {"job_type": "content", "module_id": job["module_id"], "payload": item}
+            for item in missing_items
+        ]
+
     def list_contents(self, module_id: UUID, user: User) -> List[ContentListDTO]:
         """List contents for a module.
 
@@ -1,6 +1,6 @@
 from typing import List
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
 
 from src.dto import (
     DocumentCreateDTO,
@@ -38,6 +38,16 @@ def delete_knowledge_base(knowledge_base_id: str) -> ResponseDTO:
     return knowledge_base_service.delete_knowledge_base(knowledge_base_id)
 
 
+@knowledge_base_router.post("/{knowledge_base_id}/reembed", response_model=ResponseDTO)
+def reembed_knowledge_base(
+    knowledge_base_id: str,
+    embedding_version: str = Query(..., description="Target embedding version"),
+) -> ResponseDTO:
+    return knowledge_base_service.reembed_knowledge_base(
+        knowledge_base_id, embedding_version
+    )
+
+
 @knowledge_base_router.get(
     "/{knowledge_base_id}/documents", response_model=List[DocumentListDTO]
 )
@@ -1,6 +1,8 @@
 from typing import List
 from uuid import UUID
 
+from sqlalchemy import update
+
 from src.db import db_connection
 from src.db.tables import Document, KnowledgeBase
 from src.dto import (
@@ -11,14 +13,14 @@ from src.dto import (
     KnowledgeBaseDTO,
     ResponseDTO,
 )
-from src.rag import RAGHandler
+from src.rag import DEFAULT_EMBEDDING_VERSION, re_embedder, rag_handler
 import base64
 
 
 class KnowledgeBaseService:
     def __init__(self):
         self.db_conn = db_connection
-        self.rag_handler = RAGHandler()
+        self.rag_handler = rag_handler
 
     def create_knowledge_base(
         self, knowledge_base: KnowledgeBaseCreateDTO
@@ -32,7 +34,7 @@ class KnowledgeBaseService:
             KnowledgeBaseDTO: The created knowledge base data transfer object.
         """
         with self.db_conn.get_session() as session:
-            knowledge_base = KnowledgeBase()
+            knowledge_base = KnowledgeBase(embedding_version=DEFAULT_EMBEDDING_VERSION)
             session.add(knowledge_base)
             session.commit()
             return KnowledgeBaseDTO.from_entity(knowledge_base)
@@ -77,6 +79,26 @@ class KnowledgeBaseService:
                 status_code=200, message="Knowledge base deleted successfully."
             )
 
+    def reembed_knowledge_base(
+        self, knowledge_base_id: UUID, embedding_version: str
+    ) -> ResponseDTO:
+        """Start re-embedding a knowledge base into a new embedding version in the background.
+
+        Queries keep using the current version until every chunk has been re-embedded.
+
+        Args:
+            knowledge_base_id (UUID): The ID of the knowledge base.
+            embedding_version (str): The target embedding version.
+
+        Returns:
+            ResponseDTO: The response indicating the re-embedding has started.
+        """
+        re_embedder.start(knowledge_base_id, embedding_version)
+        return ResponseDTO(
+            status_code=202,
+            message=f"Re-embedding into {embedding_version} started.",
+        )
+
     def add_document(
         self, knowledge_base_id: UUID, document: DocumentCreateDTO
     ) -> DocumentDTO:
@@ -141,6 +163,11 @@ class KnowledgeBaseService:
         with self.db_conn.get_session() as session:
             document = Document.get_by_id(session, document_id)
             session.delete(document)
+            session.execute(
+                update(KnowledgeBase)
+                .where(KnowledgeBase.id == document.knowledge_base_id)
+                .values(revision=KnowledgeBase.revision + 1)
+            )
             session.commit()
             return ResponseDTO(
                 status_code=200, message="Document removed successfully."
@@ -174,7 +201,9 @@ class KnowledgeBaseService:
                     message=f"Knowledge base with ID {knowledge_base_id} already exists.",
                 )
 
-            knowledge_base = KnowledgeBase(id=knowledge_base_id)
+            knowledge_base = KnowledgeBase(
+                id=knowledge_base_id, embedding_version=DEFAULT_EMBEDDING_VERSION
+            )
             session.add(knowledge_base)
             session.commit()
 
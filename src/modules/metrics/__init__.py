@@ -0,0 +1 @@
+from .metrics_routes import metrics_router
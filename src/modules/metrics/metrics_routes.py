@@ -0,0 +1,44 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, Query
+
+from src.db.tables import User
+from src.dto import (
+    GenerationCancellationMetricsDTO,
+    ModelInvocationMetricsDTO,
+    PlanOriginMetricsDTO,
+)
+from src.security import get_current_user
+
+from .metrics_service import metrics_service
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get(
+    "/model_invocations", response_model=List[ModelInvocationMetricsDTO]
+)
+def get_model_invocation_metrics(
+    since_hours: int = Query(default=24, ge=1),
+    user: User = Depends(get_current_user),
+):
+    return metrics_service.get_model_invocation_metrics(since_hours)
+
+
+@metrics_router.get("/plan_origins", response_model=PlanOriginMetricsDTO)
+def get_plan_origin_metrics(
+    since_hours: int = Query(default=24, ge=1),
+    user: User = Depends(get_current_user),
+):
+    return metrics_service.get_plan_origin_metrics(since_hours)
+
+
+@metrics_router.get(
+    "/generation_cancellations",
+    response_model=List[GenerationCancellationMetricsDTO],
+)
+def get_generation_cancellation_metrics(
+    since_hours: int = Query(default=24, ge=1),
+    user: User = Depends(get_current_user),
+):
+    return metrics_service.get_generation_cancellation_metrics(since_hours)
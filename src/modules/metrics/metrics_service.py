@@ -0,0 +1,188 @@
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from sqlalchemy import func, select
+
+from src.db import db_connection
+from src.db.tables import GenerationJob, ModelInvocation, Plan
+from src.dto import (
+    GenerationCancellationMetricsDTO,
+    ModelInvocationMetricsDTO,
+    PlanOriginMetricsDTO,
+)
+from src.generation import generation_queue
+
+SUCCEEDED = ModelInvocation.outcome == "success"
+
+
+def _percentile(fraction: float):
+    """Build the latency percentile of successful invocations."""
+    return (
+        func.percentile_cont(fraction)
+        .within_group(ModelInvocation.latency_ms.asc())
+        .filter(SUCCEEDED)
+    )
+
+
+def _per_second(tokens):
+    """Build the tokens per second of successful invocations."""
+    return (
+        func.sum(tokens).filter(SUCCEEDED)
+        * 1000.0
+        / func.nullif(func.sum(ModelInvocation.latency_ms).filter(SUCCEEDED), 0)
+    )
+
+
+class MetricsService:
+    def __init__(self):
+        self.db_conn = db_connection
+
+    def get_model_invocation_metrics(
+        self, since_hours: int = 24
+    ) -> List[ModelInvocationMetricsDTO]:
+        """Aggregate the model invocations of a recent period per agent and model.
+
+        Latency percentiles and throughput only consider successful invocations, so
+        throttled or failed calls do not skew them. Throughput is the number of tokens
+        per second of model call, including the time spent waiting for retries.
+
+        Args:
+            since_hours (int, optional): The length of the period, in hours. Defaults to 24.
+
+        Returns:
+            List[ModelInvocationMetricsDTO]: The metrics of each agent and model, most called first.
+        """
+        since = datetime.now(timezone.utc) - timedelta(hours=since_hours)
+        statement = (
+            select(
+                ModelInvocation.agent_label,
+                ModelInvocation.model_id,
+                func.count().label("calls"),
+                func.count().filter(ModelInvocation.outcome == "error").label("errors"),
+                func.count()
+                .filter(ModelInvocation.outcome == "throttled")
+                .label("throttled"),
+                func.count()
+                .filter(ModelInvocation.outcome == "cancelled")
+                .label("cancelled"),
+                func.sum(ModelInvocation.retries).label("retries"),
+                func.sum(ModelInvocation.input_tokens).label("input_tokens"),
+                func.sum(ModelInvocation.output_tokens).label("output_tokens"),
+                func.sum(ModelInvocation.cache_read_input_tokens).label(
+                    "cache_read_input_tokens"
+                ),
+                func.sum(ModelInvocation.cache_write_input_tokens).label(
+                    "cache_write_input_tokens"
+                ),
+                _percentile(0.5).label("latency_p50_ms"),
+                _percentile(0.95).label("latency_p95_ms"),
+                _percentile(0.99).label("latency_p99_ms"),
+                _per_second(ModelInvocation.input_tokens).label(
+                    "input_tokens_per_second"
+                ),
+                _per_second(ModelInvocation.output_tokens).label(
+                    "output_tokens_per_second"
+                ),
+            )
+            .where(ModelInvocation.created_at >= since)
+            .group_by(ModelInvocation.agent_label, ModelInvocation.model_id)
+            .order_by(func.count().desc())
+        )
+
+        with self.db_conn.get_session() as session:
+            rows = session.execute(statement).mappings().all()
+
+        return [ModelInvocationMetricsDTO(**row) for row in rows]
+
+    def get_plan_origin_metrics(self, since_hours: int = 24) -> PlanOriginMetricsDTO:
+        """Count the plans saved in a recent period by how their modules were obtained.
+
+        Args:
+            since_hours (int, optional): The length of the period, in hours. Defaults to 24.
+
+        Returns:
+            PlanOriginMetricsDTO: The number of generated and cloned plans, and the clone ratio.
+        """
+        since = datetime.now(timezone.utc) - timedelta(hours=since_hours)
+        statement = select(
+            func.count().label("plans_saved"),
+            func.count().filter(Plan.origin == "generated").label("plans_generated"),
+            func.count().filter(Plan.origin == "cloned").label("plans_cloned"),
+        ).where(Plan.saved_at >= since)
+
+        with self.db_conn.get_session() as session:
+            row = session.execute(statement).mappings().one()
+
+        return PlanOriginMetricsDTO(
+            **row,
+            clone_ratio=(
+                row["plans_cloned"] / row["plans_saved"] if row["plans_saved"] else None
+            ),
+        )
+
+    def get_generation_cancellation_metrics(
+        self, since_hours: int = 24
+    ) -> List[GenerationCancellationMetricsDTO]:
+        """Count the generation jobs of a recent period cancelled because their plan outline was replaced.
+
+        The saved tokens are estimated from the average usage of the successful
+        invocations of the agent each job type calls, in the same period. Jobs cancelled
+        midway may already have spent part of it.
+
+        Args:
+            since_hours (int, optional): The length of the period, in hours. Defaults to 24.
+
+        Returns:
+            List[GenerationCancellationMetricsDTO]: The cancellations of each job type, most cancelled first.
+        """
+        since = datetime.now(timezone.utc) - timedelta(hours=since_hours)
+        cancellations_statement = (
+            select(GenerationJob.job_type, func.count().label("cancelled_jobs"))
+            .where(
+                GenerationJob.status == "cancelled",
+                GenerationJob.finished_at >= since,
+            )
+            .group_by(GenerationJob.job_type)
+            .order_by(func.count().desc())
+        )
+        usage_statement = (
+            select(
+                ModelInvocation.agent_label,
+                func.avg(ModelInvocation.input_tokens).label("input_tokens"),
+                func.avg(ModelInvocation.output_tokens).label("output_tokens"),
+            )
+            .where(SUCCEEDED, ModelInvocation.created_at >= since)
+            .group_by(ModelInvocation.agent_label)
+        )
+
+        with self.db_conn.get_session() as session:
+            cancellations = session.execute(cancellations_statement).mappings().all()
+            usage = {
+                row["agent_label"]: row
+                for row in session.execute(usage_statement).mappings().all()
+            }
+
+        metrics = []
+        for row in cancellations:
+            agent_usage = usage.get(generation_queue.agent_labels.get(row["job_type"]))
+
+            metrics.append(
+                GenerationCancellationMetricsDTO(
+                    **row,
+                    estimated_saved_input_tokens=(
+                        round(agent_usage["input_tokens"] * row["cancelled_jobs"])
+                        if agent_usage
+                        else 0
+                    ),
+                    estimated_saved_output_tokens=(
+                        round(agent_usage["output_tokens"] * row["cancelled_jobs"])
+                        if agent_usage
+                        else 0
+                    ),
+                )
+            )
+
+        return metrics
+
+
+metrics_service: MetricsService = MetricsService()
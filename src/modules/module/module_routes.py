@@ -3,7 +3,7 @@ from uuid import UUID
 
 from fastapi import APIRouter, Depends, Query
 
-from src.dto import ModuleDTO, ModuleListDTO, ResponseDTO
+from src.dto import ModuleDTO, ModuleGenerationStatusDTO, ModuleListDTO, ResponseDTO
 from src.security import get_current_user
 
 from .module_service import module_service
@@ -21,6 +21,22 @@ def get_module(plan_id: UUID, module_id: UUID, current_user=Depends(get_current_
     return module_service.get_module(module_id, current_user)
 
 
+@module_router.get("/{module_id}/generation", response_model=ModuleGenerationStatusDTO)
+def get_generation_status(
+    plan_id: UUID, module_id: UUID, current_user=Depends(get_current_user)
+):
+    return module_service.get_generation_status(module_id, current_user)
+
+
+@module_router.post(
+    "/{module_id}/regenerate_failed", response_model=ModuleGenerationStatusDTO
+)
+def regenerate_failed(
+    plan_id: UUID, module_id: UUID, current_user=Depends(get_current_user)
+):
+    return module_service.regenerate_failed(module_id, current_user)
+
+
 @module_router.put("/{module_id}/complete", response_model=ResponseDTO)
 def update_completed_status(
     plan_id: UUID,
@@ -1,25 +1,39 @@
 import os
-from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from typing import List
 from uuid import UUID
 
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
 from src.db import db_connection
-from src.db.tables import Agent, Module, Plan, User
+from src.db.tables import Agent, GenerationJob, Module, Plan, User
 from src.dto import (
+    ContentGenerationStatusDTO,
     MessageDTO,
     MessageTextContentDTO,
     ModuleDTO,
+    ModuleGenerationStatusDTO,
     ModuleListDTO,
     ResponseDTO,
 )
-from src.llm import BedrockHandler
-from src.modules.content.content_service import content_service
+from src.events import event_broker, user_channel
+from src.generation import generation_queue
+from src.llm import bedrock_handler
+
+JOB_ITEM_STATUSES = {
+    "pending": "pending",
+    "deferred": "pending",
+    "running": "running",
+    "failed": "failed",
+    "done": "done",
+}
 
 
 class ModuleService:
     def __init__(self):
         self.db_conn = db_connection
-        self.handler = BedrockHandler()
+        self.handler = bedrock_handler
 
         module_outline_creator_agent_id = os.getenv(
             "MODULE_OUTLINE_CREATOR_AGENT_ID", None
@@ -38,59 +52,243 @@ class ModuleService:
                     f"Agent with ID {module_outline_creator_agent_id} not found in the database."
                 )
 
-    def generate_modules(
+        self.generation_mode = os.getenv("MODULE_GENERATION_MODE", "per_content")
+        self.generation_policy = os.getenv("MODULE_GENERATION_POLICY", "eager")
+        self.prefetch_count = int(os.getenv("MODULE_PREFETCH_COUNT", "2"))
+        self.prefetch_budget = int(os.getenv("PLAN_PREFETCH_BUDGET", "4"))
+
+        generation_queue.register(
+            "module",
+            self.run_module_job,
+            agent_label=self.module_outline_creator_agent.label,
+        )
+
+    def enqueue_modules(
         self, plan_id: UUID, user: User, extra_information: str = None
-    ) -> List[ModuleDTO]:
-        """Generate modules for a plan using AI agent.
+    ) -> None:
+        """Queue the generation of the modules of a plan.
+
+        One job per module is persisted in the same transaction that marks the plan as
+        "creating_modules", so generation survives restarts. Each module job then queues
+        one job per content.
+
+        With the "lazy" generation policy, the module jobs are deferred and the plan is
+        created right away. A module is generated when it is first accessed, and the
+        first modules are prefetched (see `request_generation`).
 
-        Will generate the modules assynchronously.
+        The plan is locked while its jobs are queued, and only the modules of the current
+        outline without a module job are queued, so a duplicate save attaches to the
+        generation already in flight. Modules adopted from the speculative generation
+        are already generated or being generated, and are not queued either.
 
         Args:
             plan_id (UUID): The ID of the plan.
             user (User): The currently authenticated user.
             extra_information (str, optional): Any extra information to guide module generation.
-
-        Returns:
-            List[ModuleDTO]: List of generated modules.
         """
+        lazy = self.generation_policy == "lazy"
+
         with self.db_conn.get_session() as session:
             plan = Plan.get_by_id(session, plan_id, user.id)
-            modules_ids = [m.id for m in plan.modules]
-            plan.status = "creating_modules"
-            session.commit()
+            session.execute(select(Plan.id).where(Plan.id == plan.id).with_for_update())
+            session.refresh(plan)
+
+            queued_module_ids = set(
+                session.execute(
+                    select(GenerationJob.module_id).where(
+                        GenerationJob.plan_id == plan.id,
+                        GenerationJob.job_type == "module",
+                        GenerationJob.epoch == plan.generation_epoch,
+                    )
+                ).scalars()
+            )
 
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            futures = [
-                executor.submit(self.generate_module, m, user, extra_information)
-                for m in modules_ids
+            modules = sorted(plan.modules, key=lambda m: m.order)
+            pending_modules = [
+                m
+                for m in modules
+                if m.id not in queued_module_ids and m.status == "creating_outline"
             ]
-            results = [f.result() for f in futures]
+            if not pending_modules and plan.status != "creating_outline":
+                session.commit()
+                return
+
+            status = (
+                "creating_modules"
+                if any(m.status != "created" for m in modules) and not lazy
+                else "created"
+            )
+            plan.status = status
+            plan.origin = "generated"
+            plan.saved_at = datetime.now(timezone.utc)
+
+            for module in pending_modules:
+                generation_queue.enqueue(
+                    session,
+                    "module",
+                    plan.id,
+                    user.id,
+                    module_id=module.id,
+                    payload={"extra_information": extra_information},
+                    deferred=lazy,
+                    epoch=plan.generation_epoch,
+                )
+
+            if lazy and pending_modules:
+                session.flush()
+                self.__activate_modules(session, plan, modules[0])
 
-        with self.db_conn.get_session() as session:
-            plan = Plan.get_by_id(session, plan_id, user.id)
-            plan.status = "created"
             session.commit()
 
-            return ModuleDTO.from_entities(plan.modules)
+        generation_queue.notify()
+        event_broker.publish(
+            user_channel(user.id),
+            "plan_started" if status == "creating_modules" else "plan_done",
+            {"plan_id": str(plan_id), "modules_count": len(modules)},
+        )
 
-    def generate_module(
-        self, module_id: UUID, user: User, extra_information: str = None
-    ) -> ModuleDTO:
-        """Generate module contents using AI agent.
+    def request_generation(self, session: Session, module: Module) -> bool:
+        """Generate a module on first access and prefetch the next ones, with the lazy policy.
 
-        Will generate the content assynchronously.
+        The accessed module is always generated. The next MODULE_PREFETCH_COUNT modules are
+        generated in the background, as long as the plan has not used its prefetch budget.
+
+        Args:
+            session (Session): The database session.
+            module (Module): The accessed module.
+
+        Returns:
+            bool: Whether any module job was activated. Call `generation_queue.notify` after committing.
+        """
+        if self.generation_policy != "lazy":
+            return False
+
+        if not any(m.status == "creating_outline" for m in module.plan.modules):
+            return False
+
+        return self.__activate_modules(session, module.plan, module)
+
+    def __activate_modules(self, session: Session, plan: Plan, module: Module) -> bool:
+        """Activate the deferred job of a module and prefetch the next modules within the budget.
+
+        Args:
+            session (Session): The database session.
+            plan (Plan): The plan of the module.
+            module (Module): The accessed module.
+
+        Returns:
+            bool: Whether any module job was activated.
+        """
+        session.execute(select(Plan.id).where(Plan.id == plan.id).with_for_update())
+
+        activated = generation_queue.activate(session, "module", [module.id], "access")
+
+        prefetched_count = session.execute(
+            select(func.count()).where(
+                GenerationJob.plan_id == plan.id,
+                GenerationJob.job_type == "module",
+                GenerationJob.payload["trigger"].astext == "prefetch",
+            )
+        ).scalar()
+
+        next_modules = [
+            m.id
+            for m in sorted(plan.modules, key=lambda m: m.order)
+            if m.order > module.order
+        ][: self.prefetch_count]
+
+        activated += generation_queue.activate(
+            session,
+            "module",
+            next_modules,
+            "prefetch",
+            limit=max(self.prefetch_budget - prefetched_count, 0),
+        )
+
+        return bool(activated)
+
+    def run_module_job(self, job: dict) -> List[dict]:
+        """Run a module generation job, returning the jobs that generate its contents.
+
+        There is one content job per outlined content. In "single_call" generation mode,
+        the text contents are instead generated together by a single "text_contents" job.
+
+        Args:
+            job (dict): The module job.
+
+        Returns:
+            List[dict]: The content jobs.
+        """
+        with self.db_conn.get_session() as session:
+            user = User.get_by_id(session, job["user_id"])
+
+        contents = self.generate_module_outline(
+            job["module_id"], user, job["payload"].get("extra_information", None)
+        )
+
+        content_jobs = []
+        text_items = []
+        for i, content in enumerate(contents):
+            content_type = content.get("type", None)
+            content_objective = content.get("content", None)
+            content_title = content.get("title", None)
+            if not content_type or not content_objective:
+                continue
+
+            item = {
+                "content_type": content_type,
+                "content_objective": content_objective,
+                "content_title": content_title,
+                "order": i,
+            }
+
+            if content_type == "text" and self.generation_mode == "single_call":
+                text_items.append(item)
+                continue
+
+            content_jobs.append(
+                {"job_type": "content", "module_id": job["module_id"], "payload": item}
+            )
+
+        if text_items:
+            content_jobs.append(
+                {
+                    "job_type": "text_contents",
+                    "module_id": job["module_id"],
+                    "payload": {"contents": text_items},
+                }
+            )
+
+        return content_jobs
+
+    def generate_module_outline(
+        self, module_id: UUID, user: User, extra_information: str = None
+    ) -> List[dict]:
+        """Generate the outline of the contents of a module using AI agent.
 
         Args:
             module_id (UUID): The ID of the module.
-            user (User): The currently authenticated user.
+            user (User): The user the module belongs to.
             extra_information (str, optional): Any extra information to guide content generation.
 
         Returns:
-            ModuleDTO: The generated module data transfer object.
+            List[dict]: The outlined contents, with their type, objective and title.
         """
         with self.db_conn.get_session() as session:
             module = Module.get_by_id(session, module_id, user.id)
             module.status = "creating_contents"
+            self.db_conn.release(session)
+
+            if not module.speculative:
+                event_broker.publish(
+                    user_channel(user.id),
+                    "module_started",
+                    {
+                        "plan_id": str(module.plan_id),
+                        "module_id": str(module.id),
+                        "title": module.title,
+                    },
+                )
 
             message_text = f"User Profile Data: {user.profile_info}\nPlan Title: {module.plan.title}\nPlan Description: {module.plan.description}\nModule Title: {module.title}. Module Description: {module.description}"
             if extra_information:
@@ -108,38 +306,13 @@ class ModuleService:
                 user=user,
                 agent=self.module_outline_creator_agent,
                 model_id="us.anthropic.claude-3-5-sonnet-20240620-v1:0",
+                priority="background",
             )
 
             contents = response_message.content.data.get("contents", [])
             session.commit()
 
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            futures = []
-            for i, content in enumerate(contents):
-                content_type = content.get("type", None)
-                content_objective = content.get("content", None)
-                content_title = content.get("title", None)
-                if content_type and content_objective:
-                    futures.append(
-                        executor.submit(
-                            content_service.generate_content,
-                            module_id,
-                            user.id,
-                            content_type,
-                            content_objective,
-                            content_title,
-                            i,
-                        )
-                    )
-
-            results = [f.result() for f in futures]
-
-        with self.db_conn.get_session() as session:
-            module = Module.get_by_id(session, module_id, user.id)
-            module.status = "created"
-            session.commit()
-
-            return ModuleDTO.from_entity(module)
+        return contents
 
     def list_modules(self, plan_id: UUID, user: User) -> List[ModuleListDTO]:
         """List modules for a plan.
@@ -157,7 +330,7 @@ class ModuleService:
             return ModuleListDTO.from_entities(modules)
 
     def get_module(self, module_id: UUID, user: User) -> ModuleDTO:
-        """Get a specific module for a plan.
+        """Get a specific module for a plan, requesting its generation on first access.
 
         Args:
             module_id (UUID): The ID of the module.
@@ -168,7 +341,135 @@ class ModuleService:
         """
         with self.db_conn.get_session() as session:
             module = Module.get_by_id(session, module_id, user.id)
-            return ModuleDTO.from_entity(module)
+
+            activated = self.request_generation(session, module)
+            module_dto = ModuleDTO.from_entity(module)
+            module_dto.failed_count = self.__generation_status(
+                session, module
+            ).failed_count
+            session.commit()
+
+        if activated:
+            generation_queue.notify()
+
+        return module_dto
+
+    def get_generation_status(
+        self, module_id: UUID, user: User
+    ) -> ModuleGenerationStatusDTO:
+        """Get the generation status of a module and of each of its outlined contents.
+
+        Args:
+            module_id (UUID): The ID of the module.
+            user (User): The currently authenticated user.
+
+        Returns:
+            ModuleGenerationStatusDTO: The statuses of the module outline and contents.
+        """
+        with self.db_conn.get_session() as session:
+            module = Module.get_by_id(session, module_id, user.id)
+            return self.__generation_status(session, module)
+
+    def regenerate_failed(
+        self, module_id: UUID, user: User
+    ) -> ModuleGenerationStatusDTO:
+        """Queue the generation of the failed items of a module again.
+
+        Only the outline or contents whose jobs ran out of attempts are generated again,
+        the contents already saved are kept.
+
+        Args:
+            module_id (UUID): The ID of the module.
+            user (User): The currently authenticated user.
+
+        Returns:
+            ModuleGenerationStatusDTO: The statuses of the module outline and contents.
+        """
+        with self.db_conn.get_session() as session:
+            module = Module.get_by_id(session, module_id, user.id)
+            plan = module.plan
+            session.execute(select(Plan.id).where(Plan.id == plan.id).with_for_update())
+            session.refresh(plan)
+            session.refresh(module)
+
+            retried = generation_queue.retry_failed(
+                session, module.id, plan.generation_epoch
+            )
+            if retried:
+                if module.status != "completed":
+                    module.status = "creating_contents"
+                if plan.status == "created":
+                    plan.status = "creating_modules"
+
+            session.commit()
+            status_dto = self.__generation_status(session, module)
+
+        if retried:
+            generation_queue.notify()
+
+        return status_dto
+
+    def __generation_status(
+        self, session: Session, module: Module
+    ) -> ModuleGenerationStatusDTO:
+        """Derive the status of each outlined content of a module from its generation jobs.
+
+        A content is identified by its order within the module. Its status is the status
+        of the latest job generating it, unless the content is already saved.
+
+        Args:
+            session (Session): The database session.
+            module (Module): The module.
+
+        Returns:
+            ModuleGenerationStatusDTO: The statuses of the module outline and contents.
+        """
+        jobs = session.execute(
+            select(GenerationJob)
+            .where(
+                GenerationJob.module_id == module.id,
+                GenerationJob.status != "cancelled",
+            )
+            .order_by(GenerationJob.created_at)
+        ).scalars()
+
+        outline_job = None
+        items = {}
+        for job in jobs:
+            if job.job_type == "module":
+                outline_job = job
+            elif job.job_type == "text_contents":
+                for item in job.payload.get("contents", []):
+                    items[item["order"]] = (item, job)
+            elif job.job_type == "content":
+                items[job.payload["order"]] = (job.payload, job)
+
+        saved_orders = {content.order for content in module.contents}
+
+        contents = []
+        for order, (item, job) in sorted(items.items()):
+            saved = order in saved_orders
+            contents.append(
+                ContentGenerationStatusDTO(
+                    order=order,
+                    content_type=item.get("content_type", "text"),
+                    title=item.get("content_title", None),
+                    status="done" if saved else JOB_ITEM_STATUSES[job.status],
+                    attempts=job.attempts,
+                    last_error=None if saved else job.last_error,
+                )
+            )
+
+        outline_status = JOB_ITEM_STATUSES[outline_job.status] if outline_job else None
+
+        return ModuleGenerationStatusDTO(
+            module_id=module.id,
+            status=module.status,
+            outline_status=outline_status,
+            contents=contents,
+            failed_count=sum(c.status == "failed" for c in contents)
+            + (outline_status == "failed"),
+        )
 
     def update_completed_status(
         self, module_id: UUID, user: User, completed: bool
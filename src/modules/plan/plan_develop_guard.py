@@ -0,0 +1,173 @@
+import os
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Iterator
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import delete, func, select, update
+
+from src.db import db_connection
+from src.db.tables import Plan, PlanDevelopRequest
+
+
+class PlanDevelopGuard:
+    def __init__(self):
+        self.db_conn = db_connection
+
+        self.timeout_seconds = int(os.getenv("PLAN_DEVELOP_TIMEOUT_SECONDS", "300"))
+        self.poll_interval = 0.5
+
+    @contextmanager
+    def run(self, plan_id: UUID, idempotency_key: str = None) -> Iterator[bool]:
+        """Allow a single develop request of a plan to run at a time.
+
+        A request repeating the idempotency key of a previous request of the plan, e.g.
+        a double-click or a client retry, attaches to it instead of calling the agent
+        again: it waits for the previous request to finish and the caller returns the
+        resulting plan. Requests running for longer than PLAN_DEVELOP_TIMEOUT_SECONDS are
+        considered lost and no longer block the plan.
+
+        Args:
+            plan_id (UUID): The ID of the plan.
+            idempotency_key (str, optional): The idempotency key of the request. Defaults to None.
+
+        Raises:
+            HTTPException: If another request is developing the plan, or the attached request failed.
+
+        Yields:
+            bool: Whether the request attached to a previous one, in which case the caller must not develop the plan.
+        """
+        request_id = self.__begin(plan_id, idempotency_key)
+
+        if request_id is None:
+            self.__wait(plan_id, idempotency_key)
+            yield True
+            return
+
+        try:
+            yield False
+        except BaseException:
+            self.__finish(request_id, "failed")
+            raise
+
+        self.__finish(request_id, "done")
+
+    def __begin(self, plan_id: UUID, idempotency_key: str | None) -> UUID | None:
+        """Register a develop request, serialized by a lock on the plan.
+
+        Args:
+            plan_id (UUID): The ID of the plan.
+            idempotency_key (str | None): The idempotency key of the request.
+
+        Raises:
+            HTTPException: If another request is developing the plan.
+
+        Returns:
+            UUID | None: The ID of the new request, or None if a request with the same key exists.
+        """
+        with self.db_conn.get_session() as session:
+            session.execute(select(Plan.id).where(Plan.id == plan_id).with_for_update())
+
+            session.execute(
+                update(PlanDevelopRequest)
+                .where(
+                    PlanDevelopRequest.plan_id == plan_id,
+                    PlanDevelopRequest.status == "running",
+                    PlanDevelopRequest.created_at
+                    < func.now() - timedelta(seconds=self.timeout_seconds),
+                )
+                .values(status="failed", finished_at=func.now())
+            )
+
+            if idempotency_key:
+                status = session.execute(
+                    select(PlanDevelopRequest.status).where(
+                        PlanDevelopRequest.plan_id == plan_id,
+                        PlanDevelopRequest.idempotency_key == idempotency_key,
+                    )
+                ).scalar_one_or_none()
+
+                if status in ("running", "done"):
+                    session.commit()
+                    return None
+
+                if status == "failed":
+                    session.execute(
+                        delete(PlanDevelopRequest).where(
+                            PlanDevelopRequest.plan_id == plan_id,
+                            PlanDevelopRequest.idempotency_key == idempotency_key,
+                        )
+                    )
+
+            running = session.execute(
+                select(PlanDevelopRequest.id).where(
+                    PlanDevelopRequest.plan_id == plan_id,
+                    PlanDevelopRequest.status == "running",
+                )
+            ).scalar_one_or_none()
+
+            if running:
+                session.commit()
+                raise HTTPException(
+                    status_code=409,
+                    detail="The plan is already being developed by another request.",
+                )
+
+            request = PlanDevelopRequest(
+                plan_id=plan_id, idempotency_key=idempotency_key
+            )
+            session.add(request)
+            session.flush()
+            request_id = request.id
+            session.commit()
+
+            return request_id
+
+    def __wait(self, plan_id: UUID, idempotency_key: str):
+        """Wait for the request with an idempotency key to finish.
+
+        Args:
+            plan_id (UUID): The ID of the plan.
+            idempotency_key (str): The idempotency key of the request.
+
+        Raises:
+            HTTPException: If the request failed or did not finish in time.
+        """
+        deadline = time.monotonic() + self.timeout_seconds
+
+        while True:
+            with self.db_conn.get_session() as session:
+                status = session.execute(
+                    select(PlanDevelopRequest.status).where(
+                        PlanDevelopRequest.plan_id == plan_id,
+                        PlanDevelopRequest.idempotency_key == idempotency_key,
+                    )
+                ).scalar_one_or_none()
+
+            if status == "done":
+                return
+
+            if status != "running" or time.monotonic() > deadline:
+                raise HTTPException(
+                    status_code=409,
+                    detail="The request with this idempotency key did not complete, retry it.",
+                )
+
+            time.sleep(self.poll_interval)
+
+    def __finish(self, request_id: UUID, status: str):
+        try:
+            with self.db_conn.get_session() as session:
+                session.execute(
+                    update(PlanDevelopRequest)
+                    .where(PlanDevelopRequest.id == request_id)
+                    .values(status=status, finished_at=func.now())
+                )
+                session.commit()
+        except Exception as e:
+            print(f"Error finishing plan develop request {request_id}: {e}")
+
+
+plan_develop_guard: PlanDevelopGuard = PlanDevelopGuard()
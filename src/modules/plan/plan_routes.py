@@ -1,13 +1,17 @@
 from typing import List
 from uuid import UUID
 
-from fastapi import APIRouter, BackgroundTasks, Depends
+from fastapi import APIRouter, Depends, Header
+from fastapi.responses import StreamingResponse
 
 from src.dto import MessageDTO, PlanDTO, PlanWithAllMessagesDTO
+from src.events import event_broker, stream_events, user_channel
+from src.llm import llm_executor, to_sse
 from src.modules.module.module_service import module_service
 from src.security import get_current_user
 
 from .plan_service import plan_service
+from .plan_template_service import plan_template_service
 
 plan_router = APIRouter()
 
@@ -17,33 +21,123 @@ def list_plans(current_user=Depends(get_current_user)) -> List[PlanDTO]:
     return plan_service.list_plans(current_user)
 
 
+@plan_router.get("/events")
+async def stream_plans_events(current_user=Depends(get_current_user)):
+    subscription = event_broker.subscribe(user_channel(current_user.id))
+
+    return StreamingResponse(
+        to_sse(stream_events(subscription)), media_type="text/event-stream"
+    )
+
+
+@plan_router.get("/{plan_id}/events")
+async def stream_plan_events(plan_id: UUID, current_user=Depends(get_current_user)):
+    subscription = event_broker.subscribe(user_channel(current_user.id))
+
+    try:
+        snapshot = await llm_executor.run(
+            plan_service.get_generation_status, plan_id, current_user
+        )
+    except Exception:
+        subscription.close()
+        raise
+
+    def include(event: dict) -> bool:
+        data = event["data"]
+        return isinstance(data, dict) and data.get("plan_id", None) == str(plan_id)
+
+    def until(event: dict) -> bool:
+        if event["event"] == "snapshot":
+            return event["data"].status in ("created", "completed")
+
+        return event["event"] == "plan_done"
+
+    return StreamingResponse(
+        to_sse(
+            stream_events(
+                subscription,
+                initial_events=[{"event": "snapshot", "data": snapshot}],
+                include=include,
+                until=until,
+            )
+        ),
+        media_type="text/event-stream",
+    )
+
+
 @plan_router.get("/{plan_id}", response_model=PlanWithAllMessagesDTO)
 def get_plan(plan_id: UUID, current_user=Depends(get_current_user)):
     return plan_service.get_plan(plan_id, current_user)
 
 
 @plan_router.post("", response_model=PlanDTO)
-def create_plan(current_user=Depends(get_current_user)):
-    return plan_service.create_plan(current_user)
+async def create_plan(current_user=Depends(get_current_user)):
+    return await llm_executor.run(plan_service.create_plan, current_user)
 
 
 @plan_router.post("/{plan_id}/develop", response_model=PlanDTO)
-def develop_plan(
+async def develop_plan(
     message: MessageDTO,
     plan_id: UUID,
-    background_tasks: BackgroundTasks,
     current_user=Depends(get_current_user),
+    idempotency_key: str | None = Header(default=None, alias="Idempotency-Key"),
 ):
-    plan_dto = plan_service.develop_plan(
-        plan_id=plan_id, user=current_user, message=message
+    plan_dto = await llm_executor.run(
+        plan_service.develop_plan,
+        plan_id=plan_id,
+        user=current_user,
+        message=message,
+        idempotency_key=idempotency_key,
     )
 
-    if plan_dto.last_message.content.data.get("ready_to_save", False):
-        background_tasks.add_task(
-            module_service.generate_modules,
+    if not plan_dto.attached and plan_dto.last_message.content.data.get(
+        "ready_to_save", False
+    ):
+        await llm_executor.run(
+            module_service.enqueue_modules,
             plan_id,
             current_user,
             plan_dto.last_message.content.data.get("user_observations", None),
         )
 
     return plan_dto
+
+
+@plan_router.post("/{plan_id}/develop/stream")
+async def develop_plan_stream(
+    message: MessageDTO,
+    plan_id: UUID,
+    current_user=Depends(get_current_user),
+    idempotency_key: str | None = Header(default=None, alias="Idempotency-Key"),
+):
+    async def events():
+        async for event in llm_executor.iterate(
+            plan_service.develop_plan_stream(
+                plan_id=plan_id,
+                user=current_user,
+                message=message,
+                idempotency_key=idempotency_key,
+            )
+        ):
+            if event["event"] == "message" and event["data"].content.data.get(
+                "ready_to_save", False
+            ):
+                await llm_executor.run(
+                    module_service.enqueue_modules,
+                    plan_id,
+                    current_user,
+                    event["data"].content.data.get("user_observations", None),
+                )
+
+            yield event
+
+    return StreamingResponse(to_sse(events()), media_type="text/event-stream")
+
+
+@plan_router.post("/{plan_id}/templates/{template_id}/clone", response_model=PlanDTO)
+async def clone_plan_template(
+    plan_id: UUID, template_id: UUID, current_user=Depends(get_current_user)
+):
+    return await llm_executor.run(
+        plan_template_service.clone_template, plan_id, template_id, current_user
+    )
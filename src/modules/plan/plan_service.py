@@ -1,18 +1,31 @@
 import os
 from datetime import datetime
-from typing import List
+from typing import Iterator, List
 from uuid import UUID
 
+from sqlalchemy.orm import Session
+
 from src.db import db_connection
 from src.db.tables import Agent, Chat, Module, Plan, User
-from src.dto import MessageDTO, MessageTextContentDTO, PlanDTO, PlanWithAllMessagesDTO
-from src.llm import BedrockHandler
+from src.dto import (
+    MessageDTO,
+    MessageTextContentDTO,
+    PlanDTO,
+    PlanGenerationStatusDTO,
+    PlanWithAllMessagesDTO,
+)
+from src.generation import generation_queue
+from src.llm import bedrock_handler
+
+from .plan_develop_guard import plan_develop_guard
+from .plan_template_service import plan_template_service
+from .speculative_module_service import speculative_module_service
 
 
 class PlanService:
     def __init__(self):
         self.db_conn = db_connection
-        self.handler = BedrockHandler()
+        self.handler = bedrock_handler
 
         plan_outline_creator_agent_id = os.getenv("PLAN_OUTLINE_CREATOR_AGENT_ID", None)
         if not plan_outline_creator_agent_id:
@@ -60,6 +73,22 @@ class PlanService:
 
             return PlanWithAllMessagesDTO.from_entity(plan)
 
+    def get_generation_status(
+        self, plan_id: UUID, user: User
+    ) -> PlanGenerationStatusDTO:
+        """Get the status of a plan and of its modules, without its messages.
+
+        Args:
+            plan_id (UUID): The ID of the plan.
+            user (User): The currently authenticated user.
+
+        Returns:
+            PlanGenerationStatusDTO: The statuses of the plan and its modules.
+        """
+        with self.db_conn.get_session() as session:
+            plan = Plan.get_by_id(session, plan_id, user.id)
+            return PlanGenerationStatusDTO.from_entity(plan)
+
     def create_plan(self, user: User) -> PlanDTO:
         """Create a new plan for a user.
 
@@ -80,31 +109,124 @@ class PlanService:
             new_plan.last_viewed_at = datetime.now()
             session.add(new_plan)
 
-            response_message = self.handler.complete(
-                session=session,
-                message=MessageDTO(
-                    chat_id=new_chat.id,
-                    user_id=user.id,
-                    content=MessageTextContentDTO(
-                        text=f"User Profile Data: {user.profile_info}."
+            try:
+                response_message = self.handler.complete(
+                    session=session,
+                    message=MessageDTO(
+                        chat_id=new_chat.id,
+                        user_id=user.id,
+                        content=MessageTextContentDTO(
+                            text=f"User Profile Data: {user.profile_info}."
+                        ),
+                        role="user",
                     ),
-                    role="user",
-                ),
-                user=user,
-                agent=self.plan_outline_creator_agent,
-                model_id="us.anthropic.claude-3-5-sonnet-20240620-v1:0",
-            )
+                    user=user,
+                    agent=self.plan_outline_creator_agent,
+                    model_id="us.anthropic.claude-3-5-sonnet-20240620-v1:0",
+                )
+            except Exception:
+                self.__discard_plan(session, new_plan, new_chat)
+                raise
 
             session.commit()
 
             return PlanDTO.from_entity(new_plan)
 
-    def develop_plan(self, plan_id: UUID, user: User, message: MessageDTO) -> PlanDTO:
+    def __discard_plan(self, session: Session, plan: Plan, chat: Chat):
+        """Delete a plan and its chat whose first completion failed.
+
+        The handler commits the plan and chat along with the incoming message before
+        calling the model, so they are deleted explicitly instead of rolled back.
+
+        Args:
+            session (Session): The database session.
+            plan (Plan): The new plan.
+            chat (Chat): The chat of the new plan.
+        """
+        try:
+            session.delete(plan)
+            session.delete(chat)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"Error discarding plan {plan.id} after a failed completion: {e}")
+
+    def __save_outline(
+        self, session: Session, plan: Plan, response_message: MessageDTO
+    ):
+        """Store the plan outline proposed by the agent once it is ready to be saved.
+
+        Replacing the modules starts a new generation epoch, so the generation still
+        running for the previous modules is cancelled. Modules already generated
+        speculatively from previous proposals are kept when the saved outline has them.
+
+        Args:
+            session (Session): The database session.
+            plan (Plan): The plan being developed.
+            response_message (MessageDTO): The response message from the agent.
+        """
+        queued = False
+
+        if response_message.content.data.get("ready_to_save", False):
+            plan.title = response_message.content.data.get("title", None) or plan.title
+
+            plan.description = (
+                response_message.content.data.get("description", None)
+            ) or plan.description
+
+            modules = response_message.content.data.get("modules", [])
+            previous_modules = list(plan.modules)
+
+            adopted = speculative_module_service.adopt(session, plan, modules)
+            generation_queue.supersede(
+                session, plan.id, [m.id for m in adopted.values()]
+            )
+
+            for module in previous_modules:
+                session.delete(module)
+
+            session.flush()
+
+            for i, module in enumerate(modules):
+                if i in adopted:
+                    continue
+
+                module_db = Module(
+                    plan_id=plan.id,
+                    title=module.get("title", "Untitled Module"),
+                    description=module.get("description", ""),
+                    order=i,
+                )
+
+                session.add(module_db)
+                session.flush()
+        else:
+            queued = speculative_module_service.observe(
+                session, plan, response_message.content.data
+            )
+
+        session.commit()
+
+        if queued:
+            generation_queue.notify()
+
+    def develop_plan(
+        self,
+        plan_id: UUID,
+        user: User,
+        message: MessageDTO,
+        idempotency_key: str = None,
+    ) -> PlanDTO:
         """Develop a plan using an AI agent.
 
+        Only one develop request of a plan runs at a time (see `PlanDevelopGuard`). The
+        returned plan is flagged as `attached` when this request did not develop it, so
+        its modules are not queued again.
+
         Args:
             plan_id (UUID): The ID of the plan to develop.
             user (User): The currently authenticated user.
+            idempotency_key (str, optional): The idempotency key of the request. Defaults to None.
 
         Returns:
             PlanDTO: The developed plan.
@@ -113,47 +235,114 @@ class PlanService:
             plan = Plan.get_by_id(session, plan_id, user.id)
 
             if plan.status == "created":
-                return PlanDTO.from_entity(plan)
+                return self.__attached_plan_dto(plan)
 
-            message.chat_id = plan.chat_id
+            with plan_develop_guard.run(plan.id, idempotency_key) as attached:
+                session.refresh(plan)
 
-            response_message = self.handler.complete(
-                session=session,
-                message=message,
-                user=user,
-                agent=self.plan_outline_creator_agent,
-                model_id="us.anthropic.claude-3-5-sonnet-20240620-v1:0",
-            )
+                if attached:
+                    return self.__attached_plan_dto(plan)
+
+                message.chat_id = plan.chat_id
 
-            if response_message.content.data.get("ready_to_save", False):
-                plan.title = (
-                    response_message.content.data.get("title", None) or plan.title
+                response_message = self.handler.complete(
+                    session=session,
+                    message=message,
+                    user=user,
+                    agent=self.plan_outline_creator_agent,
+                    model_id="us.anthropic.claude-3-5-sonnet-20240620-v1:0",
                 )
 
-                plan.description = (
-                    response_message.content.data.get("description", None)
-                ) or plan.description
+                self.__save_outline(session, plan, response_message)
+                return self.__to_plan_dto(session, plan, user, response_message)
 
-                modules = response_message.content.data.get("modules", [])
+    def develop_plan_stream(
+        self,
+        plan_id: UUID,
+        user: User,
+        message: MessageDTO,
+        idempotency_key: str = None,
+    ) -> Iterator[dict]:
+        """Develop a plan using an AI agent, streaming the agent response.
 
-                for module in plan.modules:
-                    session.delete(module)
+        A request attached to a previous one with the same idempotency key only gets the
+        final `plan` event.
 
-                session.flush()
+        Args:
+            plan_id (UUID): The ID of the plan to develop.
+            user (User): The currently authenticated user.
+            idempotency_key (str, optional): The idempotency key of the request. Defaults to None.
+
+        Yields:
+            dict: The stream events, followed by a final `plan` event with the developed plan.
+        """
+        with self.db_conn.get_session() as session:
+            plan = Plan.get_by_id(session, plan_id, user.id)
+            response_message = None
+
+            if plan.status != "created":
+                with plan_develop_guard.run(plan.id, idempotency_key) as attached:
+                    session.refresh(plan)
+
+                    if attached:
+                        yield {"event": "plan", "data": self.__attached_plan_dto(plan)}
+                        return
+
+                    message.chat_id = plan.chat_id
+
+                    for event in self.handler.complete_stream(
+                        session=session,
+                        message=message,
+                        user=user,
+                        agent=self.plan_outline_creator_agent,
+                        model_id="us.anthropic.claude-3-5-sonnet-20240620-v1:0",
+                    ):
+                        if event["event"] == "message":
+                            response_message = event["data"]
+                            self.__save_outline(session, plan, response_message)
+
+                        yield event
+
+            yield {
+                "event": "plan",
+                "data": self.__to_plan_dto(session, plan, user, response_message),
+            }
+
+    def __attached_plan_dto(self, plan: Plan) -> PlanDTO:
+        plan_dto = PlanDTO.from_entity(plan)
+        plan_dto.attached = True
+        return plan_dto
+
+    def __to_plan_dto(
+        self,
+        session: Session,
+        plan: Plan,
+        user: User,
+        response_message: MessageDTO | None,
+    ) -> PlanDTO:
+        """Build the DTO of a developed plan, offering a template matching the proposed outline.
 
-                for i, module in enumerate(modules):
-                    module_db = Module(
-                        plan_id=plan.id,
-                        title=module.get("title", "Untitled Module"),
-                        description=module.get("description", ""),
-                        order=i,
-                    )
+        Args:
+            session (Session): The database session.
+            plan (Plan): The developed plan.
+            user (User): The currently authenticated user.
+            response_message (MessageDTO | None): The response message from the agent, if any.
 
-                    session.add(module_db)
-                    session.flush()
+        Returns:
+            PlanDTO: The developed plan.
+        """
+        plan_dto = PlanDTO.from_entity(plan)
+
+        if (
+            response_message is not None
+            and plan.status == "creating_outline"
+            and not response_message.content.data.get("ready_to_save", False)
+        ):
+            plan_dto.template_match = plan_template_service.find_match(
+                session, plan, user, response_message.content.data
+            )
 
-            session.commit()
-            return PlanDTO.from_entity(plan)
+        return plan_dto
 
 
 plan_service: PlanService = PlanService()
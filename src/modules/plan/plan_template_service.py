@@ -0,0 +1,270 @@
+import os
+from datetime import datetime, timezone
+from typing import List
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import asc, select, update
+from sqlalchemy.orm import Session
+
+from src.db import db_connection
+from src.db.tables import Content, Module, Plan, PlanTemplate, User
+from src.dto import PlanDTO, PlanTemplateMatchDTO
+from src.events import event_broker, user_channel
+from src.generation import content_cache, generation_queue
+from src.rag import DEFAULT_EMBEDDING_VERSION, rag_handler
+
+from .plan_develop_guard import plan_develop_guard
+from .speculative_module_service import speculative_module_service
+
+
+class PlanTemplateService:
+    def __init__(self):
+        self.db_conn = db_connection
+        self.rag_handler = rag_handler
+
+        self.enabled = os.getenv("PLAN_TEMPLATES_ENABLED", "true") == "true"
+        self.similarity_threshold = float(
+            os.getenv("PLAN_TEMPLATE_SIMILARITY_THRESHOLD", "0.9")
+        )
+        self.embedding_version = DEFAULT_EMBEDDING_VERSION
+
+        generation_queue.on_plan_done(self.index_plan)
+
+    def index_plan(self, plan_id: UUID):
+        """Add a plan to the template index once all of its modules are generated.
+
+        Cloned plans are not indexed, since their template already is.
+
+        Args:
+            plan_id (UUID): The ID of the plan.
+        """
+        if not self.enabled:
+            return
+
+        with self.db_conn.get_session() as session:
+            plan = session.get(Plan, plan_id)
+            if (
+                plan is None
+                or plan.origin != "generated"
+                or not plan.modules
+                or any(
+                    m.status not in ("created", "completed") or not m.contents
+                    for m in plan.modules
+                )
+            ):
+                return
+
+            indexed = session.execute(
+                select(PlanTemplate.id).where(PlanTemplate.source_plan_id == plan_id)
+            ).scalar_one_or_none()
+            if indexed:
+                return
+
+            outline_text = self.__outline_text(
+                plan.title,
+                plan.description,
+                [
+                    {"title": m.title, "description": m.description}
+                    for m in sorted(plan.modules, key=lambda m: m.order)
+                ],
+            )
+            profile_fingerprint = content_cache.profile_fingerprint(
+                plan.user.profile_info
+            )
+            modules_count = len(plan.modules)
+            self.db_conn.release(session)
+
+            outline_embedding = self.rag_handler.get_embeddings(
+                texts=[outline_text],
+                embedding_version=self.embedding_version,
+                priority="background",
+            )[0]
+
+            session.add(
+                PlanTemplate(
+                    source_plan_id=plan_id,
+                    profile_fingerprint=profile_fingerprint,
+                    embedding_version=self.embedding_version,
+                    outline_embedding=outline_embedding,
+                    modules_count=modules_count,
+                )
+            )
+            session.commit()
+
+    def find_match(
+        self,
+        session: Session,
+        plan: Plan,
+        user: User,
+        outline: dict,
+    ) -> PlanTemplateMatchDTO | None:
+        """Find a template matching the outline proposed by the plan outline agent.
+
+        Only templates built for the same learner profile fingerprint and with the same
+        number of modules are considered.
+
+        Args:
+            session (Session): The database session.
+            plan (Plan): The plan being developed.
+            user (User): The currently authenticated user.
+            outline (dict): The outline proposed by the agent, with its title, description and modules.
+
+        Returns:
+            PlanTemplateMatchDTO | None: The closest template above the similarity threshold, if any.
+        """
+        modules = outline.get("modules", None) or []
+        if not self.enabled or not modules:
+            return None
+
+        try:
+            outline_embedding = self.rag_handler.get_embeddings(
+                texts=[
+                    self.__outline_text(
+                        outline.get("title", None),
+                        outline.get("description", None),
+                        modules,
+                    )
+                ],
+                embedding_version=self.embedding_version,
+                priority="interactive",
+            )[0]
+
+            distance_function = PlanTemplate.outline_embedding.cosine_distance(
+                outline_embedding
+            )
+            row = session.execute(
+                select(PlanTemplate, distance_function.label("distance"))
+                .filter(
+                    PlanTemplate.profile_fingerprint
+                    == content_cache.profile_fingerprint(user.profile_info),
+                    PlanTemplate.embedding_version == self.embedding_version,
+                    PlanTemplate.modules_count == len(modules),
+                    PlanTemplate.source_plan_id != plan.id,
+                )
+                .order_by(asc("distance"))
+                .limit(1)
+            ).first()
+        except Exception as e:
+            session.rollback()
+            print(f"Error looking up plan templates: {e}")
+            return None
+
+        if row is None or 1 - row.distance < self.similarity_threshold:
+            return None
+
+        source_plan = row.PlanTemplate.source_plan
+        return PlanTemplateMatchDTO(
+            template_id=row.PlanTemplate.id,
+            title=source_plan.title,
+            description=source_plan.description,
+            modules_count=row.PlanTemplate.modules_count,
+            similarity=1 - row.distance,
+        )
+
+    def clone_template(self, plan_id: UUID, template_id: UUID, user: User) -> PlanDTO:
+        """Replace the outline of a plan with the modules and contents of a template.
+
+        The modules and contents are copied in a single transaction, so the plan is
+        ready right away without generating anything. The clone runs as a develop request
+        of the plan, so it is refused while another one is running, and a develop request
+        sent meanwhile cannot replace the cloned modules.
+
+        Args:
+            plan_id (UUID): The ID of the plan being developed.
+            template_id (UUID): The ID of the template to clone.
+            user (User): The currently authenticated user.
+
+        Raises:
+            HTTPException: If the template does not exist, the plan was already saved or is being developed.
+
+        Returns:
+            PlanDTO: The cloned plan.
+        """
+        with self.db_conn.get_session() as session:
+            plan = Plan.get_by_id(session, plan_id, user.id)
+
+            with plan_develop_guard.run(plan.id):
+                session.execute(
+                    select(Plan.id).where(Plan.id == plan.id).with_for_update()
+                )
+                session.refresh(plan)
+
+                if plan.status != "creating_outline":
+                    raise HTTPException(
+                        status_code=409, detail="The plan outline was already saved."
+                    )
+
+                template = session.get(PlanTemplate, template_id)
+                if template is None:
+                    raise HTTPException(status_code=404, detail="Template not found.")
+
+                source_plan = template.source_plan
+                generation_queue.supersede(session, plan.id)
+                speculative_module_service.discard(session, plan)
+
+                for module in plan.modules:
+                    session.delete(module)
+
+                session.flush()
+
+                for source_module in sorted(source_plan.modules, key=lambda m: m.order):
+                    module = Module(
+                        plan_id=plan.id,
+                        title=source_module.title,
+                        description=source_module.description,
+                        order=source_module.order,
+                        status="created",
+                        contents=self.__clone_contents(source_module.contents),
+                    )
+                    session.add(module)
+
+                plan.title = source_plan.title
+                plan.description = source_plan.description
+                plan.status = "created"
+                plan.origin = "cloned"
+                plan.template_id = template.id
+                plan.saved_at = datetime.now(timezone.utc)
+
+                session.execute(
+                    update(PlanTemplate)
+                    .where(PlanTemplate.id == template.id)
+                    .values(clone_count=PlanTemplate.clone_count + 1)
+                )
+                session.commit()
+
+                plan_dto = PlanDTO.from_entity(plan)
+
+        event_broker.publish(
+            user_channel(user.id),
+            "plan_done",
+            {"plan_id": str(plan_id), "modules_count": plan_dto.modules_count},
+        )
+
+        return plan_dto
+
+    def __clone_contents(self, contents: List[Content]) -> List[Content]:
+        return [
+            Content(
+                title=content.title,
+                description=content.description,
+                content_type=content.content_type,
+                text_content=content.text_content,
+                order=content.order,
+                source_document_id=content.source_document_id,
+            )
+            for content in sorted(contents, key=lambda c: c.order)
+        ]
+
+    def __outline_text(
+        self, title: str | None, description: str | None, modules: List[dict]
+    ) -> str:
+        module_lines = "\n".join(
+            f"{i + 1}. {module.get('title', '')}: {module.get('description', '')}"
+            for i, module in enumerate(modules)
+        )
+
+        return f"Plan: {title or ''}\n{description or ''}\nModules:\n{module_lines}"
+
+
+plan_template_service: PlanTemplateService = PlanTemplateService()
@@ -0,0 +1,191 @@
+import os
+from typing import Dict, List
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.db.tables import GenerationJob, Module, Plan
+from src.generation import generation_queue
+
+
+class SpeculativeModuleService:
+    def __init__(self):
+        self.enabled = (
+            os.getenv("SPECULATIVE_GENERATION_ENABLED", "true") == "true"
+            and os.getenv("MODULE_GENERATION_POLICY", "eager") != "lazy"
+        )
+        self.priority = 1
+
+    def observe(self, session: Session, plan: Plan, outline: dict) -> bool:
+        """Track an outline proposal that is not ready to be saved, in the caller's transaction.
+
+        Each proposed module is kept as a speculative module of the plan. A module whose
+        title was also proposed by the previous proposal is considered stable and its
+        generation starts in the low-priority lane of the queue, while modules dropped by
+        the proposal are discarded along with their generation.
+
+        Args:
+            session (Session): The database session.
+            plan (Plan): The plan being developed.
+            outline (dict): The outline proposed by the agent, with its title, description and modules.
+
+        Returns:
+            bool: Whether any generation job was queued. Call `generation_queue.notify` after committing.
+        """
+        modules = outline.get("modules", None) or []
+        if not self.enabled or plan.status != "creating_outline" or not modules:
+            return False
+
+        speculative_modules = {_key(m.title): m for m in plan.speculative_modules}
+        proposed_keys = {_key(module.get("title", "")) for module in modules}
+
+        self.__delete(
+            session,
+            [
+                m
+                for m in plan.speculative_modules
+                if _key(m.title) not in proposed_keys
+                or speculative_modules[_key(m.title)] is not m
+            ],
+        )
+
+        queued_module_ids = set(
+            session.execute(
+                select(GenerationJob.module_id).where(
+                    GenerationJob.module_id.in_(
+                        [m.id for m in speculative_modules.values()]
+                    ),
+                    GenerationJob.job_type == "module",
+                )
+            ).scalars()
+        )
+
+        queued = False
+        seen_keys = set()
+        for i, module in enumerate(modules):
+            key = _key(module.get("title", ""))
+            if key in seen_keys:
+                continue
+
+            seen_keys.add(key)
+            speculative_module = speculative_modules.get(key, None)
+
+            if speculative_module is None:
+                session.add(
+                    Module(
+                        plan_id=plan.id,
+                        title=module.get("title", "Untitled Module"),
+                        description=module.get("description", ""),
+                        order=i,
+                        speculative=True,
+                    )
+                )
+                continue
+
+            speculative_module.order = i
+            if speculative_module.id in queued_module_ids:
+                continue
+
+            speculative_module.description = module.get("description", "")
+            generation_queue.enqueue(
+                session,
+                "module",
+                plan.id,
+                plan.user_id,
+                module_id=speculative_module.id,
+                payload={
+                    "extra_information": f"Proposed Plan Title: {outline.get('title', '')}. Proposed Plan Description: {outline.get('description', '')}",
+                    "speculative": True,
+                },
+                epoch=plan.generation_epoch,
+                priority=self.priority,
+            )
+            queued = True
+
+        return queued
+
+    def adopt(
+        self, session: Session, plan: Plan, modules: List[dict]
+    ) -> Dict[int, Module]:
+        """Keep the speculative modules matching the saved outline, in the caller's transaction.
+
+        A speculative module is adopted when the saved outline has a module with the same
+        title and it has contents or is still being generated. The other speculative
+        modules are discarded. Call `generation_queue.supersede` with the adopted modules
+        afterwards, so their generation goes on in the new epoch.
+
+        Args:
+            session (Session): The database session.
+            plan (Plan): The plan being saved.
+            modules (List[dict]): The modules of the saved outline.
+
+        Returns:
+            Dict[int, Module]: The adopted modules, by their position in the saved outline.
+        """
+        if not plan.speculative_modules:
+            return {}
+
+        speculative_modules = {_key(m.title): m for m in plan.speculative_modules}
+
+        generating_module_ids = set(
+            session.execute(
+                select(GenerationJob.module_id).where(
+                    GenerationJob.module_id.in_(
+                        [m.id for m in speculative_modules.values()]
+                    ),
+                    GenerationJob.status.in_(("pending", "running")),
+                )
+            ).scalars()
+        )
+
+        adopted = {}
+        for i, module in enumerate(modules):
+            speculative_module = speculative_modules.pop(
+                _key(module.get("title", "")), None
+            )
+            if speculative_module is None or not (
+                speculative_module.contents
+                or speculative_module.id in generating_module_ids
+            ):
+                continue
+
+            speculative_module.speculative = False
+            speculative_module.title = module.get("title", speculative_module.title)
+            speculative_module.description = module.get("description", "")
+            speculative_module.order = i
+            adopted[i] = speculative_module
+
+        adopted_ids = {m.id for m in adopted.values()}
+        self.__delete(
+            session, [m for m in plan.speculative_modules if m.id not in adopted_ids]
+        )
+
+        return adopted
+
+    def discard(self, session: Session, plan: Plan):
+        """Discard every speculative module of a plan, in the caller's transaction.
+
+        Args:
+            session (Session): The database session.
+            plan (Plan): The plan.
+        """
+        self.__delete(session, plan.speculative_modules)
+
+    def __delete(self, session: Session, modules: List[Module]):
+        """Delete speculative modules, cancelling their generation.
+
+        Args:
+            session (Session): The database session.
+            modules (List[Module]): The speculative modules.
+        """
+        generation_queue.cancel_modules(session, [m.id for m in modules])
+
+        for module in modules:
+            session.delete(module)
+
+
+def _key(title: str) -> str:
+    return " ".join((title or "").lower().split())
+
+
+speculative_module_service: SpeculativeModuleService = SpeculativeModuleService()
@@ -1,6 +1,7 @@
 from uuid import UUID
 
 from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
 
 from src.dto import (
     ResponseDTO,
@@ -10,6 +11,7 @@ from src.dto import (
     UserLoginResponseDTO,
     MessageDTO,
 )
+from src.llm import llm_executor, to_sse
 from src.security import get_current_user
 
 from .user_service import user_service
@@ -33,12 +35,36 @@ def delete_user(user_id: UUID, current_user=Depends(get_current_user)):
 
 
 @user_router.post("/start_profile_assessment")
-def start_profile_assessment(current_user=Depends(get_current_user)) -> MessageDTO:
-    return user_service.assess_profile(current_user)
+async def start_profile_assessment(
+    current_user=Depends(get_current_user),
+) -> MessageDTO:
+    return await llm_executor.run(user_service.assess_profile, current_user)
 
 
 @user_router.post("/continue_profile_assessment")
-def continue_profile_assessment(
+async def continue_profile_assessment(
     message: MessageDTO, current_user=Depends(get_current_user)
 ) -> MessageDTO:
-    return user_service.assess_profile(current_user, message)
+    return await llm_executor.run(user_service.assess_profile, current_user, message)
+
+
+@user_router.post("/start_profile_assessment/stream")
+async def start_profile_assessment_stream(current_user=Depends(get_current_user)):
+    return StreamingResponse(
+        to_sse(llm_executor.iterate(user_service.assess_profile_stream(current_user))),
+        media_type="text/event-stream",
+    )
+
+
+@user_router.post("/continue_profile_assessment/stream")
+async def continue_profile_assessment_stream(
+    message: MessageDTO, current_user=Depends(get_current_user)
+):
+    return StreamingResponse(
+        to_sse(
+            llm_executor.iterate(
+                user_service.assess_profile_stream(current_user, message)
+            )
+        ),
+        media_type="text/event-stream",
+    )
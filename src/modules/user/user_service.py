@@ -1,10 +1,12 @@
 import os
 from datetime import datetime, timedelta, timezone
+from typing import Iterator
 from uuid import UUID
 
 import bcrypt
 import jwt
 from fastapi import HTTPException
+from sqlalchemy.orm import Session
 
 from src.db import db_connection
 from src.db.tables import User, Agent, Chat
@@ -18,7 +20,7 @@ from src.dto import (
     MessageTextContentDTO,
 )
 
-from src.llm import BedrockHandler
+from src.llm import bedrock_handler
 
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", None)
 
@@ -26,7 +28,7 @@ SECRET_KEY = os.getenv("JWT_SECRET_KEY", None)
 class UserService:
     def __init__(self):
         self.db_conn = db_connection
-        self.handler = BedrockHandler()
+        self.handler = bedrock_handler
 
     def __create_jwt(self, user_id: UUID, duration=timedelta(days=7)):
         """Create a JSON Web Token (JWT) for a user.
@@ -161,6 +163,63 @@ class UserService:
             token = self.__create_jwt(user.id)
             return UserLoginResponseDTO(token=token, id=user.id)
 
+    def __get_profile_assessment_agent(self, session: Session) -> Agent:
+        """Get the profile assessment agent.
+
+        Args:
+            session (Session): The database session.
+
+        Raises:
+            HTTPException: If the agent is not configured or does not exist.
+
+        Returns:
+            Agent: The profile assessment agent.
+        """
+        agent_id = os.getenv("PROFILE_ASSESSMENT_AGENT_ID", None)
+        if not agent_id:
+            raise HTTPException(
+                status_code=500, detail="Profile assessment agent not configured."
+            )
+
+        agent = session.get(Agent, agent_id)
+        if not agent:
+            raise HTTPException(
+                status_code=404, detail="Profile assessment agent not found."
+            )
+
+        return agent
+
+    def __get_start_message(self, user: User) -> MessageDTO:
+        """Create the message that starts a profile assessment.
+
+        Args:
+            user (User): The currently authenticated user.
+
+        Returns:
+            MessageDTO: The message starting the assessment.
+        """
+        return MessageDTO(
+            role="assistant",
+            content=MessageTextContentDTO(
+                text=f"Profile assessment started. Informed user name is: {user.name}. Confirm if this is the user's preferred name."
+            ),
+        )
+
+    def __save_profile(
+        self, session: Session, user: User, response_message: MessageDTO
+    ):
+        """Store the profile data returned by the profile assessment agent.
+
+        Args:
+            session (Session): The database session.
+            user (User): The currently authenticated user.
+            response_message (MessageDTO): The response message from the agent.
+        """
+        user.profile_info = response_message.content.data.get("profile_data", {})
+
+        session.add(user)
+        session.commit()
+
     def assess_profile(self, user: User, message: MessageDTO = None) -> MessageDTO:
         """Assess user profile through an AI agent.
 
@@ -177,35 +236,46 @@ class UserService:
         """
         with self.db_conn.get_session() as session:
             if not message:
-                message = MessageDTO(
-                    role="assistant",
-                    content=MessageTextContentDTO(
-                        text=f"Profile assessment started. Informed user name is: {user.name}. Confirm if this is the user's preferred name."
-                    ),
-                )
-
-            agent_id = os.getenv("PROFILE_ASSESSMENT_AGENT_ID", None)
-            if not agent_id:
-                raise HTTPException(
-                    status_code=500, detail="Profile assessment agent not configured."
-                )
+                message = self.__get_start_message(user)
 
-            agent = session.get(Agent, agent_id)
-            if not agent:
-                raise HTTPException(
-                    status_code=404, detail="Profile assessment agent not found."
-                )
+            agent = self.__get_profile_assessment_agent(session)
 
             response_message = self.handler.complete(
                 session=session, message=message, user=user, agent=agent
             )
 
-            user.profile_info = response_message.content.data.get("profile_data", {})
-
-            session.add(user)
-            session.commit()
+            self.__save_profile(session, user, response_message)
 
             return response_message
 
+    def assess_profile_stream(
+        self, user: User, message: MessageDTO = None
+    ) -> Iterator[dict]:
+        """Assess user profile through an AI agent, streaming the agent response.
+
+        Args:
+            user (User): The currently authenticated user.
+            message (MessageDTO, optional): The message to be processed. Defaults to None. If None, a default message is created to start the assessment.
+
+        Raises:
+            HTTPException: If the agent is not configured or processing fails.
+
+        Yields:
+            dict: The stream events, ending with the stored response message.
+        """
+        with self.db_conn.get_session() as session:
+            if not message:
+                message = self.__get_start_message(user)
+
+            agent = self.__get_profile_assessment_agent(session)
+
+            for event in self.handler.complete_stream(
+                session=session, message=message, user=user, agent=agent
+            ):
+                if event["event"] == "message":
+                    self.__save_profile(session, user, event["data"])
+
+                yield event
+
 
 user_service: UserService = UserService()
@@ -1 +1,5 @@
-from .rag_handler import RAGHandler
+from .rag_handler import RAGHandler, rag_handler
+from .image_preprocessor import ImagePreprocessor, image_preprocessor
+from .embedding_models import DEFAULT_EMBEDDING_VERSION, EMBEDDING_MODELS
+from .re_embedder import ReEmbedder, re_embedder
+from .retrieval_policy import RetrievalPolicy, retrieval_policy
@@ -0,0 +1,35 @@
+import os
+
+from fastapi import HTTPException
+
+EMBEDDING_MODELS = {
+    "cohere-embed-v4-1536": {"model_id": "us.cohere.embed-v4:0", "dimension": 1536},
+    "cohere-embed-v4-1024": {"model_id": "us.cohere.embed-v4:0", "dimension": 1024},
+    "cohere-embed-v4-512": {"model_id": "us.cohere.embed-v4:0", "dimension": 512},
+    "cohere-embed-v4-256": {"model_id": "us.cohere.embed-v4:0", "dimension": 256},
+}
+
+DEFAULT_EMBEDDING_VERSION = os.getenv("RAG_EMBEDDING_VERSION", "cohere-embed-v4-1536")
+
+
+def get_embedding_model(embedding_version: str) -> dict:
+    """Get the configuration of an embedding model version.
+
+    Args:
+        embedding_version (str): The embedding version, a key of EMBEDDING_MODELS.
+
+    Raises:
+        HTTPException: If the embedding version is unknown.
+
+    Returns:
+        dict: The model ID and output dimension of the embedding version.
+    """
+    embedding_model = EMBEDDING_MODELS.get(embedding_version, None)
+
+    if embedding_model is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown embedding version: {embedding_version}",
+        )
+
+    return embedding_model
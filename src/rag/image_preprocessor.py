@@ -0,0 +1,218 @@
+import io
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Literal, Tuple
+
+from PIL import Image, ImageOps
+
+ImageFormat = Literal["png", "jpeg"]
+
+ORIENTATION_TAG = 0x0112
+
+
+def preprocess_image(
+    data: bytes,
+    extension: ImageFormat,
+    max_edge: int,
+    max_pixels: int,
+    max_aspect_ratio: float,
+    tile_overlap: float,
+    max_tiles: int,
+    jpeg_quality: int,
+) -> List[Tuple[bytes, ImageFormat]]:
+    """Normalize, downsize, tile and re-encode an image.
+
+    Defined at module level so it can be pickled and executed in a worker process.
+
+    Args:
+        data (bytes): The byte content of the image.
+        extension (ImageFormat): The original format of the image.
+        max_edge (int): The maximum size, in pixels, of the longest edge of each output image.
+        max_pixels (int): The maximum number of pixels of each output image.
+        max_aspect_ratio (float): The maximum height/width ratio before the image is split into tiles.
+        tile_overlap (float): The fraction of each tile's height shared with the next tile.
+        max_tiles (int): The maximum number of tiles. Taller tiles are cut from very tall images to stay within it.
+        jpeg_quality (int): The quality used when re-encoding to JPEG.
+
+    Returns:
+        List[Tuple[bytes, ImageFormat]]: The processed image (or its tiles, top to bottom) as (bytes, format) tuples.
+    """
+    image = Image.open(io.BytesIO(data))
+    needs_transpose = image.getexif().get(ORIENTATION_TAG, 1) != 1
+
+    width, height = image.size
+    if needs_transpose:
+        image = ImageOps.exif_transpose(image)
+        width, height = image.size
+
+    needs_tiling = height / width > max_aspect_ratio
+    needs_resize = max(width, height) > max_edge or width * height > max_pixels
+
+    if not needs_transpose and not needs_tiling and not needs_resize:
+        return [(data, extension)]
+
+    if needs_tiling:
+        tile_height = max(
+            int(width * max_aspect_ratio),
+            math.ceil(height / (1 + (max_tiles - 1) * (1 - tile_overlap))),
+        )
+        step = max(1, int(tile_height * (1 - tile_overlap)))
+        tiles = []
+
+        for top in range(0, height, step):
+            bottom = min(top + tile_height, height)
+            if len(tiles) == max_tiles - 1:
+                bottom = height
+
+            tiles.append(image.crop((0, top, width, bottom)))
+
+            if bottom == height:
+                break
+    else:
+        tiles = [image]
+
+    return [
+        (_encode(_downsize(tile, max_edge, max_pixels), jpeg_quality), "jpeg")
+        for tile in tiles
+    ]
+
+
+def _downsize(image: Image.Image, max_edge: int, max_pixels: int) -> Image.Image:
+    """Downsize an image to fit the maximum edge and pixel count, keeping its aspect ratio.
+
+    Args:
+        image (Image.Image): The image to downsize.
+        max_edge (int): The maximum size of the longest edge.
+        max_pixels (int): The maximum number of pixels.
+
+    Returns:
+        Image.Image: The downsized image, or the same image if it already fits.
+    """
+    width, height = image.size
+    scale = min(
+        1.0, max_edge / max(width, height), (max_pixels / (width * height)) ** 0.5
+    )
+
+    if scale >= 1.0:
+        return image
+
+    return image.resize(
+        (max(1, int(width * scale)), max(1, int(height * scale))),
+        Image.Resampling.LANCZOS,
+    )
+
+
+def _encode(image: Image.Image, jpeg_quality: int) -> bytes:
+    """Encode an image as an optimized JPEG, flattening transparency onto white.
+
+    Args:
+        image (Image.Image): The image to encode.
+        jpeg_quality (int): The JPEG quality.
+
+    Returns:
+        bytes: The encoded image.
+    """
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=jpeg_quality, optimize=True)
+    return buffer.getvalue()
+
+
+class ImagePreprocessor:
+    def __init__(self):
+        self.max_workers = int(os.getenv("RAG_IMAGE_PREPROCESSING_WORKERS", "2"))
+
+        self.max_edge = 1568
+        self.max_pixels = 1_150_000
+        self.max_aspect_ratio = 2.5
+        self.tile_overlap = 0.1
+        self.max_tiles = 20
+        self.jpeg_quality = 85
+
+        self.executor: ProcessPoolExecutor | None = None
+        self.executor_lock = threading.Lock()
+
+    def __get_executor(self) -> ProcessPoolExecutor:
+        """Get the process pool, creating it on first use.
+
+        Workers are spawned rather than forked, since the pool is created inside
+        a server that already runs threads and a forked child could inherit a
+        lock held by one of them.
+
+        Returns:
+            ProcessPoolExecutor: The process pool used for image preprocessing.
+        """
+        with self.executor_lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+
+            return self.executor
+
+    def preprocess(
+        self, data: bytes, extension: ImageFormat
+    ) -> List[Tuple[bytes, ImageFormat]]:
+        """Preprocess a single image in the process pool.
+
+        Args:
+            data (bytes): The byte content of the image.
+            extension (ImageFormat): The format of the image.
+
+        Returns:
+            List[Tuple[bytes, ImageFormat]]: The processed image tiles as (bytes, format) tuples.
+        """
+        return self.preprocess_many([(data, extension)])[0]
+
+    def preprocess_many(
+        self, images: List[Tuple[bytes, ImageFormat]]
+    ) -> List[List[Tuple[bytes, ImageFormat]]]:
+        """Preprocess several images in parallel in the process pool.
+
+        Args:
+            images (List[Tuple[bytes, ImageFormat]]): The images as (bytes, format) tuples.
+
+        Returns:
+            List[List[Tuple[bytes, ImageFormat]]]: The processed tiles of each image, in the input order.
+        """
+        if not images:
+            return []
+
+        executor = self.__get_executor()
+        futures = [
+            executor.submit(
+                preprocess_image,
+                data,
+                extension,
+                self.max_edge,
+                self.max_pixels,
+                self.max_aspect_ratio,
+                self.tile_overlap,
+                self.max_tiles,
+                self.jpeg_quality,
+            )
+            for data, extension in images
+        ]
+
+        return [f.result() for f in futures]
+
+    def shutdown(self):
+        """Shut down the process pool, if it was started."""
+        with self.executor_lock:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+
+
+image_preprocessor: ImagePreprocessor = ImagePreprocessor()
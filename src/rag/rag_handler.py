@@ -1,43 +1,64 @@
+import base64
 import json
 import os
 import tempfile
-from typing import List, Literal, Tuple
+from typing import Iterator, List, Literal, Optional, Tuple
 from uuid import UUID
 
-import boto3
 import pymupdf
 import whisper
 from fastapi import HTTPException
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from mypy_boto3_bedrock_runtime.client import BedrockRuntimeClient
-from sqlalchemy import asc, select
+from sqlalchemy import asc, delete, insert, select, update
 from sqlalchemy.orm import Session
 
+from src.bedrock import (
+    BedrockRegionPool,
+    Priority,
+    bedrock_region_pool,
+    bedrock_scheduler,
+    model_telemetry,
+)
 from src.db.tables import Chunk, Document, KnowledgeBase
 from src.dto import DocumentCreateDTO, MessageDTO
 
+from .embedding_models import DEFAULT_EMBEDDING_VERSION, get_embedding_model
+from .image_preprocessor import image_preprocessor
+from .streaming import prefetch
+
+Segment = (
+    Tuple[Literal["text"], str] | Tuple[Literal["images"], List[Tuple[bytes, str, str]]]
+)
+ChunkItem = Tuple[int, Literal["text", "image"], str, Optional[Tuple[bytes, str]]]
+
 
 class RAGHandler:
     def __init__(self):
-        self.client: BedrockRuntimeClient = boto3.client(
-            "bedrock-runtime", region_name="us-east-2"
-        )
+        self.client: BedrockRegionPool = bedrock_region_pool
 
         self.ocr_model_id = "us.anthropic.claude-sonnet-4-20250514-v1:0"
+        self.text_embedding_batch_size = 96
+        self.image_embedding_batch_size = 16
 
-        self.extraction_fn_mapping = {
-            "txt": self.extract_text_from_txt,
-            "pdf": self.extract_text_from_pdf,
-            "png": lambda data: self.extract_text_from_image(data, extension="png"),
-            "jpeg": lambda data: self.extract_text_from_image(data, extension="jpeg"),
-            "jpg": lambda data: self.extract_text_from_image(data, extension="jpeg"),
-            "mp4": lambda data: self.extract_text_from_video(data),
-            "json": self.extract_text_from_txt,
+        self.image_ingestion_mode: Literal["embedding", "ocr"] = os.getenv(
+            "RAG_IMAGE_INGESTION_MODE", "embedding"
+        )
+
+        self.segment_fn_mapping = {
+            "txt": self.iter_txt_segments,
+            "pdf": self.iter_pdf_segments,
+            "png": self.iter_image_segments,
+            "jpeg": self.iter_image_segments,
+            "jpg": self.iter_image_segments,
+            "mp4": self.iter_video_segments,
+            "json": self.iter_txt_segments,
         }
 
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000, chunk_overlap=200
         )
+        self.text_buffer_size = 8000
+        self.ingestion_queue_size = int(os.getenv("RAG_INGESTION_QUEUE_SIZE", "256"))
 
         self.whisper_model = None
 
@@ -68,20 +89,50 @@ class RAGHandler:
         session.add(new_document)
         session.flush()
 
-        self.process_document_chunks(new_document, session)
+        document_id = new_document.id
 
+        try:
+            self.process_document_chunks(
+                new_document,
+                session,
+                extract_image_text=document_dto.extract_image_text,
+            )
+        except Exception:
+            session.rollback()
+            session.execute(delete(Document).where(Document.id == document_id))
+            session.commit()
+            raise
+
+        session.execute(
+            update(KnowledgeBase)
+            .where(KnowledgeBase.id == knowledge_base.id)
+            .values(revision=KnowledgeBase.revision + 1)
+        )
         session.commit()
 
         return new_document
 
-    def process_document_chunks(self, document: Document, session: Session) -> Document:
+    def process_document_chunks(
+        self, document: Document, session: Session, extract_image_text: bool = False
+    ) -> Document:
         """Process the document to extract text, split into chunks, generate embeddings, and store them.
 
         Provides support for txt, pdf, png, jpeg, json and mp4 document types.
 
+        Ingestion runs as a pipeline of generators: segment extraction, incremental
+        splitting, batched embedding and bulk writing. Extraction and splitting run in a
+        background thread feeding a bounded queue, so memory stays flat regardless of the
+        document size. Each batch is committed as soon as it is written, making chunks
+        queryable progressively.
+
+        When the image ingestion mode is "embedding", images (standalone or embedded
+        in PDFs) are embedded natively by the multimodal embedding model and stored as
+        "image" chunks. OCR is then only performed if `extract_image_text` is set.
+
         Args:
             document (Document): The document to process.
             session (Session): The database session to use for operations.
+            extract_image_text (bool, optional): Whether to also extract text from images through OCR. Defaults to False.
 
         Raises:
             HTTPException: If the document type is unsupported.
@@ -89,70 +140,408 @@ class RAGHandler:
         Returns:
             Document: The processed document.
         """
-        extraction_fn = self.extraction_fn_mapping.get(
-            document.document_extension, None
-        )
+        segment_fn = self.segment_fn_mapping.get(document.document_extension, None)
 
-        if not extraction_fn:
+        if not segment_fn:
             raise HTTPException(
                 status_code=400,
                 detail=f"Unsupported document type: {document.document_extension}",
             )
 
-        data = document.data
-        extracted_text = extraction_fn(data)
-        text_chunks = self.text_splitter.split_text(extracted_text)
+        document_id = document.id
+        knowledge_base_id = document.knowledge_base_id
+        segments = segment_fn(
+            document.data,
+            document.name,
+            document.document_extension,
+            extract_image_text,
+        )
+        chunks = prefetch(self.__iter_chunks(segments), self.ingestion_queue_size)
+
+        embedding_versions = self.__get_embedding_versions(session, knowledge_base_id)
+
+        try:
+            for modality, batch in self.__iter_chunk_batches(chunks):
+                embeddings = {
+                    version: self.__embed_chunks(modality, batch, version)
+                    for version in embedding_versions
+                }
+
+                embedding_versions = self.__get_embedding_versions(
+                    session, knowledge_base_id, lock=True
+                )
+
+                rows = []
+                for version in embedding_versions:
+                    if version not in embeddings:
+                        embeddings[version] = self.__embed_chunks(
+                            modality, batch, version
+                        )
+
+                    rows.extend(
+                        {
+                            "document_id": document_id,
+                            "content": content,
+                            "embedding": embedding,
+                            "index": index,
+                            "modality": modality,
+                            "embedding_version": version,
+                        }
+                        for (index, _, content, _), embedding in zip(
+                            batch, embeddings[version]
+                        )
+                    )
+
+                session.execute(insert(Chunk), rows)
+                session.commit()
+        finally:
+            chunks.close()
+
+        return document
+
+    def __get_embedding_versions(
+        self, session: Session, knowledge_base_id: UUID, lock: bool = False
+    ) -> List[str]:
+        """Get the embedding versions new chunks of a knowledge base must be written with.
+
+        While a re-embedding is in progress, chunks are written with both the active and
+        the pending version, so the cutover never misses documents added meanwhile.
+
+        Args:
+            session (Session): The database session.
+            knowledge_base_id (UUID): The ID of the knowledge base.
+            lock (bool, optional): Whether to hold a shared lock on the knowledge base until the transaction ends, blocking a concurrent cutover. Defaults to False.
+
+        Returns:
+            List[str]: The active embedding version, followed by the pending one if any.
+        """
+        statement = select(
+            KnowledgeBase.embedding_version, KnowledgeBase.pending_embedding_version
+        ).where(KnowledgeBase.id == knowledge_base_id)
+
+        if lock:
+            statement = statement.with_for_update(read=True)
+
+        active_version, pending_version = session.execute(statement).one()
+
+        return [active_version] + ([pending_version] if pending_version else [])
+
+    def iter_txt_segments(
+        self,
+        data: bytes,
+        name: str,
+        extension: str,
+        extract_image_text: bool = False,
+    ) -> Iterator[Segment]:
+        """Extract the segments of a TXT or JSON document.
+
+        Args:
+            data (bytes): The byte content of the document.
+            name (str): The name of the document.
+            extension (str): The extension of the document.
+            extract_image_text (bool, optional): Unused, kept for a uniform signature. Defaults to False.
+
+        Yields:
+            Segment: The text of the document.
+        """
+        yield "text", self.extract_text_from_txt(data)
+
+    def iter_video_segments(
+        self,
+        data: bytes,
+        name: str,
+        extension: str,
+        extract_image_text: bool = False,
+    ) -> Iterator[Segment]:
+        """Extract the segments of a video document.
+
+        Args:
+            data (bytes): The byte content of the document.
+            name (str): The name of the document.
+            extension (str): The extension of the document.
+            extract_image_text (bool, optional): Unused, kept for a uniform signature. Defaults to False.
+
+        Yields:
+            Segment: The transcription of the video.
+        """
+        yield "text", self.extract_text_from_video(data)
+
+    def iter_image_segments(
+        self,
+        data: bytes,
+        name: str,
+        extension: str,
+        extract_image_text: bool = False,
+    ) -> Iterator[Segment]:
+        """Extract the segments of an image document.
+
+        Args:
+            data (bytes): The byte content of the document.
+            name (str): The name of the document.
+            extension (str): The extension of the document.
+            extract_image_text (bool, optional): Whether to also extract text through OCR in embedding mode. Defaults to False.
 
-        if not text_chunks or len(text_chunks) == 0:
-            return document
+        Yields:
+            Segment: The image itself and/or the text extracted from it.
+        """
+        extension = self.__normalize_image_extension(extension)
+
+        if self.image_ingestion_mode == "embedding":
+            yield "images", [(data, extension, f"Image: {name}")]
+
+            if not extract_image_text:
+                return
+
+        yield "text", self.extract_text_from_image(data, extension=extension)
+
+    def iter_pdf_segments(
+        self,
+        data: bytes,
+        name: str,
+        extension: str,
+        extract_image_text: bool = False,
+    ) -> Iterator[Segment]:
+        """Extract the segments of a PDF document, page by page.
 
-        embeddings = self.get_embeddings(
-            texts=text_chunks, input_type="search_document"
+        Args:
+            data (bytes): The byte content of the document.
+            name (str): The name of the document.
+            extension (str): The extension of the document.
+            extract_image_text (bool, optional): Whether to also extract text from embedded images through OCR in embedding mode. Defaults to False.
+
+        Yields:
+            Segment: The text of each page, followed by its images and/or the text extracted from them.
+        """
+        embed_images = self.image_ingestion_mode == "embedding"
+        ocr_images = not embed_images or extract_image_text
+
+        pdf = pymupdf.open(stream=data, filetype="pdf")
+
+        for page in pdf:
+            yield "text", page.get_text()
+
+            page_images = [
+                (
+                    image_bytes,
+                    extension,
+                    f"Image from page {page_num + 1} of {name}",
+                )
+                for page_num, image_bytes, extension in self.__iter_page_images(page)
+            ]
+
+            if embed_images and page_images:
+                yield "images", page_images
+
+            if ocr_images:
+                for image_bytes, extension, _ in page_images:
+                    yield "text", self.extract_text_from_image(
+                        data=image_bytes, extension=extension
+                    )
+
+    def __iter_chunks(self, segments: Iterator[Segment]) -> Iterator[ChunkItem]:
+        """Split a stream of segments into chunks incrementally.
+
+        Text is buffered until `text_buffer_size` characters are available, then split.
+        The last split chunk is carried over to the next buffer so chunk boundaries and
+        overlaps are the same as splitting the whole text at once. The buffer is flushed
+        before an image, so chunk indexes follow the order of the document.
+
+        Args:
+            segments (Iterator[Segment]): The segments extracted from the document.
+
+        Yields:
+            ChunkItem: The chunks as (index, modality, content, image) tuples.
+        """
+        buffer = ""
+        index = 0
+
+        for segment_type, value in segments:
+            if segment_type == "images":
+                for text_chunk in self.text_splitter.split_text(buffer):
+                    yield index, "text", text_chunk, None
+                    index += 1
+                buffer = ""
+
+                for image_bytes, extension, description in self.__preprocess_images(
+                    value
+                ):
+                    yield index, "image", description, (image_bytes, extension)
+                    index += 1
+                continue
+
+            buffer += value
+            if len(buffer) < self.text_buffer_size:
+                continue
+
+            text_chunks = self.text_splitter.split_text(buffer)
+            for text_chunk in text_chunks[:-1]:
+                yield index, "text", text_chunk, None
+                index += 1
+
+            buffer = text_chunks[-1] if text_chunks else ""
+
+        for text_chunk in self.text_splitter.split_text(buffer):
+            yield index, "text", text_chunk, None
+            index += 1
+
+    def __iter_chunk_batches(
+        self, chunks: Iterator[ChunkItem]
+    ) -> Iterator[Tuple[Literal["text", "image"], List[ChunkItem]]]:
+        """Group chunks into batches of the same modality, sized for the embedding model.
+
+        Args:
+            chunks (Iterator[ChunkItem]): The chunks to group.
+
+        Yields:
+            Tuple[Literal["text", "image"], List[ChunkItem]]: The modality and chunks of each batch.
+        """
+        batch_sizes = {
+            "text": self.text_embedding_batch_size,
+            "image": self.image_embedding_batch_size,
+        }
+        pending = {"text": [], "image": []}
+
+        for chunk in chunks:
+            modality = chunk[1]
+            pending[modality].append(chunk)
+
+            if len(pending[modality]) >= batch_sizes[modality]:
+                yield modality, pending[modality]
+                pending[modality] = []
+
+        for modality, batch in pending.items():
+            if batch:
+                yield modality, batch
+
+    def __embed_chunks(
+        self,
+        modality: Literal["text", "image"],
+        chunks: List[ChunkItem],
+        embedding_version: str,
+    ) -> List[List[float]]:
+        """Embed a batch of chunks of the same modality.
+
+        Args:
+            modality (Literal["text", "image"]): The modality of the chunks.
+            chunks (List[ChunkItem]): The chunks to embed.
+            embedding_version (str): The embedding version to use.
+
+        Returns:
+            List[List[float]]: The embeddings of the chunks, in order.
+        """
+        if modality == "image":
+            return self.get_image_embeddings(
+                images=[image for _, _, _, image in chunks],
+                embedding_version=embedding_version,
+            )
+
+        return self.get_embeddings(
+            texts=[content for _, _, content, _ in chunks],
+            input_type="search_document",
+            embedding_version=embedding_version,
         )
 
-        chunks = [
-            Chunk(
-                document_id=document.id,
-                content=text_chunk,
-                embedding=embedding,
-                index=i,
+    def extract_document_images(
+        self, data: bytes, name: str, extension: str
+    ) -> List[Tuple[bytes, str, str]]:
+        """Extract and preprocess the images of a document, without any OCR.
+
+        Images are returned in the same order their chunks are indexed during ingestion,
+        which allows re-embedding image chunks without re-extracting the document text.
+
+        Args:
+            data (bytes): The byte content of the document.
+            name (str): The name of the document.
+            extension (str): The extension of the document.
+
+        Returns:
+            List[Tuple[bytes, str, str]]: The processed images as (bytes, format, description) tuples.
+        """
+        if extension == "pdf":
+            pdf = pymupdf.open(stream=data, filetype="pdf")
+            images = [
+                (
+                    image_bytes,
+                    image_extension,
+                    f"Image from page {page_num + 1} of {name}",
+                )
+                for page in pdf
+                for page_num, image_bytes, image_extension in self.__iter_page_images(
+                    page
+                )
+            ]
+        else:
+            image_extension = self.__normalize_image_extension(extension)
+            images = (
+                [(data, image_extension, f"Image: {name}")] if image_extension else []
             )
-            for i, (text_chunk, embedding) in enumerate(zip(text_chunks, embeddings))
-        ]
 
-        session.add_all(chunks)
-        session.flush()
+        return self.__preprocess_images(images)
 
-        return document
+    def __preprocess_images(
+        self, images: List[Tuple[bytes, str, str]]
+    ) -> List[Tuple[bytes, str, str]]:
+        """Preprocess images before embedding, expanding tiled images into one entry per tile.
 
-    def get_embeddings(
-        self,
-        texts: List[str],
-        input_type: Literal["search_document", "search_query"] = "search_document",
+        Args:
+            images (List[Tuple[bytes, str, str]]): The images as (bytes, format, description) tuples.
+
+        Returns:
+            List[Tuple[bytes, str, str]]: The processed images as (bytes, format, description) tuples.
+        """
+        processed_images = image_preprocessor.preprocess_many(
+            [(image_bytes, extension) for image_bytes, extension, _ in images]
+        )
+
+        expanded_images = []
+        for (_, _, description), tiles in zip(images, processed_images):
+            for i, (tile_bytes, tile_extension) in enumerate(tiles):
+                tile_description = (
+                    f"{description} (part {i + 1}/{len(tiles)})"
+                    if len(tiles) > 1
+                    else description
+                )
+                expanded_images.append((tile_bytes, tile_extension, tile_description))
+
+        return expanded_images
+
+    def __invoke_embedding_model(
+        self, body: dict, embedding_version: str, priority: Priority = "background"
     ) -> List[List[float]]:
-        """Generate embeddings for the given texts using Bedrock's Cohere embed-v4 model.
+        """Invoke the embedding model of an embedding version and return the float embeddings.
 
         Args:
-            texts (List[str]): The texts to generate embeddings for.
-            input_type (Literal["search_document", "search_query"], optional): The type of input. Defaults to "search_document".
+            body (dict): The request body sent to the embedding model.
+            embedding_version (str): The embedding version to use.
+            priority (Priority, optional): The scheduling lane of the call. Defaults to "background".
 
         Raises:
             HTTPException: If embeddings cannot be retrieved from Bedrock.
 
         Returns:
-            List[List[float]]: A list of embeddings corresponding to the input texts.
+            List[List[float]]: The embeddings returned by the model.
         """
-        model_id = "us.cohere.embed-v4:0"
-        accept = "*/*"
-        content_type = "application/json"
-
-        response = self.client.invoke_model(
-            modelId=model_id,
-            accept=accept,
-            contentType=content_type,
-            body=json.dumps({"texts": texts, "input_type": input_type}),
+        embedding_model = get_embedding_model(embedding_version)
+        body = {**body, "output_dimension": embedding_model["dimension"]}
+
+        invocation = model_telemetry.start(
+            "invoke_model", embedding_model["model_id"], "embedding", priority
         )
 
+        try:
+            response = bedrock_scheduler.call(
+                self.client.invoke_model,
+                priority=priority,
+                invocation=invocation,
+                modelId=embedding_model["model_id"],
+                accept="*/*",
+                contentType="application/json",
+                body=json.dumps(body),
+            )
+            model_telemetry.set_invoke_model_usage(invocation, response)
+        finally:
+            model_telemetry.record(invocation)
+
         response_body = json.loads(response.get("body").read())
         embeddings = response_body.get("embeddings", None)
 
@@ -165,58 +554,122 @@ class RAGHandler:
         for embedding_type in embeddings:
             return embeddings[embedding_type]
 
-    def extract_text_from_txt(self, data: bytes) -> str:
-        """Extract text from a TXT file.
+    def get_embeddings(
+        self,
+        texts: List[str],
+        input_type: Literal["search_document", "search_query"] = "search_document",
+        embedding_version: str = DEFAULT_EMBEDDING_VERSION,
+        priority: Priority = "background",
+    ) -> List[List[float]]:
+        """Generate embeddings for the given texts using Bedrock's Cohere embed-v4 model.
 
         Args:
-            data (bytes): The byte content of the TXT file.
+            texts (List[str]): The texts to generate embeddings for.
+            input_type (Literal["search_document", "search_query"], optional): The type of input. Defaults to "search_document".
+            embedding_version (str, optional): The embedding version to use. Defaults to DEFAULT_EMBEDDING_VERSION.
+            priority (Priority, optional): The scheduling lane of the call. Defaults to "background".
+
+        Raises:
+            HTTPException: If embeddings cannot be retrieved from Bedrock.
 
         Returns:
-            str: The extracted text.
+            List[List[float]]: A list of embeddings corresponding to the input texts.
         """
-        return data.decode("utf-8")
+        return self.__invoke_embedding_model(
+            {"texts": texts, "input_type": input_type}, embedding_version, priority
+        )
 
-    def extract_text_from_pdf(self, data: bytes) -> str:
-        """Extract text from a PDF file, including text from embedded images using OCR.
+    def get_image_embeddings(
+        self,
+        images: List[Tuple[bytes, Literal["png", "jpeg"]]],
+        embedding_version: str = DEFAULT_EMBEDDING_VERSION,
+    ) -> List[List[float]]:
+        """Generate embeddings for the given images using Bedrock's Cohere embed-v4 model.
+
+        Images are embedded in the same vector space as texts, so they can be retrieved
+        by text queries without going through OCR first. The Bedrock Cohere embed API
+        accepts a single image per request, so each image is sent in its own call.
 
         Args:
-            data (bytes): The byte content of the PDF file.
+            images (List[Tuple[bytes, Literal["png", "jpeg"]]]): The images to embed, as (bytes, format) tuples.
+            embedding_version (str, optional): The embedding version to use. Defaults to DEFAULT_EMBEDDING_VERSION.
+
+        Raises:
+            HTTPException: If embeddings cannot be retrieved from Bedrock.
 
         Returns:
-            str: The extracted text.
+            List[List[float]]: A list of embeddings corresponding to the input images.
         """
-        document = pymupdf.open(stream=data, filetype="pdf")
-        text = ""
+        embeddings = []
 
-        for page_num in range(document.page_count):
-            page = document.load_page(page_num)
-            text += page.get_text()
+        for image_bytes, extension in images:
+            data_uri = f"data:image/{extension};base64,{base64.b64encode(image_bytes).decode('utf-8')}"
 
-            for img in page.get_images(full=True):
-                xref = img[0]
-                base_image = page.parent.extract_image(xref)
-                image_bytes = base_image["image"]
-                image_ext = base_image["ext"]
+            embeddings.extend(
+                self.__invoke_embedding_model(
+                    {"images": [data_uri], "input_type": "search_document"},
+                    embedding_version,
+                )
+            )
 
-                if image_ext == "jpg":
-                    image_ext = "jpeg"
+        return embeddings
 
-                if image_ext not in ["png", "jpeg"]:
-                    continue
+    def __normalize_image_extension(self, extension: str) -> Optional[str]:
+        """Normalize an image extension to a format accepted by Bedrock.
 
-                image_text = self.extract_text_from_image(
-                    data=image_bytes, extension=image_ext
-                )
+        Args:
+            extension (str): The image extension.
+
+        Returns:
+            Optional[str]: "png" or "jpeg", or None if the format is not supported.
+        """
+        if extension in ["jpg", "jpeg"]:
+            return "jpeg"
+
+        if extension == "png":
+            return "png"
+
+        return None
+
+    def extract_text_from_txt(self, data: bytes) -> str:
+        """Extract text from a TXT file.
+
+        Args:
+            data (bytes): The byte content of the TXT file.
 
-                text += image_text
+        Returns:
+            str: The extracted text.
+        """
+        return data.decode("utf-8")
 
-        return text
+    def __iter_page_images(self, page: pymupdf.Page):
+        """Iterate over the supported images of a PDF page.
+
+        Args:
+            page (pymupdf.Page): The PDF page.
+
+        Yields:
+            Tuple[int, bytes, Literal["png", "jpeg"]]: The page number, image bytes and image format.
+        """
+        for img in page.get_images(full=True):
+            xref = img[0]
+            base_image = page.parent.extract_image(xref)
+            image_ext = self.__normalize_image_extension(base_image["ext"])
+
+            if image_ext is None:
+                continue
+
+            yield page.number, base_image["image"], image_ext
 
     def extract_text_from_image(
         self, data: bytes, extension: Literal["png", "jpeg"]
     ) -> str:
         """Extract text from an image using an OCR model via Bedrock.
 
+        The image is preprocessed first. Tiles of tall images are sent, in order, in a
+        single request, which the tile limit of the preprocessor keeps within the number
+        of images accepted by Bedrock.
+
         Args:
             data (bytes): The byte content of the image.
             extension (Literal["png", "jpeg"]): The format of the image.
@@ -227,12 +680,20 @@ class RAGHandler:
         Returns:
             str: The extracted text or a description of the image if no text is found.
         """
+        tiles = image_preprocessor.preprocess(data, extension)
+        invocation = model_telemetry.start(
+            "converse", self.ocr_model_id, "ocr", "background"
+        )
+
         try:
-            response = self.client.converse(
+            response = bedrock_scheduler.call(
+                self.client.converse,
+                priority="background",
+                invocation=invocation,
                 modelId=self.ocr_model_id,
                 system=[
                     {
-                        "text": "You are an OCR model that extracts text from images accurately. Return EITHER the extracted text OR a description of the image if no text is found.",
+                        "text": "You are an OCR model that extracts text from images accurately. Return EITHER the extracted text OR a description of the image if no text is found. If several images are given, they are consecutive parts of the same image, from top to bottom.",
                     }
                 ],
                 messages=[
@@ -241,18 +702,26 @@ class RAGHandler:
                         "content": [
                             {
                                 "image": {
-                                    "source": {"bytes": data},
-                                    "format": extension,
+                                    "source": {"bytes": tile_bytes},
+                                    "format": tile_extension,
                                 }
                             }
+                            for tile_bytes, tile_extension in tiles
                         ],
                     }
                 ],
             )
+            model_telemetry.set_usage(
+                invocation, response.get("usage", {}), response.get("metrics", {})
+            )
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=500, detail=f"Error during OCR extraction: {str(e)}"
             )
+        finally:
+            model_telemetry.record(invocation)
 
         return response["output"]["message"]["content"][0]["text"]
 
@@ -294,6 +763,29 @@ class RAGHandler:
         os.remove(temp_video_path)
         return extracted_text
 
+    def embed_query(
+        self,
+        knowledge_base: KnowledgeBase,
+        text: str,
+        priority: Priority = "interactive",
+    ) -> List[float]:
+        """Embed a query with the active embedding version of a knowledge base.
+
+        Args:
+            knowledge_base (KnowledgeBase): The knowledge base the query will be run against.
+            text (str): The query text.
+            priority (Priority, optional): The scheduling lane of the call. Defaults to "interactive".
+
+        Returns:
+            List[float]: The query embedding.
+        """
+        return self.get_embeddings(
+            texts=[text],
+            input_type="search_query",
+            embedding_version=knowledge_base.embedding_version,
+            priority=priority,
+        )[0]
+
     def query(
         self,
         session: Session,
@@ -302,9 +794,12 @@ class RAGHandler:
         k: int = 3,
         similarity_threshold: float = 0.0,
         preferred_type: str | None = None,
+        priority: Priority = "interactive",
     ) -> Tuple[List[UUID], str] | Tuple[None, None]:
         """Query the knowledge base for relevant document chunks based on the input message.
 
+        Only chunks of the knowledge base's active embedding version are searched.
+
         Args:
             session (Session): Database session for executing queries.
             knowledge_base (KnowledgeBase): The knowledge base to query against.
@@ -312,14 +807,46 @@ class RAGHandler:
             k (int, optional): The number of results to return. Defaults to 3.
             similarity_threshold (float, optional): The minimum similarity score for results. Defaults to 0.0.
             preferred_type (str | None, optional): The preferred document type to filter results. Defaults to None.
+            priority (Priority, optional): The scheduling lane of the query embedding call. Defaults to "interactive".
 
         Returns:
             Tuple[List[UUID], str] | Tuple[None, None]: A tuple containing a list of referenced document IDs and the context string, or (None, None) if no relevant chunks are found.
         """
-        query_embedding = self.get_embeddings(
-            texts=[message.content.text], input_type="search_query"
-        )[0]
+        query_embedding = self.embed_query(
+            knowledge_base, message.content.text, priority
+        )
+
+        return self.search(
+            session,
+            knowledge_base,
+            query_embedding,
+            k=k,
+            similarity_threshold=similarity_threshold,
+            preferred_type=preferred_type,
+        )
 
+    def search(
+        self,
+        session: Session,
+        knowledge_base: KnowledgeBase,
+        query_embedding: List[float],
+        k: int = 3,
+        similarity_threshold: float = 0.0,
+        preferred_type: str | None = None,
+    ) -> Tuple[List[UUID], str] | Tuple[None, None]:
+        """Search the knowledge base for the document chunks closest to a query embedding.
+
+        Args:
+            session (Session): Database session for executing queries.
+            knowledge_base (KnowledgeBase): The knowledge base to search.
+            query_embedding (List[float]): The query embedding, produced with the knowledge base's active embedding version.
+            k (int, optional): The number of results to return. Defaults to 3.
+            similarity_threshold (float, optional): The minimum similarity score for results. Defaults to 0.0.
+            preferred_type (str | None, optional): The preferred document type to filter results. Defaults to None.
+
+        Returns:
+            Tuple[List[UUID], str] | Tuple[None, None]: A tuple containing a list of referenced document IDs and the context string, or (None, None) if no relevant chunks are found.
+        """
         distance_function = Chunk.embedding.cosine_distance(query_embedding)
 
         statement = (
@@ -328,11 +855,13 @@ class RAGHandler:
                 distance_function.label("distance"),
             )
             .join(Document, Chunk.document_id == Document.id)
-            .filter(Document.knowledge_base_id == knowledge_base.id)
+            .filter(
+                Document.knowledge_base_id == knowledge_base.id,
+                Chunk.embedding_version == knowledge_base.embedding_version,
+            )
             .order_by(asc("distance"))
             .limit(k)
         )
-
         if preferred_type:
             statement = statement.filter(Document.document_type == preferred_type)
 
@@ -364,3 +893,6 @@ class RAGHandler:
                 + "\n[RAG CONTEXT END]"
             ),
         )
+
+
+rag_handler: RAGHandler = RAGHandler()
@@ -0,0 +1,521 @@
+import logging
+import os
+import threading
+import time
+from typing import Dict, Set
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import delete, exists, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import aliased
+
+from src.db import db_connection
+from src.db.tables import Chunk, Document, KnowledgeBase
+
+from .embedding_models import get_embedding_model
+from .rag_handler import rag_handler
+
+logger = logging.getLogger(__name__)
+
+
+class ImageMismatchError(ValueError):
+    """Raised when the images extracted from a document no longer match its image chunks."""
+
+    def __init__(self, document_id: UUID, message: str):
+        super().__init__(message)
+        self.document_id = document_id
+
+
+class ReEmbedder:
+    def __init__(self):
+        self.db_conn = db_connection
+        self.rag_handler = rag_handler
+
+        self.batch_size = int(os.getenv("RAG_REEMBED_BATCH_SIZE", "96"))
+        self.batch_interval = float(
+            os.getenv("RAG_REEMBED_BATCH_INTERVAL_SECONDS", "1.0")
+        )
+        self.max_consecutive_failures = 5
+
+        self.workers: Dict[UUID, threading.Thread] = {}
+        self.workers_lock = threading.Lock()
+
+    def start(self, knowledge_base_id: UUID, embedding_version: str):
+        """Start re-embedding a knowledge base into a new embedding version.
+
+        The knowledge base keeps being queried with its active version until every chunk
+        has been re-embedded, then switches to the new version atomically.
+
+        Args:
+            knowledge_base_id (UUID): The ID of the knowledge base to re-embed.
+            embedding_version (str): The target embedding version.
+
+        Raises:
+            HTTPException: If the embedding version is unknown or already active.
+            HTTPException: If another re-embedding is in progress for the knowledge base.
+        """
+        get_embedding_model(embedding_version)
+
+        with self.db_conn.get_session() as session:
+            knowledge_base = session.execute(
+                select(KnowledgeBase)
+                .where(KnowledgeBase.id == knowledge_base_id)
+                .with_for_update()
+            ).scalar_one_or_none()
+
+            if knowledge_base is None:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"KnowledgeBase with id {knowledge_base_id} not found",
+                )
+
+            if knowledge_base.embedding_version == embedding_version:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Knowledge base already uses embedding version {embedding_version}.",
+                )
+
+            if knowledge_base.pending_embedding_version not in (
+                None,
+                embedding_version,
+            ):
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Knowledge base is already being re-embedded into {knowledge_base.pending_embedding_version}.",
+                )
+
+            knowledge_base.pending_embedding_version = embedding_version
+            session.commit()
+
+        self.__spawn(knowledge_base_id)
+
+    def resume_pending(self):
+        """Resume the re-embedding of every knowledge base with a pending embedding version."""
+        with self.db_conn.get_session() as session:
+            knowledge_base_ids = (
+                session.execute(
+                    select(KnowledgeBase.id).where(
+                        KnowledgeBase.pending_embedding_version.is_not(None)
+                    )
+                )
+                .scalars()
+                .all()
+            )
+
+        for knowledge_base_id in knowledge_base_ids:
+            self.__spawn(knowledge_base_id)
+
+    def __spawn(self, knowledge_base_id: UUID):
+        """Start the background worker of a knowledge base, unless it is already running.
+
+        Args:
+            knowledge_base_id (UUID): The ID of the knowledge base.
+        """
+        with self.workers_lock:
+            worker = self.workers.get(knowledge_base_id, None)
+            if worker and worker.is_alive():
+                return
+
+            worker = threading.Thread(
+                target=self.run, args=(knowledge_base_id,), daemon=True
+            )
+            self.workers[knowledge_base_id] = worker
+            worker.start()
+
+    def run(self, knowledge_base_id: UUID):
+        """Re-embed a knowledge base batch by batch, then cut over to the new version.
+
+        Batches are spaced by `batch_interval` seconds so re-embedding never competes
+        with interactive traffic for embedding throughput. A document whose images can
+        no longer be re-embedded is skipped and loses its image chunks at the cutover.
+        Only `max_consecutive_failures` errors in a row abandon the re-embedding.
+
+        Args:
+            knowledge_base_id (UUID): The ID of the knowledge base.
+        """
+        consecutive_failures = 0
+        failed_document_ids: Set[UUID] = set()
+
+        try:
+            while True:
+                with self.db_conn.get_session() as session:
+                    knowledge_base = session.get(KnowledgeBase, knowledge_base_id)
+                    if (
+                        knowledge_base is None
+                        or knowledge_base.pending_embedding_version is None
+                    ):
+                        return
+
+                    source_version = knowledge_base.embedding_version
+                    target_version = knowledge_base.pending_embedding_version
+
+                try:
+                    reembedded = self.__reembed_text_batch(
+                        knowledge_base_id, source_version, target_version
+                    ) or self.__reembed_image_document(
+                        knowledge_base_id,
+                        source_version,
+                        target_version,
+                        failed_document_ids,
+                    )
+                    consecutive_failures = 0
+                except ImageMismatchError as e:
+                    failed_document_ids.add(e.document_id)
+                    logger.error(
+                        "Skipping document %s while re-embedding knowledge base %s (%d failed documents): %s",
+                        e.document_id,
+                        knowledge_base_id,
+                        len(failed_document_ids),
+                        e,
+                    )
+                    continue
+                except Exception as e:
+                    consecutive_failures += 1
+                    logger.warning(
+                        "Re-embedding of knowledge base %s failed (%d/%d): %s",
+                        knowledge_base_id,
+                        consecutive_failures,
+                        self.max_consecutive_failures,
+                        e,
+                    )
+                    if consecutive_failures >= self.max_consecutive_failures:
+                        if self.__abandon(knowledge_base_id, target_version):
+                            self.__delete_version(knowledge_base_id, target_version)
+                        return
+
+                    time.sleep(self.batch_interval * 2**consecutive_failures)
+                    continue
+
+                if reembedded:
+                    time.sleep(self.batch_interval)
+                    continue
+
+                if self.__cutover(
+                    knowledge_base_id,
+                    source_version,
+                    target_version,
+                    failed_document_ids,
+                ):
+                    self.__delete_version(knowledge_base_id, source_version)
+                    return
+        finally:
+            with self.workers_lock:
+                self.workers.pop(knowledge_base_id, None)
+
+    def __missing_chunks_statement(
+        self,
+        knowledge_base_id: UUID,
+        source_version: str,
+        target_version: str,
+        failed_document_ids: Set[UUID] = frozenset(),
+    ):
+        """Build a statement selecting source chunks without a counterpart in the target version.
+
+        Args:
+            knowledge_base_id (UUID): The ID of the knowledge base.
+            source_version (str): The active embedding version.
+            target_version (str): The pending embedding version.
+            failed_document_ids (Set[UUID], optional): The documents skipped for the rest of the re-embedding. Defaults to frozenset().
+
+        Returns:
+            Select: The statement selecting the missing chunks.
+        """
+        target_chunk = aliased(Chunk)
+
+        statement = (
+            select(Chunk)
+            .join(Document, Chunk.document_id == Document.id)
+            .where(
+                Document.knowledge_base_id == knowledge_base_id,
+                Chunk.embedding_version == source_version,
+                ~exists().where(
+                    target_chunk.document_id == Chunk.document_id,
+                    target_chunk.index == Chunk.index,
+                    target_chunk.embedding_version == target_version,
+                ),
+            )
+        )
+
+        if failed_document_ids:
+            statement = statement.where(
+                Chunk.document_id.not_in(list(failed_document_ids))
+            )
+
+        return statement
+
+    def __reembed_text_batch(
+        self, knowledge_base_id: UUID, source_version: str, target_version: str
+    ) -> bool:
+        """Re-embed one batch of text chunks from their stored content.
+
+        Args:
+            knowledge_base_id (UUID): The ID of the knowledge base.
+            source_version (str): The active embedding version.
+            target_version (str): The pending embedding version.
+
+        Returns:
+            bool: True if a batch was re-embedded, False if no text chunk is missing.
+        """
+        with self.db_conn.get_session() as session:
+            chunks = (
+                session.execute(
+                    self.__missing_chunks_statement(
+                        knowledge_base_id, source_version, target_version
+                    )
+                    .where(Chunk.modality == "text")
+                    .order_by(Chunk.document_id, Chunk.index)
+                    .limit(self.batch_size)
+                )
+                .scalars()
+                .all()
+            )
+            rows = [
+                {
+                    "document_id": chunk.document_id,
+                    "content": chunk.content,
+                    "index": chunk.index,
+                    "modality": chunk.modality,
+                    "embedding_version": target_version,
+                }
+                for chunk in chunks
+            ]
+
+        if not rows:
+            return False
+
+        embeddings = self.rag_handler.get_embeddings(
+            texts=[row["content"] for row in rows],
+            input_type="search_document",
+            embedding_version=target_version,
+        )
+
+        self.__insert_chunks(rows, embeddings)
+        return True
+
+    def __reembed_image_document(
+        self,
+        knowledge_base_id: UUID,
+        source_version: str,
+        target_version: str,
+        failed_document_ids: Set[UUID],
+    ) -> bool:
+        """Re-embed the image chunks of one document.
+
+        Images are extracted and preprocessed again from the stored document, which is
+        cheap compared to OCR and does not change the text chunks.
+
+        Args:
+            knowledge_base_id (UUID): The ID of the knowledge base.
+            source_version (str): The active embedding version.
+            target_version (str): The pending embedding version.
+            failed_document_ids (Set[UUID]): The documents skipped for the rest of the re-embedding.
+
+        Raises:
+            ImageMismatchError: If the extracted images no longer match the stored image chunks.
+
+        Returns:
+            bool: True if a document was re-embedded, False if no image chunk is missing.
+        """
+        with self.db_conn.get_session() as session:
+            document_id = session.execute(
+                self.__missing_chunks_statement(
+                    knowledge_base_id,
+                    source_version,
+                    target_version,
+                    failed_document_ids,
+                )
+                .where(Chunk.modality == "image")
+                .with_only_columns(Chunk.document_id)
+                .limit(1)
+            ).scalar()
+
+            if document_id is None:
+                return False
+
+            document = Document.get_by_id(session, document_id)
+            data, name, extension = (
+                document.data,
+                document.name,
+                document.document_extension,
+            )
+
+            image_chunks = session.execute(
+                select(Chunk.index, Chunk.content)
+                .where(
+                    Chunk.document_id == document_id,
+                    Chunk.embedding_version == source_version,
+                    Chunk.modality == "image",
+                )
+                .order_by(Chunk.index)
+            ).all()
+
+        images = self.rag_handler.extract_document_images(data, name, extension)
+
+        if len(images) != len(image_chunks):
+            raise ImageMismatchError(
+                document_id,
+                f"Document {document_id} has {len(image_chunks)} image chunks but {len(images)} images were extracted.",
+            )
+
+        embeddings = self.rag_handler.get_image_embeddings(
+            images=[
+                (image_bytes, image_extension)
+                for image_bytes, image_extension, _ in images
+            ],
+            embedding_version=target_version,
+        )
+
+        rows = [
+            {
+                "document_id": document_id,
+                "content": content,
+                "index": index,
+                "modality": "image",
+                "embedding_version": target_version,
+            }
+            for index, content in image_chunks
+        ]
+
+        self.__insert_chunks(rows, embeddings)
+        return True
+
+    def __insert_chunks(self, rows: list[dict], embeddings: list[list[float]]):
+        """Insert re-embedded chunks, skipping chunks already written by a concurrent ingestion.
+
+        Args:
+            rows (list[dict]): The chunk rows, without embeddings.
+            embeddings (list[list[float]]): The embeddings of the rows, in order.
+        """
+        with self.db_conn.get_session() as session:
+            session.execute(
+                insert(Chunk)
+                .values(
+                    [
+                        {**row, "embedding": embedding}
+                        for row, embedding in zip(rows, embeddings)
+                    ]
+                )
+                .on_conflict_do_nothing(
+                    index_elements=["document_id", "index", "embedding_version"]
+                )
+            )
+            session.commit()
+
+    def __cutover(
+        self,
+        knowledge_base_id: UUID,
+        source_version: str,
+        target_version: str,
+        failed_document_ids: Set[UUID],
+    ) -> bool:
+        """Switch the knowledge base to the target version if no chunk is missing.
+
+        The knowledge base row is locked, so ingestions writing chunks concurrently
+        either finish before the check or already see the new active version.
+
+        Args:
+            knowledge_base_id (UUID): The ID of the knowledge base.
+            source_version (str): The active embedding version.
+            target_version (str): The pending embedding version.
+            failed_document_ids (Set[UUID]): The skipped documents, whose missing chunks do not block the cutover.
+
+        Returns:
+            bool: True if the knowledge base now uses the target version.
+        """
+        with self.db_conn.get_session() as session:
+            knowledge_base = session.execute(
+                select(KnowledgeBase)
+                .where(KnowledgeBase.id == knowledge_base_id)
+                .with_for_update()
+            ).scalar_one()
+
+            if (
+                knowledge_base.embedding_version != source_version
+                or knowledge_base.pending_embedding_version != target_version
+            ):
+                return False
+
+            missing = session.execute(
+                select(
+                    self.__missing_chunks_statement(
+                        knowledge_base_id,
+                        source_version,
+                        target_version,
+                        failed_document_ids,
+                    ).exists()
+                )
+            ).scalar()
+
+            if missing:
+                return False
+
+            knowledge_base.embedding_version = target_version
+            knowledge_base.pending_embedding_version = None
+            session.commit()
+
+            return True
+
+    def __abandon(self, knowledge_base_id: UUID, target_version: str) -> bool:
+        """Give up a re-embedding that keeps failing, so ingestions stop writing the target version.
+
+        Args:
+            knowledge_base_id (UUID): The ID of the knowledge base.
+            target_version (str): The pending embedding version.
+
+        Returns:
+            bool: True if the pending version was cleared, False if it changed meanwhile.
+        """
+        with self.db_conn.get_session() as session:
+            knowledge_base = session.execute(
+                select(KnowledgeBase)
+                .where(KnowledgeBase.id == knowledge_base_id)
+                .with_for_update()
+            ).scalar_one_or_none()
+
+            if (
+                knowledge_base is None
+                or knowledge_base.pending_embedding_version != target_version
+            ):
+                return False
+
+            knowledge_base.pending_embedding_version = None
+            session.commit()
+
+        logger.error(
+            "Re-embedding of knowledge base %s into %s abandoned after %d consecutive failures.",
+            knowledge_base_id,
+            target_version,
+            self.max_consecutive_failures,
+        )
+        return True
+
+    def __delete_version(self, knowledge_base_id: UUID, embedding_version: str):
+        """Delete the chunks of a retired embedding version, in throttled batches.
+
+        Args:
+            knowledge_base_id (UUID): The ID of the knowledge base.
+            embedding_version (str): The retired embedding version.
+        """
+        while True:
+            with self.db_conn.get_session() as session:
+                chunk_ids = (
+                    select(Chunk.id)
+                    .join(Document, Chunk.document_id == Document.id)
+                    .where(
+                        Document.knowledge_base_id == knowledge_base_id,
+                        Chunk.embedding_version == embedding_version,
+                    )
+                    .limit(self.batch_size * 10)
+                )
+
+                result = session.execute(delete(Chunk).where(Chunk.id.in_(chunk_ids)))
+                session.commit()
+
+                if result.rowcount == 0:
+                    return
+
+            time.sleep(self.batch_interval)
+
+
+re_embedder: ReEmbedder = ReEmbedder()
@@ -0,0 +1,179 @@
+import math
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Tuple
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from src.bedrock import Priority
+from src.db.tables import KnowledgeBase
+from src.dto import MessageDTO
+
+from .rag_handler import rag_handler
+
+NON_INFORMATIONAL_PATTERN = re.compile(
+    r"^(ok(ay)?|obrigad[oa]s?|muito obrigad[oa]|valeu|vlw|beleza|blz|certo|entendi"
+    r"|legal|show|perfeito|[oó]timo|top|sim|n[aã]o|claro|pode ser|tchau|at[eé] mais"
+    r"|oi|ol[aá]|bom dia|boa tarde|boa noite|thanks|thank you|thx|yes|no|great|cool"
+    r"|got it|bye|hi|hello)[\s!.?,]*$",
+    re.IGNORECASE,
+)
+
+
+class RetrievalPolicy:
+    def __init__(self):
+        self.rag_handler = rag_handler
+
+        self.reuse_similarity = float(
+            os.getenv("RAG_RETRIEVAL_REUSE_SIMILARITY", "0.9")
+        )
+        self.max_tracked_chats = 1024
+
+        self.chat_contexts: OrderedDict[UUID, dict] = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.stats = {"retrieved": 0, "skipped": 0, "reused": 0}
+
+    def retrieve(
+        self,
+        session: Session,
+        knowledge_base: KnowledgeBase,
+        chat_id: UUID,
+        message: MessageDTO,
+        priority: Priority = "interactive",
+    ) -> Tuple[List[UUID], str] | Tuple[None, None]:
+        """Get the RAG context for a chat turn, retrieving only when it is worth it.
+
+        Empty or non-informational turns (e.g. "thanks!") skip retrieval entirely. Turns
+        whose query embedding lies within `reuse_similarity` of the previous retrieval of
+        the same chat reuse the previously retrieved chunks instead of searching again.
+
+        Args:
+            session (Session): The database session.
+            knowledge_base (KnowledgeBase): The knowledge base to query against.
+            chat_id (UUID): The ID of the chat the turn belongs to.
+            message (MessageDTO): The user message of the turn.
+            priority (Priority, optional): The scheduling lane of the query embedding call. Defaults to "interactive".
+
+        Returns:
+            Tuple[List[UUID], str] | Tuple[None, None]: The referenced document IDs and the context string, or (None, None) if there is no context.
+        """
+        previous = self.__get_chat_context(chat_id, knowledge_base)
+        text = message.content.text.strip()
+
+        if not text or NON_INFORMATIONAL_PATTERN.match(text):
+            self.__count("skipped")
+            if previous:
+                return previous["referenced_documents"], previous["context"]
+
+            return None, None
+
+        query_embedding = self.rag_handler.embed_query(knowledge_base, text, priority)
+
+        if (
+            previous
+            and self.__cosine_similarity(query_embedding, previous["embedding"])
+            >= self.reuse_similarity
+        ):
+            self.__count("reused")
+            return previous["referenced_documents"], previous["context"]
+
+        referenced_documents, context = self.rag_handler.search(
+            session, knowledge_base, query_embedding
+        )
+        self.__count("retrieved")
+
+        self.__set_chat_context(
+            chat_id,
+            {
+                "knowledge_base_id": knowledge_base.id,
+                "embedding_version": knowledge_base.embedding_version,
+                "embedding": query_embedding,
+                "referenced_documents": referenced_documents,
+                "context": context,
+            },
+        )
+
+        return referenced_documents, context
+
+    def get_stats(self) -> dict:
+        """Get the retrieval counters since the process started.
+
+        Returns:
+            dict: The number of retrievals performed, skipped, reused and avoided in total.
+        """
+        with self.lock:
+            stats = dict(self.stats)
+
+        stats["avoided"] = stats["skipped"] + stats["reused"]
+        return stats
+
+    def __get_chat_context(
+        self, chat_id: UUID, knowledge_base: KnowledgeBase
+    ) -> dict | None:
+        """Get the last retrieval of a chat, if it was made against the same index.
+
+        Args:
+            chat_id (UUID): The ID of the chat.
+            knowledge_base (KnowledgeBase): The knowledge base being queried.
+
+        Returns:
+            dict | None: The last retrieval of the chat, or None.
+        """
+        with self.lock:
+            previous = self.chat_contexts.get(chat_id, None)
+            if previous is None:
+                return None
+
+            self.chat_contexts.move_to_end(chat_id)
+
+        if (
+            previous["knowledge_base_id"] != knowledge_base.id
+            or previous["embedding_version"] != knowledge_base.embedding_version
+        ):
+            return None
+
+        return previous
+
+    def __set_chat_context(self, chat_id: UUID, context: dict):
+        """Store the last retrieval of a chat, evicting the least recently used chats.
+
+        Args:
+            chat_id (UUID): The ID of the chat.
+            context (dict): The retrieval to store.
+        """
+        with self.lock:
+            self.chat_contexts[chat_id] = context
+            self.chat_contexts.move_to_end(chat_id)
+
+            while len(self.chat_contexts) > self.max_tracked_chats:
+                self.chat_contexts.popitem(last=False)
+
+    def __count(self, outcome: str):
+        with self.lock:
+            self.stats[outcome] += 1
+
+    def __cosine_similarity(self, a: List[float], b: List[float]) -> float:
+        """Compute the cosine similarity between two embeddings.
+
+        Args:
+            a (List[float]): The first embedding.
+            b (List[float]): The second embedding.
+
+        Returns:
+            float: The cosine similarity, or 0 if the embeddings are not comparable.
+        """
+        if len(a) != len(b):
+            return 0.0
+
+        norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+        if norm == 0:
+            return 0.0
+
+        return sum(x * y for x, y in zip(a, b)) / norm
+
+
+retrieval_policy: RetrievalPolicy = RetrievalPolicy()
@@ -0,0 +1,68 @@
+import queue
+import threading
+from typing import Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+_END = object()
+
+
+class _ProducerError:
+    def __init__(self, exception: BaseException):
+        self.exception = exception
+
+
+def prefetch(iterable: Iterable[T], maxsize: int) -> Iterator[T]:
+    """Consume an iterable in a background thread through a bounded queue.
+
+    The producer blocks whenever `maxsize` items are waiting to be consumed, so a slow
+    consumer applies backpressure to the stages upstream. Exceptions raised by the
+    producer are re-raised in the consumer, and closing the returned generator stops
+    the producer.
+
+    Args:
+        iterable (Iterable[T]): The iterable to consume in the background.
+        maxsize (int): The maximum number of items buffered between producer and consumer.
+
+    Yields:
+        T: The items of the iterable, in order.
+    """
+    buffer: queue.Queue = queue.Queue(maxsize=maxsize)
+    stopped = threading.Event()
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+
+            put(_END)
+        except BaseException as e:
+            put(_ProducerError(e))
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            item = buffer.get()
+
+            if item is _END:
+                return
+
+            if isinstance(item, _ProducerError):
+                raise item.exception
+
+            yield item
+    finally:
+        stopped.set()
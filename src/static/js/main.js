@@ -79,6 +79,63 @@ class Utils {
         }, 5000);
     }
     
+    // Lê um stream de Server-Sent Events autenticado (EventSource não envia o header Authorization)
+    static streamEvents(url, onEvent, onEnd = null) {
+        const controller = new AbortController();
+
+        (async () => {
+            let error = null;
+
+            try {
+                const response = await fetch(url, {
+                    headers: {
+                        'Authorization': `Bearer ${localStorage.getItem('authToken')}`
+                    },
+                    signal: controller.signal
+                });
+
+                if (!response.ok) {
+                    throw new Error(`HTTP error! status: ${response.status}`);
+                }
+
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                let buffer = '';
+
+                while (true) {
+                    const { done, value } = await reader.read();
+                    if (done) break;
+
+                    buffer += decoder.decode(value, { stream: true });
+                    const blocks = buffer.split('\n\n');
+                    buffer = blocks.pop();
+
+                    blocks.forEach(block => {
+                        let event = 'message';
+                        let data = '';
+
+                        block.split('\n').forEach(line => {
+                            if (line.startsWith('event: ')) event = line.slice(7);
+                            else if (line.startsWith('data: ')) data += line.slice(6);
+                        });
+
+                        if (event !== 'ping') {
+                            onEvent(event, data ? JSON.parse(data) : null);
+                        }
+                    });
+                }
+            } catch (e) {
+                if (e.name === 'AbortError') return;
+                console.error('Event stream error:', e);
+                error = e;
+            }
+
+            if (onEnd) onEnd(error);
+        })();
+
+        return controller;
+    }
+
     static debounce(func, wait) {
         let timeout;
         return function executedFunction(...args) {
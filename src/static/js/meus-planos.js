@@ -3,11 +3,11 @@ class PlanosManager {
     constructor() {
         this.plans = [];
         this.currentFilter = 'todos';
-        this.pollingInterval = null;
+        this.eventStream = null;
         this.lastPlansHash = null; // To track changes
         
         this.initializeElements();
-        this.loadPlans(); // This will start polling if needed
+        this.loadPlans(); // This will start the event stream if needed
     }
 
     initializeElements() {
@@ -47,8 +47,8 @@ class PlanosManager {
             
             this.hideLoading();
             
-            // Check if we need to continue polling
-            this.checkPollingNeed(plans);
+            // Check if we need to keep listening to generation events
+            this.checkEventStreamNeed(plans);
             
         } catch (error) {
             console.error('Error loading plans:', error);
@@ -59,18 +59,18 @@ class PlanosManager {
         }
     }
 
-    checkPollingNeed(plans) {
-        // Only poll if there are plans creating modules (not outline)
+    checkEventStreamNeed(plans) {
+        // Only listen if there are plans creating modules (not outline)
         const hasModuleCreation = plans.some(plan => 
             plan.status === 'creating_modules'
         );
         
-        if (hasModuleCreation && !this.pollingInterval) {
-            console.log('Starting polling - found plans creating modules');
-            this.startPolling();
-        } else if (!hasModuleCreation && this.pollingInterval) {
-            console.log('Stopping polling - no module creation in progress');
-            this.stopPolling();
+        if (hasModuleCreation && !this.eventStream) {
+            console.log('Starting event stream - found plans creating modules');
+            this.startEventStream();
+        } else if (!hasModuleCreation && this.eventStream) {
+            console.log('Stopping event stream - no module creation in progress');
+            this.stopEventStream();
         }
     }
 
@@ -274,17 +274,27 @@ class PlanosManager {
         return JSON.stringify(planData);
     }
 
-    startPolling() {
-        // Poll every 5 seconds to update plan statuses
-        this.pollingInterval = setInterval(() => {
-            this.loadPlans();
-        }, 5000);
+    startEventStream() {
+        // Reload the plans only when the server pushes a generation update
+        this.eventStream = Utils.streamEvents(
+            '/plan/events',
+            (event) => {
+                if (event === 'module_done' || event === 'plan_done') {
+                    this.loadPlans();
+                }
+            },
+            () => {
+                // Reconnect if the stream ended while plans are still being generated
+                this.eventStream = null;
+                setTimeout(() => this.loadPlans(), 3000);
+            }
+        );
     }
 
-    stopPolling() {
-        if (this.pollingInterval) {
-            clearInterval(this.pollingInterval);
-            this.pollingInterval = null;
+    stopEventStream() {
+        if (this.eventStream) {
+            this.eventStream.abort();
+            this.eventStream = null;
         }
     }
 
@@ -343,9 +353,9 @@ document.addEventListener('DOMContentLoaded', () => {
     window.planosManager = new PlanosManager();
 });
 
-// Cleanup polling when leaving page
+// Cleanup event stream when leaving page
 window.addEventListener('beforeunload', () => {
     if (window.planosManager) {
-        window.planosManager.stopPolling();
+        window.planosManager.stopEventStream();
     }
 });
\ No newline at end of file
@@ -3,7 +3,7 @@ class PainelManager {
     constructor() {
         this.plans = [];
         this.currentFilter = 'todos';
-        this.pollingInterval = null;
+        this.eventStream = null;
         this.lastPlansHash = null;
         
         this.init();
@@ -110,8 +110,8 @@ class PainelManager {
                 // Hide skeleton after loading
                 this.hideSkeleton();
                 
-                // Check if we need to continue polling
-                this.checkPollingNeed(allPlans);
+                // Check if we need to keep listening to generation events
+                this.checkEventStreamNeed(allPlans);
             } else {
                 this.hideSkeleton();
                 this.showEmptyPlans();
@@ -123,18 +123,18 @@ class PainelManager {
         }
     }
 
-    checkPollingNeed(plans) {
-        // Only poll if there are plans creating modules (not outline)
+    checkEventStreamNeed(plans) {
+        // Only listen if there are plans creating modules (not outline)
         const hasModuleCreation = plans.some(plan => 
             plan.status === 'creating_modules'
         );
         
-        if (hasModuleCreation && !this.pollingInterval) {
-            console.log('Starting polling - found plans creating modules');
-            this.startPolling();
-        } else if (!hasModuleCreation && this.pollingInterval) {
-            console.log('Stopping polling - no module creation in progress');
-            this.stopPolling();
+        if (hasModuleCreation && !this.eventStream) {
+            console.log('Starting event stream - found plans creating modules');
+            this.startEventStream();
+        } else if (!hasModuleCreation && this.eventStream) {
+            console.log('Stopping event stream - no module creation in progress');
+            this.stopEventStream();
         }
     }
 
@@ -357,17 +357,27 @@ class PainelManager {
         return JSON.stringify(planData);
     }
 
-    startPolling() {
-        // Poll every 5 seconds to update plan statuses
-        this.pollingInterval = setInterval(() => {
-            this.loadAllPlans();
-        }, 5000);
+    startEventStream() {
+        // Reload the plans only when the server pushes a generation update
+        this.eventStream = Utils.streamEvents(
+            '/plan/events',
+            (event) => {
+                if (event === 'module_done' || event === 'plan_done') {
+                    this.loadAllPlans();
+                }
+            },
+            () => {
+                // Reconnect if the stream ended while plans are still being generated
+                this.eventStream = null;
+                setTimeout(() => this.loadAllPlans(), 3000);
+            }
+        );
     }
 
-    stopPolling() {
-        if (this.pollingInterval) {
-            clearInterval(this.pollingInterval);
-            this.pollingInterval = null;
+    stopEventStream() {
+        if (this.eventStream) {
+            this.eventStream.abort();
+            this.eventStream = null;
         }
     }
 }
@@ -407,9 +417,9 @@ document.addEventListener('DOMContentLoaded', () => {
     window.painelManager = new PainelManager();
 });
 
-// Cleanup polling when leaving page
+// Cleanup event stream when leaving page
 window.addEventListener('beforeunload', () => {
     if (window.painelManager) {
-        window.painelManager.stopPolling();
+        window.painelManager.stopEventStream();
     }
 });
\ No newline at end of file
@@ -4,7 +4,10 @@ class PlanoManager {
         this.currentPlanId = null;
         this.isWaitingForResponse = false;
         this.lastMessageId = null;
-        this.pollingInterval = null;
+        this.eventStream = null;
+        this.moduleWatch = null;
+        this.pendingDevelop = null;
+        this.generationProgress = null;
         this.currentStatus = null;
         this.currentMode = 'creation'; // 'creation' or 'study'
         this.selectedModuleId = null;
@@ -101,10 +104,10 @@ class PlanoManager {
                 this.switchToStudyMode(planData);
             } else if (planData.status === 'creating_modules') {
                 this.showModuleGenerationStatus();
-                this.startPolling(); // Only start polling if actively processing
+                this.startEventStream(); // Only listen if actively processing
             } else if (planData.status === 'creating_outline') {
                 this.enableInput();
-                // No polling needed yet - user is still chatting
+                // No event stream needed yet - user is still chatting
             } else {
                 this.enableInput();
             }
@@ -179,43 +182,70 @@ class PlanoManager {
         }
     }
 
-    startPolling() {
-        // Poll every 3 seconds to check for status changes
-        this.pollingInterval = setInterval(() => {
-            this.checkPlanStatus();
-        }, 3000);
+    startEventStream() {
+        if (!this.currentPlanId || this.eventStream) return;
+
+        // Recebe o progresso da geração via server push em vez de consultar o plano periodicamente
+        this.eventStream = Utils.streamEvents(
+            `/plan/${this.currentPlanId}/events`,
+            (event, data) => this.handlePlanEvent(event, data),
+            () => {
+                this.eventStream = null;
+
+                // Reconecta se o stream terminou antes do fim da geração
+                if (this.currentStatus === 'creating_modules') {
+                    setTimeout(() => this.startEventStream(), 3000);
+                }
+            }
+        );
     }
 
-    stopPolling() {
-        if (this.pollingInterval) {
-            clearInterval(this.pollingInterval);
-            this.pollingInterval = null;
+    stopEventStream() {
+        if (this.eventStream) {
+            this.eventStream.abort();
+            this.eventStream = null;
         }
     }
 
-    async checkPlanStatus() {
-        if (!this.currentPlanId) return;
-
-        try {
-            const response = await fetch(`/plan/${this.currentPlanId}`, {
-                method: 'GET',
-                headers: {
-                    'Authorization': `Bearer ${localStorage.getItem('authToken')}`
+    handlePlanEvent(event, data) {
+        switch (event) {
+            case 'snapshot':
+                this.generationProgress = {
+                    total: data.modules.length,
+                    done: data.modules.filter(m => m.status === 'created' || m.status === 'completed').length
+                };
+                this.setStatus(data.status, data);
+                break;
+            case 'plan_started':
+                this.generationProgress = { total: data.modules_count, done: 0 };
+                this.setStatus('creating_modules', data);
+                break;
+            case 'module_started':
+                this.chatStatus.textContent = `Gerando módulo: ${data.title}`;
+                break;
+            case 'content_created':
+                this.chatStatus.textContent = `Conteúdo criado: ${data.title}`;
+                break;
+            case 'module_done':
+                if (this.generationProgress) {
+                    this.generationProgress.done += 1;
+                    this.chatStatus.textContent = `Módulos gerados: ${this.generationProgress.done} de ${this.generationProgress.total}`;
                 }
-            });
-
-            if (response.ok) {
-                const planData = await response.json();
-                const newStatus = planData.status;
+                break;
+            case 'plan_done':
+                this.setStatus('created', data);
+                break;
+            case 'error':
+                console.error('Plan event stream error:', data);
+                break;
+        }
+    }
 
-                if (newStatus !== this.currentStatus) {
-                    console.log(`Status changed from ${this.currentStatus} to ${newStatus}`);
-                    this.handleStatusChange(this.currentStatus, newStatus, planData);
-                    this.currentStatus = newStatus;
-                }
-            }
-        } catch (error) {
-            console.error('Error checking plan status:', error);
+    setStatus(newStatus, planData) {
+        if (newStatus !== this.currentStatus) {
+            console.log(`Status changed from ${this.currentStatus} to ${newStatus}`);
+            this.handleStatusChange(this.currentStatus, newStatus, planData);
+            this.currentStatus = newStatus;
         }
     }
 
@@ -226,11 +256,11 @@ class PlanoManager {
                 break;
             case 'created':
                 this.showPlanCompleted();
-                this.stopPolling(); // Stop polling when plan is ready
+                this.stopEventStream(); // Stop listening when plan is ready
                 break;
             case 'completed':
                 this.showAllCompleted();
-                this.stopPolling(); // Stop polling when fully completed
+                this.stopEventStream(); // Stop listening when fully completed
                 break;
         }
     }
@@ -424,6 +454,7 @@ class PlanoManager {
         }
 
         this.selectedModuleId = moduleId;
+        this.stopModuleWatch();
 
         // Update active state - use data attribute for precise selection
         document.querySelectorAll('.module-card').forEach(item => {
@@ -470,8 +501,23 @@ class PlanoManager {
     }
 
     renderModuleContent(module) {
+        // Modules may be generated on first access, so wait for the contents still being generated
+        if (module.status === 'creating_outline' || module.status === 'creating_contents') {
+            this.watchModuleGeneration(module.module_id || module.id);
+        }
+
+        // Items whose generation failed can be generated again without regenerating the others
+        const failedNotice = module.failed_count > 0 ? `
+            <div class="empty-content">
+                <p>${module.failed_count} item(ns) deste módulo não puderam ser gerados.</p>
+                <button class="btn-primary" onclick="window.planoManager.regenerateFailed('${module.module_id || module.id}')">
+                    Gerar novamente os itens com falha
+                </button>
+            </div>
+        ` : '';
+
         if (!module.contents || module.contents.length === 0) {
-            this.contentBody.innerHTML = `
+            this.contentBody.innerHTML = failedNotice || `
                 <div class="empty-content">
                     <div class="empty-icon">📚</div>
                     <h3>Módulo em preparação</h3>
@@ -484,7 +530,49 @@ class PlanoManager {
 
 
         const contentList = module.contents.map((content, index) => this.createContentItem(content, index + 1)).join('');
-        this.contentBody.innerHTML = `<div class="content-list">${contentList}</div>`;
+        this.contentBody.innerHTML = `${failedNotice}<div class="content-list">${contentList}</div>`;
+    }
+
+    async regenerateFailed(moduleId) {
+        try {
+            const response = await fetch(`/plan/${this.currentPlanId}/modules/${moduleId}/regenerate_failed`, {
+                method: 'POST',
+                headers: {
+                    'Authorization': `Bearer ${localStorage.getItem('authToken')}`
+                }
+            });
+
+            if (!response.ok) {
+                throw new Error('Erro ao gerar novamente os itens com falha');
+            }
+
+            await this.loadModuleContent(moduleId);
+
+        } catch (error) {
+            console.error('Error regenerating failed items:', error);
+            Utils.showNotification('Erro ao gerar novamente os itens com falha', 'error');
+        }
+    }
+
+    watchModuleGeneration(moduleId) {
+        if (this.moduleWatch) return;
+
+        this.moduleWatch = Utils.streamEvents('/plan/events', (event, data) => {
+            if (event !== 'content_created' && event !== 'module_done') return;
+            if (data.module_id !== moduleId || this.selectedModuleId !== moduleId) return;
+
+            if (event === 'module_done') this.stopModuleWatch();
+            this.loadModuleContent(moduleId);
+        }, () => {
+            this.moduleWatch = null;
+        });
+    }
+
+    stopModuleWatch() {
+        if (this.moduleWatch) {
+            this.moduleWatch.abort();
+            this.moduleWatch = null;
+        }
     }
 
     showContentSkeleton() {
@@ -1121,26 +1209,26 @@ class PlanoManager {
         this.disableInput();
         this.showTyping();
 
+        // A chave fica com a mensagem pendente: a retentativa automática após uma falha de rede,
+        // ou o reenvio da mesma mensagem após um erro, se junta à requisição original
+        if (this.pendingDevelop?.message !== message) {
+            this.pendingDevelop = {
+                message,
+                idempotencyKey: window.crypto?.randomUUID
+                    ? crypto.randomUUID()
+                    : `${Date.now()}-${Math.random().toString(16).slice(2)}`
+            };
+        }
+
         try {
-            const response = await fetch(`/plan/${this.currentPlanId}/develop`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'Authorization': `Bearer ${localStorage.getItem('authToken')}`
-                },
-                body: JSON.stringify({
-                    content: {
-                        content_type: "text",
-                        text: message
-                    },
-                    role: "user"
-                })
-            });
+            const response = await this.postDevelop(message, this.pendingDevelop.idempotencyKey);
 
             if (!response.ok) {
                 throw new Error('Erro ao enviar mensagem');
             }
 
+            this.pendingDevelop = null;
+
             const data = await response.json();
             console.log('Develop response:', data);
 
@@ -1152,10 +1240,15 @@ class PlanoManager {
                 this.updatePlanInfo(messageData);
                 this.updateModules(messageData.modules || [], messageData.ready_to_save || false);
 
-                // Start polling if plan is ready to save (will trigger module generation)
-                if (messageData.ready_to_save && !this.pollingInterval) {
+                // Offer a finished plan with matching modules instead of generating them
+                if (data.template_match) {
+                    this.offerTemplate(data.template_match);
+                }
+
+                // Listen to the generation events if plan is ready to save (will trigger module generation)
+                if (messageData.ready_to_save && !this.eventStream) {
                     this.currentStatus = data.status;
-                    this.startPolling();
+                    this.startEventStream();
                 }
             }
 
@@ -1169,6 +1262,77 @@ class PlanoManager {
         }
     }
 
+    async postDevelop(message, idempotencyKey, retries = 2) {
+        for (let attempt = 0; ; attempt++) {
+            try {
+                return await fetch(`/plan/${this.currentPlanId}/develop`, {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                        'Authorization': `Bearer ${localStorage.getItem('authToken')}`,
+                        'Idempotency-Key': idempotencyKey
+                    },
+                    body: JSON.stringify({
+                        content: {
+                            content_type: "text",
+                            text: message
+                        },
+                        role: "user"
+                    })
+                });
+            } catch (error) {
+                // Falha de rede: a requisição pode ainda estar rodando, então repete com a mesma chave
+                if (attempt >= retries) throw error;
+                await new Promise(resolve => setTimeout(resolve, 1000 * (attempt + 1)));
+            }
+        }
+    }
+
+    offerTemplate(templateMatch) {
+        const messageDiv = document.createElement('div');
+        messageDiv.className = 'message ai';
+        messageDiv.innerHTML = this.markdownToHtml(
+            `Encontrei um plano pronto muito parecido: **${templateMatch.title}** (${templateMatch.modules_count} módulos). Você pode usá-lo agora mesmo, sem esperar a geração dos conteúdos.`
+        );
+
+        const button = document.createElement('button');
+        button.className = 'btn-primary';
+        button.textContent = 'Usar este plano';
+        button.onclick = () => {
+            button.disabled = true;
+            this.cloneTemplate(templateMatch.template_id);
+        };
+        messageDiv.appendChild(button);
+
+        this.chatMessages.appendChild(messageDiv);
+        this.scrollToBottom();
+    }
+
+    async cloneTemplate(templateId) {
+        try {
+            this.showLoading('Copiando plano...');
+
+            const response = await fetch(`/plan/${this.currentPlanId}/templates/${templateId}/clone`, {
+                method: 'POST',
+                headers: {
+                    'Authorization': `Bearer ${localStorage.getItem('authToken')}`
+                }
+            });
+
+            if (!response.ok) {
+                throw new Error('Erro ao copiar plano');
+            }
+
+            // Reload the plan so it opens in study mode with the cloned modules
+            window.location.href = `/ui/plano?plan_id=${this.currentPlanId}`;
+
+        } catch (error) {
+            console.error('Error cloning plan template:', error);
+            Utils.showNotification('Erro ao copiar plano', 'error');
+            this.hideLoading();
+        }
+    }
+
     addMessage(text, type) {
         const messageDiv = document.createElement('div');
         messageDiv.className = `message ${type}`;
@@ -1780,10 +1944,11 @@ document.addEventListener('DOMContentLoaded', () => {
     window.planoManager = new PlanoManager();
 });
 
-// Cleanup polling when leaving page
+// Cleanup event stream when leaving page
 window.addEventListener('beforeunload', () => {
     if (window.planoManager) {
-        window.planoManager.stopPolling();
+        window.planoManager.stopEventStream();
+        window.planoManager.stopModuleWatch();
     }
 });
 